@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    SleekXMPP: The Sleek XMPP Library
+    Copyright (C) 2010  Nathanael C. Fritz
+    This file is part of SleekXMPP.
+
+    See the file LICENSE for copying permission.
+"""
+
+import random
+from optparse import OptionParser
+
+from common import timed, rate, report
+
+from sleekxmpp import jid
+from sleekxmpp.jid import JID, JIDCache
+
+
+def bench_jid(count):
+    """
+    Measure creating JIDs from strings, as done for the ``from`` and
+    ``to`` of every received stanza, with ``count`` distinct JIDs used
+    in a skewed pattern so that a minority of users send most of the
+    stanzas.
+
+    JIDs are created with a cache large enough for every JID, with
+    the default cache size, and without a cache, which shows the cost
+    of validating each JID.
+    """
+    jids = ['user%d@example.com/res%d' % (i, i) for i in range(count)]
+    rand = random.Random(42)
+    order = [jids[min(int(rand.expovariate(10.0 / count)), count - 1)]
+             for i in range(count * 4)]
+
+    def create():
+        for value in order:
+            JID(value)
+
+    default = jid.JID_CACHE
+    results = {}
+    try:
+        for name, size in (('cache_all', count),
+                           ('cache_default', jid.JID_CACHE_MAX_SIZE),
+                           ('no_cache', 0)):
+            jid.JID_CACHE = JIDCache(size)
+            create()
+            result = rate(len(order), timed(create, 1)['seconds'])
+            result['cache'] = jid.JID_CACHE.stats()
+            results[name] = result
+    finally:
+        jid.JID_CACHE = default
+    return results
+
+
+if __name__ == '__main__':
+    optp = OptionParser()
+    optp.add_option('-n', '--jids', type='int', dest='jids',
+                    default=20000, help='number of distinct JIDs')
+    optp.add_option('-o', '--output', dest='output',
+                    help='append results to a file instead of printing')
+    opts, args = optp.parse_args()
+
+    report('jid', bench_jid(opts.jids), opts.output)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    SleekXMPP: The Sleek XMPP Library
+    Copyright (C) 2010  Nathanael C. Fritz
+    This file is part of SleekXMPP.
+
+    See the file LICENSE for copying permission.
+"""
+
+import gc
+import tracemalloc
+from optparse import OptionParser
+
+from common import report
+
+from sleekxmpp import BaseXMPP, JID
+from sleekxmpp.roster import RosterItem
+from sleekxmpp.xmlstream import ET
+
+
+MESSAGE = '<message xmlns="jabber:client" to="bot@example.com/bench" ' + \
+          'from="user@example.com/home" type="chat" id="m1">' + \
+          '<body>Hello</body>' + \
+          '<active xmlns="http://jabber.org/protocol/chatstates" />' + \
+          '</message>'
+
+
+def measure(make, count):
+    """
+    Return the number of bytes allocated for each object returned by
+    ``make``, when ``count`` of them are kept alive at once.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        objects = [make(i) for i in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    # Do not count the list holding the objects.
+    used = after - before - len(objects) * 8
+    return {'objects': count,
+            'bytes_per_object': round(float(used) / count, 1)}
+
+
+def bench_memory(count):
+    """
+    Measure the memory held by stanzas built from parsed XML, by
+    JIDs, and by roster items, as a component caching many stanzas
+    or holding a large roster would keep them.
+
+    The XML for the stanzas, and the strings for the JIDs, are
+    created beforehand so that only the objects are counted.
+    """
+    xmpp = BaseXMPP(default_ns='jabber:client')
+    xmpp.register_plugin('xep_0085')
+    xmpp.boundjid = JID('component.example.com')
+
+    results = {}
+
+    xml = [ET.fromstring(MESSAGE) for i in range(count)]
+    results['stanza'] = measure(lambda i: xmpp._build_stanza(xml[i]), count)
+
+    jids = ['user%d@example.com/res%d' % (i, i) for i in range(count)]
+    results['jid'] = measure(lambda i: JID(jids[i]), count)
+
+    bare = ['user%d@example.com' % i for i in range(count)]
+    results['roster_item'] = measure(
+            lambda i: RosterItem(xmpp, bare[i], 'component.example.com'),
+            count)
+    return results
+
+
+if __name__ == '__main__':
+    optp = OptionParser()
+    optp.add_option('-n', '--objects', type='int', dest='objects',
+                    default=100000, help='number of objects of each kind')
+    optp.add_option('-o', '--output', dest='output',
+                    help='append results to a file instead of printing')
+    opts, args = optp.parse_args()
+
+    report('memory', bench_memory(opts.objects), opts.output)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    SleekXMPP: The Sleek XMPP Library
+    Copyright (C) 2010  Nathanael C. Fritz
+    This file is part of SleekXMPP.
+
+    See the file LICENSE for copying permission.
+"""
+
+import time
+import socket
+import threading
+from optparse import OptionParser
+
+from common import timed, rate, report
+
+from sleekxmpp import BaseXMPP, Callback, StanzaPath, MatchXPath
+from sleekxmpp.xmlstream import ET, tostring
+
+
+STREAM_HEADER = b'<stream:stream xmlns="jabber:client" ' + \
+                b'xmlns:stream="http://etherx.jabber.org/streams">'
+
+MESSAGE = '<message xmlns="jabber:client" to="bot@example.com/bench" ' + \
+          'from="user%d@example.com/home" type="chat" id="m%d">' + \
+          '<body>Hello &amp; welcome, this is message %d</body>' + \
+          '<active xmlns="http://jabber.org/protocol/chatstates" />' + \
+          '<delay xmlns="urn:xmpp:delay" from="example.com" ' + \
+          'stamp="2002-09-10T23:08:25Z" />' + \
+          '</message>'
+
+
+class QueueSink(object):
+
+    """An event queue replacement that only counts queued events."""
+
+    def __init__(self):
+        self.count = 0
+
+    def put(self, item, block=True, timeout=None):
+        self.count += 1
+
+
+def make_stream(handlers=50):
+    """
+    Create a stream with a typical set of plugins and a number of
+    extra stream handlers, most of which will not match messages.
+    """
+    xmpp = BaseXMPP(default_ns='jabber:client')
+    xmpp.register_plugin('xep_0085')
+    xmpp.register_plugin('xep_0203')
+    for i in range(handlers):
+        if i % 2:
+            matcher = StanzaPath('iq@type=get/bench%d' % i)
+        else:
+            matcher = MatchXPath('{jabber:client}message/{bench%d}query' % i)
+        xmpp.register_handler(Callback('Bench %d' % i, matcher,
+                                       lambda stanza: None))
+    return xmpp
+
+
+def messages(count):
+    return [MESSAGE % (i % 100, i, i) for i in range(count)]
+
+
+def bench_stages(count):
+    """Time each stage of processing a single incoming message."""
+    xmpp = make_stream()
+    data = messages(count)
+    xml = ET.fromstring(data[0])
+    stanza = xmpp._build_stanza(ET.fromstring(data[0]))
+    results = {}
+
+    state = {'i': 0}
+
+    def parse():
+        state['i'] = (state['i'] + 1) % count
+        ET.fromstring(data[state['i']])
+    results['parse'] = timed(parse, count)
+
+    def build():
+        xmpp._build_stanza(ET.fromstring(data[0]))
+    results['parse_build'] = timed(build, count)
+
+    handlers = list(xmpp._XMLStream__handlers)
+
+    def match():
+        for handler in handlers:
+            handler.match(stanza)
+    results['match_all_handlers'] = timed(match, count)
+
+    def getitem():
+        stanza['body']
+        stanza['from'].bare
+        stanza['chat_state']
+        stanza['delay']['stamp']
+    results['getitem_plugins'] = timed(getitem, count)
+
+    def serialize():
+        tostring(xml, xmlns='jabber:client', stream=xmpp, top_level=True)
+    results['tostring'] = timed(serialize, count)
+
+    sink = QueueSink()
+    xmpp.event_queue = sink
+    spawn = xmpp._XMLStream__spawn_event
+
+    def dispatch():
+        spawn(ET.fromstring(data[0]))
+    results['dispatch'] = timed(dispatch, count)
+    return results
+
+
+def bench_receive(count):
+    """Measure stanzas per second read from a socket and handled."""
+    xmpp = make_stream()
+    client, server = socket.socketpair()
+    xmpp.set_socket(client)
+    xmpp.session_started_event.set()
+
+    done = threading.Event()
+    received = [0]
+
+    def handle(msg):
+        received[0] += 1
+        if received[0] == count:
+            done.set()
+
+    xmpp.add_event_handler('message', handle)
+    xmpp.process(block=False)
+
+    payload = ''.join(messages(count)).encode('utf-8')
+    try:
+        start = time.time()
+        server.sendall(STREAM_HEADER)
+        server.sendall(payload)
+        done.wait(120)
+        return rate(received[0], time.time() - start)
+    finally:
+        xmpp.abort()
+        server.close()
+
+
+def bench_send(count, batching=False):
+    """Measure stanzas per second written to a socket by the send thread."""
+    xmpp = make_stream()
+    xmpp.send_batching = batching
+    client, server = socket.socketpair()
+    xmpp.set_socket(client)
+    xmpp.session_started_event.set()
+    xmpp.process(block=False)
+
+    # The session is already started, so no stream header is sent.
+    data = messages(count)
+    expected = len(''.join(data).encode('utf-8'))
+
+    def drain():
+        total = 0
+        while total < expected:
+            chunk = server.recv(65536)
+            if not chunk:
+                break
+            total += len(chunk)
+
+    reader = threading.Thread(target=drain)
+    reader.daemon = True
+    try:
+        start = time.time()
+        reader.start()
+        for stanza in data:
+            xmpp.send_raw(stanza)
+        reader.join(120)
+        return rate(count, time.time() - start)
+    finally:
+        xmpp.abort()
+        server.close()
+
+
+def bench_pipeline(count):
+    results = bench_stages(count)
+    results['receive'] = bench_receive(count)
+    results['send'] = bench_send(count)
+    results['send_batched'] = bench_send(count, batching=True)
+    return results
+
+
+if __name__ == '__main__':
+    optp = OptionParser()
+    optp.add_option('-n', '--stanzas', type='int', dest='stanzas',
+                    default=10000, help='number of stanzas per stage')
+    optp.add_option('-o', '--output', dest='output',
+                    help='append results to a file instead of printing')
+    opts, args = optp.parse_args()
+
+    report('pipeline', bench_pipeline(opts.stanzas), opts.output)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    SleekXMPP: The Sleek XMPP Library
+    Copyright (C) 2010  Nathanael C. Fritz
+    This file is part of SleekXMPP.
+
+    See the file LICENSE for copying permission.
+"""
+
+import time
+import threading
+from optparse import OptionParser
+
+from common import report
+
+from sleekxmpp.xmlstream import Scheduler
+
+
+def bench_scheduler(count):
+    """
+    Schedule a large number of tasks, in the way that many pending
+    Iq timeouts would be, then remove half of them and wait for the
+    rest to run.
+
+    Returns a dictionary of timings in seconds.
+    """
+    stop = threading.Event()
+    scheduler = Scheduler(stop)
+    scheduler.process(threaded=True, daemon=True)
+
+    done = threading.Event()
+    ran = [0]
+    expected = count - count // 2
+
+    def callback():
+        ran[0] += 1
+        if ran[0] == expected:
+            done.set()
+
+    results = {'tasks': count}
+    try:
+        start = time.time()
+        for i in range(count):
+            scheduler.add('IqTimeout_%s' % i, 1.0 + (i % 100) / 100.0,
+                          callback)
+        results['add'] = time.time() - start
+
+        start = time.time()
+        for i in range(0, count, 2):
+            scheduler.remove('IqTimeout_%s' % i)
+        results['remove'] = time.time() - start
+
+        start = time.time()
+        done.wait(60)
+        results['run'] = time.time() - start
+        results['ran'] = ran[0]
+    finally:
+        stop.set()
+        scheduler.quit()
+    return results
+
+
+if __name__ == '__main__':
+    optp = OptionParser()
+    optp.add_option('-n', '--tasks', type='int', dest='tasks',
+                    default=100000, help='number of tasks to schedule')
+    optp.add_option('-o', '--output', dest='output',
+                    help='append results to a file instead of printing')
+    opts, args = optp.parse_args()
+
+    report('scheduler', bench_scheduler(opts.tasks), opts.output)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""
+    SleekXMPP: The Sleek XMPP Library
+    Copyright (C) 2010  Nathanael C. Fritz
+    This file is part of SleekXMPP.
+
+    See the file LICENSE for copying permission.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def timed(func, number, repeat=3):
+    """
+    Run a function ``number`` times, ``repeat`` times over, and return
+    the best run as a dictionary with the total time in seconds, the
+    operations per second, and the latency per operation in
+    microseconds.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        for _ in range(number):
+            func()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return rate(number, best)
+
+
+def rate(number, elapsed):
+    """Express a count of operations done in a given time."""
+    elapsed = max(elapsed, 1e-9)
+    return {'ops': number,
+            'seconds': round(elapsed, 6),
+            'ops_per_sec': round(number / elapsed, 1),
+            'usec_per_op': round(elapsed / number * 1e6, 3)}
+
+
+def environment():
+    """Describe the code and interpreter being benchmarked."""
+    try:
+        revision = subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], cwd=ROOT,
+                stderr=subprocess.STDOUT).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {'revision': revision,
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'time': int(time.time())}
+
+
+def report(name, results, output=None):
+    """Write benchmark results as a single line of JSON."""
+    line = json.dumps({'benchmark': name,
+                       'environment': environment(),
+                       'results': results}, sort_keys=True)
+    if output is None:
+        print(line)
+    else:
+        with open(output, 'a') as f:
+            f.write(line + '\n')
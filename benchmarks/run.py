@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    SleekXMPP: The Sleek XMPP Library
+    Copyright (C) 2010  Nathanael C. Fritz
+    This file is part of SleekXMPP.
+
+    See the file LICENSE for copying permission.
+"""
+
+from optparse import OptionParser
+
+from common import report
+from bench_jid import bench_jid
+from bench_memory import bench_memory
+from bench_pipeline import bench_pipeline
+from bench_scheduler import bench_scheduler
+
+
+#: Each benchmark, mapped to its function and its default size.
+BENCHMARKS = {
+    'jid': (bench_jid, 20000),
+    'memory': (bench_memory, 100000),
+    'pipeline': (bench_pipeline, 10000),
+    'scheduler': (bench_scheduler, 100000),
+}
+
+
+if __name__ == '__main__':
+    optp = OptionParser(usage='%prog [options] [benchmark ...]')
+    optp.add_option('-s', '--scale', type='float', dest='scale',
+                    default=1.0, help='multiply the size of each benchmark')
+    optp.add_option('-o', '--output', dest='output',
+                    help='append results to a file instead of printing')
+    opts, args = optp.parse_args()
+
+    for name in args or sorted(BENCHMARKS):
+        func, size = BENCHMARKS[name]
+        report(name, func(max(1, int(size * opts.scale))), opts.output)
@@ -67,24 +67,142 @@ JID_UNESCAPE_TRANSFORMATIONS = {'\\20': ' ',
                                 '\\40': '@',
                                 '\\5c': '\\'}
 
-JID_CACHE = OrderedDict()
-JID_CACHE_LOCK = threading.Lock()
+#: The number of unpinned entries kept by a :class:`JIDCache`, such
+#: as :data:`JID_CACHE`, which was not given its own limit. Changes
+#: take effect when the next entry is added.
 JID_CACHE_MAX_SIZE = 1024
 
-def _cache(key, parts, locked):
-    JID_CACHE[key] = (parts, locked)
-    if len(JID_CACHE) > JID_CACHE_MAX_SIZE:
-        with JID_CACHE_LOCK:
-            while len(JID_CACHE) > JID_CACHE_MAX_SIZE:
-                found = None
-                for key, item in JID_CACHE.items():
-                    if not item[1]: # if not locked
-                        found = key
-                        break
-                if not found: # more than MAX_SIZE locked
-                    # warn?
-                    break
-                del JID_CACHE[found]
+_move_to_end = getattr(OrderedDict, 'move_to_end', None)
+
+
+class JIDCache(object):
+
+    """
+    A thread safe cache of parsed and validated JID parts, keyed by
+    the JID string or the ``(local, domain, resource)`` tuple used to
+    create the JID.
+
+    Entries are evicted in least recently used order once more than
+    :attr:`max_size` are stored. Pinned entries, such as the stream's
+    own JID, are never evicted and do not count towards the limit.
+
+    The cache used by :class:`JID` is :data:`JID_CACHE`, which may be
+    replaced by any object providing :meth:`get()` and :meth:`put()`.
+
+    :param int max_size: The maximum number of unpinned entries, or
+                         ``None`` to use :data:`JID_CACHE_MAX_SIZE`.
+    """
+
+    def __init__(self, max_size=None):
+        #: The number of lookups which found an entry.
+        self.hits = 0
+
+        #: The number of lookups which did not find an entry.
+        self.misses = 0
+
+        #: The number of entries removed to make room for new ones.
+        self.evictions = 0
+
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._pinned = {}
+
+        #: The lock guarding the cache. It may be held to make several
+        #: changes at once.
+        self.lock = threading.RLock()
+
+    @property
+    def max_size(self):
+        """The maximum number of unpinned entries.
+
+        Follows :data:`JID_CACHE_MAX_SIZE` unless a limit was given.
+        Lowering the limit evicts the least recently used entries.
+        """
+        if self._max_size is None:
+            return JID_CACHE_MAX_SIZE
+        return self._max_size
+
+    @max_size.setter
+    def max_size(self, value):
+        with self.lock:
+            self._max_size = value
+            self._evict()
+
+    def resize(self, max_size):
+        """Change the maximum number of unpinned entries.
+
+        :param int max_size: The new limit.
+        """
+        self.max_size = max_size
+
+    def get(self, key):
+        """Return the cached JID parts for a key, or ``None``.
+
+        :param key: The JID string or parts tuple.
+        """
+        with self.lock:
+            parts = self._pinned.get(key)
+            if parts is None:
+                parts = self._entries.get(key)
+                if parts is None:
+                    self.misses += 1
+                    return None
+                if _move_to_end is not None:
+                    _move_to_end(self._entries, key)
+                else:
+                    del self._entries[key]
+                    self._entries[key] = parts
+            self.hits += 1
+            return parts
+
+    def put(self, key, parts, pinned=False):
+        """Store the parts of a JID.
+
+        :param key: The JID string or parts tuple.
+        :param tuple parts: The validated ``(local, domain, resource)``.
+        :param bool pinned: Indicates if the entry may not be evicted.
+        """
+        with self.lock:
+            if pinned:
+                self._entries.pop(key, None)
+                self._pinned[key] = parts
+            elif key not in self._pinned:
+                self._entries[key] = parts
+                self._evict()
+
+    def _evict(self):
+        entries = self._entries
+        max_size = self.max_size
+        while len(entries) > max_size:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Remove all entries, including pinned ones."""
+        with self.lock:
+            self._entries.clear()
+            self._pinned.clear()
+
+    def __len__(self):
+        return len(self._entries) + len(self._pinned)
+
+    def stats(self):
+        """Return a dictionary of the cache's size and counters."""
+        with self.lock:
+            return {'size': len(self._entries),
+                    'pinned': len(self._pinned),
+                    'max_size': self.max_size,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions}
+
+
+#: The cache shared by all :class:`JID` objects.
+JID_CACHE = JIDCache()
+
+#: The lock of :data:`JID_CACHE`, kept for backwards compatibility.
+JID_CACHE_LOCK = JID_CACHE.lock
+
 
 # pylint: disable=c0103
 #: The nodeprep profile of stringprep used to validate the local,
@@ -215,12 +333,17 @@ def _validate_domain(domain):
 
         domain_parts = []
         for label in domain.split('.'):
-            try:
-                label = encodings.idna.nameprep(label)
-                encodings.idna.ToASCII(label)
-                pass_nameprep = True
-            except UnicodeError:
-                pass_nameprep = False
+            if stringprep_profiles.is_ascii(label):
+                # Nameprep only lowercases ASCII labels.
+                label = label.lower()
+                pass_nameprep = 0 < len(label) < 64
+            else:
+                try:
+                    label = encodings.idna.nameprep(label)
+                    encodings.idna.ToASCII(label)
+                    pass_nameprep = True
+                except UnicodeError:
+                    pass_nameprep = False
 
             if not pass_nameprep:
                 raise InvalidJID('Could not encode domain as ASCII')
@@ -432,6 +555,8 @@ class JID(object):
     :raises InvalidJID:
     """
 
+    __slots__ = ('_jid',)
+
     # pylint: disable=W0212
     def __init__(self, jid=None, **kwargs):
         locked = kwargs.get('cache_lock', False)
@@ -452,10 +577,10 @@ class JID(object):
                 self._jid = jid._jid
                 return
             key = jid
-            self._jid, locked = JID_CACHE.get(jid, (None, locked))
+            self._jid = JID_CACHE.get(jid)
         elif jid is None and parts is not None:
             key = parts
-            self._jid, locked = JID_CACHE.get(parts, (None, locked))
+            self._jid = JID_CACHE.get(parts)
         if not self._jid:
             if not jid:
                 parsed_jid = (None, None, None)
@@ -475,7 +600,9 @@ class JID(object):
 
             self._jid = (local, domain, resource)
             if key:
-                _cache(key, self._jid, locked)
+                JID_CACHE.put(key, self._jid, locked)
+        elif locked:
+            JID_CACHE.put(key, self._jid, True)
 
     def unescape(self):
         """Return an unescaped JID object.
@@ -636,3 +763,11 @@ class JID(object):
     def __deepcopy__(self, memo):
         """Generate a duplicate JID."""
         return JID(deepcopy(str(self), memo))
+
+    def __getstate__(self):
+        """Pickle a JID using its parsed components."""
+        return self._jid
+
+    def __setstate__(self, state):
+        """Restore a pickled JID."""
+        self._jid = state
@@ -10,6 +10,7 @@ from sleekxmpp.plugins.base import register_plugin
 
 from sleekxmpp.plugins.xep_0115.stanza import Capabilities
 from sleekxmpp.plugins.xep_0115.static import StaticCaps
+from sleekxmpp.plugins.xep_0115.store import CapsStore
 from sleekxmpp.plugins.xep_0115.caps import XEP_0115
 
 
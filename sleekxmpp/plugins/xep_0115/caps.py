@@ -18,7 +18,7 @@ from sleekxmpp.xmlstream.handler import Callback
 from sleekxmpp.xmlstream.matcher import StanzaPath
 from sleekxmpp.exceptions import XMPPError, IqError, IqTimeout
 from sleekxmpp.plugins import BasePlugin
-from sleekxmpp.plugins.xep_0115 import stanza, StaticCaps
+from sleekxmpp.plugins.xep_0115 import stanza, StaticCaps, CapsStore
 
 
 log = logging.getLogger(__name__)
@@ -28,6 +28,15 @@ class XEP_0115(BasePlugin):
 
     """
     XEP-0115: Entity Capabalities
+
+    Verified caps may be kept across restarts, and shared between
+    processes on the same host, by setting the cache_file option to
+    the name of an SQLite database file. Another persistent store,
+    such as a CapsStore, may be given with the store option.
+
+    The disco#info data for a new verstring is requested without
+    blocking, and only once no matter how many entities announce it
+    while the request is outstanding.
     """
 
     name = 'xep_0115'
@@ -37,7 +46,9 @@ class XEP_0115(BasePlugin):
     default_config = {
         'hash': 'sha-1',
         'caps_node': None,
-        'broadcast': True
+        'broadcast': True,
+        'cache_file': None,
+        'store': None
     }
 
     def plugin_init(self):
@@ -65,8 +76,7 @@ class XEP_0115(BasePlugin):
 
         self.xmpp.add_filter('out', self._filter_add_caps)
 
-        self.xmpp.add_event_handler('entity_caps', self._process_caps,
-                                    threaded=True)
+        self.xmpp.add_event_handler('entity_caps', self._process_caps)
 
         if not self.xmpp.is_component:
             self.xmpp.register_feature('caps',
@@ -75,7 +85,9 @@ class XEP_0115(BasePlugin):
                     order=10010)
 
         disco = self.xmpp['xep_0030']
-        self.static = StaticCaps(self.xmpp, disco.static)
+        if self.cache_file:
+            self.store = CapsStore(self.cache_file)
+        self.static = StaticCaps(self.xmpp, disco.static, self.store)
 
         for op in self._disco_ops:
             self.api.register(getattr(self.static, op), op, default=True)
@@ -91,7 +103,7 @@ class XEP_0115(BasePlugin):
         disco.get_verstring = self.get_verstring
 
         self._processing_lock = threading.Lock()
-        self._processing = set()
+        self._processing = {}
 
     def plugin_end(self):
         self.xmpp['xep_0030'].del_feature(feature=stanza.Capabilities.namespace)
@@ -102,6 +114,8 @@ class XEP_0115(BasePlugin):
             self.xmpp.unregister_feature('caps', 10010)
         for op in ('supports', 'has_identity'):
             self.xmpp['xep_0030'].restore_defaults(op)
+        if self.cache_file and self.store is not None:
+            self.store.close()
 
     def session_bind(self, jid):
         self.xmpp['xep_0030'].add_feature(stanza.Capabilities.namespace)
@@ -157,36 +171,82 @@ class XEP_0115(BasePlugin):
             return
 
         if pres['caps']['hash'] not in self.hashes:
-            try:
-                log.debug("Unknown caps hash: %s", pres['caps']['hash'])
-                self.xmpp['xep_0030'].get_info(jid=pres['from'])
-                return
-            except XMPPError:
-                return
+            log.debug("Unknown caps hash: %s", pres['caps']['hash'])
+            self.xmpp['xep_0030'].get_info(jid=pres['from'], block=False)
+            return
+
+        request = (pres['from'], pres['caps']['node'], pres['caps']['hash'])
 
-        # Only lookup the same caps once at a time.
+        # Only lookup the same caps once at a time. Other entities
+        # announcing the verstring meanwhile are given the result.
         with self._processing_lock:
-            if ver in self._processing:
-                log.debug('Already processing verstring %s' % ver)
+            waiting = self._processing.get(ver)
+            if waiting is not None:
+                log.debug('Already processing verstring %s', ver)
+                waiting.append(request)
                 return
-            self._processing.add(ver)
+            self._processing[ver] = []
 
         log.debug("New caps verification string: %s", ver)
-        try:
-            node = '%s#%s' % (pres['caps']['node'], ver)
-            caps = self.xmpp['xep_0030'].get_info(pres['from'], node)
+        self._verify_caps(ver, request)
+
+    def _verify_caps(self, ver, request):
+        """
+        Request the disco#info data for a verstring without waiting
+        for the response.
+
+        Arguments:
+            ver     -- The verification string.
+            request -- A (jid, node, hash) tuple of the entity to query.
+        """
+        jid, node, hash = request
+        node = '%s#%s' % (node, ver)
+
+        def handle_result(iq):
+            verified = False
+            if iq['type'] == 'result':
+                verified = self._validate_caps(iq['disco_info'], hash, ver)
+            else:
+                log.debug("Could not retrieve disco#info results " + \
+                          "for caps for %s", node)
+            self._finish_caps(ver, request, verified)
 
-            if isinstance(caps, Iq):
-                caps = caps['disco_info']
+        def handle_timeout(iq):
+            log.debug("Timed out retrieving disco#info results " + \
+                      "for caps for %s", node)
+            self._finish_caps(ver, request, False)
 
-            if self._validate_caps(caps, pres['caps']['hash'],
-                                         pres['caps']['ver']):
-                self.assign_verstring(pres['from'], pres['caps']['ver'])
+        try:
+            self.xmpp['xep_0030'].get_info(jid, node,
+                                           block=False,
+                                           callback=handle_result,
+                                           timeout_callback=handle_timeout)
         except XMPPError:
-            log.debug("Could not retrieve disco#info results for caps for %s", node)
-
+            self._finish_caps(ver, request, False)
+
+    def _finish_caps(self, ver, request, verified):
+        """
+        Assign a verified verstring to every entity waiting on it, or
+        query the next waiting entity if verification failed.
+
+        Arguments:
+            ver      -- The verification string.
+            request  -- The (jid, node, hash) tuple that was queried.
+            verified -- Indicates if the disco#info data was valid.
+        """
         with self._processing_lock:
-            self._processing.remove(ver)
+            waiting = self._processing.get(ver, [])
+            if verified or not waiting:
+                self._processing.pop(ver, None)
+                retry = None
+            else:
+                retry = waiting.pop(0)
+
+        if retry is not None:
+            self._verify_caps(ver, retry)
+        elif verified:
+            for jid, _, _ in [request] + waiting:
+                self.assign_verstring(jid, ver)
 
     def _validate_caps(self, caps, hash, check_verstring):
         # Check Identities
@@ -20,19 +20,25 @@ class StaticCaps(object):
     """
     Extend the default StaticDisco implementation to provide
     support for extended identity information.
+
+    Verified caps are kept in memory, and also in a persistent
+    store such as a CapsStore if one is given. Caps missing from
+    memory are looked up in the store.
     """
 
-    def __init__(self, xmpp, static):
+    def __init__(self, xmpp, static, store=None):
         """
         Augment the default XEP-0030 static handler object.
 
         Arguments:
             static -- The default static XEP-0030 handler object.
+            store  -- Optional persistent store of verified caps.
         """
         self.xmpp = xmpp
         self.disco = self.xmpp['xep_0030']
         self.caps = self.xmpp['xep_0115']
         self.static = static
+        self.store = store
         self.ver_cache = {}
         self.jid_vers = {}
 
@@ -130,6 +136,8 @@ class StaticCaps(object):
             if not verstring or not info:
                 return
             self.ver_cache[verstring] = info
+        if self.store is not None:
+            self.store.put(verstring, info)
 
     def assign_verstring(self, jid, node, ifrom, data):
         with self.static.lock:
@@ -142,5 +150,12 @@ class StaticCaps(object):
             return self.jid_vers.get(jid, None)
 
     def get_caps(self, jid, node, ifrom, data):
+        verstring = data.get('verstring', None)
         with self.static.lock:
-            return self.ver_cache.get(data.get('verstring', None), None)
+            info = self.ver_cache.get(verstring, None)
+        if info is None and verstring and self.store is not None:
+            info = self.store.get(verstring)
+            if info is not None:
+                with self.static.lock:
+                    self.ver_cache[verstring] = info
+        return info
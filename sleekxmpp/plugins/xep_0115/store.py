@@ -0,0 +1,229 @@
+"""
+    SleekXMPP: The Sleek XMPP Library
+    Copyright (C) 2011 Nathanael C. Fritz, Lance J.T. Stout
+    This file is part of SleekXMPP.
+
+    See the file LICENSE for copying permission.
+"""
+
+import logging
+import threading
+import time
+import zlib
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+from sleekxmpp.xmlstream import ET, tostring
+from sleekxmpp.thirdparty import OrderedDict
+from sleekxmpp.plugins.xep_0030 import DiscoInfo
+
+
+log = logging.getLogger(__name__)
+
+
+#: The number of seconds to wait for another process which is
+#: writing to the same cache file.
+BUSY_TIMEOUT = 5.0
+
+#: The number of seconds to wait before trying again to write
+#: entries which could not be written.
+RETRY_DELAY = 1.0
+
+
+class CapsStore(object):
+
+    """
+    A cache of verified disco#info results, keyed by their
+    verification string, kept in an SQLite database file.
+
+    Since a verification string is a hash of the disco#info data
+    it describes, entries never change once stored. Each entry is
+    kept as the zlib compressed XML of the disco#info query, which
+    for a typical client takes a few hundred bytes.
+
+    The file may be shared by several processes on the same host.
+    Entries stored by one process are found by the others the next
+    time they look up the verification string.
+
+    New entries are written by a background thread, so that storing
+    caps never waits for another process writing to the file. Entries
+    waiting to be written are returned by get() and keys(). Call
+    close() to write them before the program exits.
+
+    Only disco#info results which have been checked against their
+    verification string should be stored, because other processes
+    will trust them without checking again.
+
+    Methods:
+        get    -- Return the disco#info data for a verification string.
+        put    -- Queue the disco#info data for a verification string
+                  to be stored.
+        remove -- Remove a verification string's entry.
+        keys   -- Return the stored verification strings.
+        flush  -- Write all waiting entries now.
+        close  -- Write all waiting entries and close the database.
+    """
+
+    def __init__(self, path, timeout=BUSY_TIMEOUT):
+        """
+        Open or create a caps cache.
+
+        Arguments:
+            path    -- The database file name, or ':memory:'.
+            timeout -- The number of seconds the writer thread waits
+                       for other processes writing to the file.
+        """
+        if sqlite3 is None:
+            raise ImportError('The sqlite3 module is not available.')
+        self._pending = OrderedDict()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout,
+                                     check_same_thread=False)
+        with self._lock:
+            if path != ':memory:':
+                self._conn.execute('PRAGMA journal_mode=WAL')
+                self._conn.execute('PRAGMA synchronous=NORMAL')
+            with self._conn:
+                self._conn.execute(
+                        'CREATE TABLE IF NOT EXISTS caps ('
+                        'ver TEXT PRIMARY KEY, info BLOB NOT NULL, '
+                        'stored REAL NOT NULL)')
+
+        # Writes use their own connection, so that readers never wait
+        # while the writer waits for another process. An in-memory
+        # database only exists for a single connection.
+        if path == ':memory:':
+            self._write_lock = self._lock
+            self._write_conn = self._conn
+        else:
+            self._write_lock = threading.Lock()
+            self._write_conn = sqlite3.connect(path, timeout=timeout,
+                                               check_same_thread=False)
+
+    def get(self, verstring):
+        """
+        Return a DiscoInfo stanza for a verification string,
+        or None if it is not cached.
+
+        Arguments:
+            verstring -- The verification string.
+        """
+        with self._cond:
+            data = self._pending.get(verstring)
+        if data is None:
+            with self._lock:
+                row = self._conn.execute(
+                        'SELECT info FROM caps WHERE ver = ?',
+                        (verstring,)).fetchone()
+            if row is None:
+                return None
+            data = row[0]
+        try:
+            xml = ET.fromstring(zlib.decompress(bytes(data)))
+        except Exception:
+            log.exception('Discarding unreadable caps for %s', verstring)
+            self.remove(verstring)
+            return None
+        return DiscoInfo(xml)
+
+    def put(self, verstring, info):
+        """
+        Queue the disco#info data for a verification string to be
+        stored by the writer thread.
+
+        Arguments:
+            verstring -- The verification string.
+            info      -- A DiscoInfo stanza.
+        """
+        data = zlib.compress(tostring(info.xml).encode('utf-8'))
+        with self._cond:
+            self._pending[verstring] = data
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(name='caps_store_writer',
+                                                target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify()
+
+    def remove(self, verstring):
+        """
+        Remove the entry for a verification string.
+
+        Arguments:
+            verstring -- The verification string.
+        """
+        with self._cond:
+            self._pending.pop(verstring, None)
+        with self._write_lock:
+            with self._write_conn:
+                self._write_conn.execute('DELETE FROM caps WHERE ver = ?',
+                                         (verstring,))
+
+    def keys(self):
+        """Return the stored verification strings."""
+        with self._lock:
+            rows = self._conn.execute('SELECT ver FROM caps').fetchall()
+        keys = OrderedDict((row[0], None) for row in rows)
+        with self._cond:
+            keys.update((ver, None) for ver in self._pending)
+        return list(keys)
+
+    def flush(self):
+        """
+        Write all waiting entries in the calling thread, returning
+        False if they could not be written.
+        """
+        with self._cond:
+            items = list(self._pending.items())
+        if not items:
+            return True
+        now = time.time()
+        try:
+            with self._write_lock:
+                with self._write_conn:
+                    self._write_conn.executemany(
+                            'INSERT OR IGNORE INTO caps '
+                            '(ver, info, stored) VALUES (?, ?, ?)',
+                            [(ver, sqlite3.Binary(data), now)
+                             for ver, data in items])
+        except sqlite3.Error:
+            log.exception('Error writing caps, will retry.')
+            return False
+        with self._cond:
+            for ver, data in items:
+                if self._pending.get(ver) is data:
+                    del self._pending[ver]
+        return True
+
+    def close(self):
+        """Write all waiting entries and close the database."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self.flush()
+        with self._write_lock:
+            self._write_conn.close()
+        with self._lock:
+            self._conn.close()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    self._thread = None
+                    return
+            if not self.flush():
+                with self._cond:
+                    if not self._closed:
+                        self._cond.wait(RETRY_DELAY)
@@ -14,6 +14,7 @@ from sleekxmpp.stanza import Message, Presence, Iq, StreamFeatures
 from sleekxmpp.xmlstream import register_stanza_plugin
 from sleekxmpp.xmlstream.handler import Callback, Waiter
 from sleekxmpp.xmlstream.matcher import MatchXPath, MatchMany
+from sleekxmpp.xmlstream.sendqueue import PRIORITY_HIGH
 from sleekxmpp.plugins.base import BasePlugin
 from sleekxmpp.plugins.xep_0198 import stanza
 
@@ -147,6 +148,7 @@ class XEP_0198(BasePlugin):
         self.xmpp.del_event_handler('session_end', self.session_end)
         self.xmpp.del_filter('in', self._handle_incoming)
         self.xmpp.del_filter('out_sync', self._handle_outgoing)
+        self.xmpp.send_ordered = False
         self.xmpp.remove_handler('Stream Management Enabled')
         self.xmpp.remove_handler('Stream Management Resumed')
         self.xmpp.remove_handler('Stream Management Failed')
@@ -162,6 +164,7 @@ class XEP_0198(BasePlugin):
     def session_end(self, event):
         """Reset stream management state."""
         self.enabled.clear()
+        self.xmpp.send_ordered = False
         self.unacked_queue.clear()
         self.sm_id = None
         self.handled = 0
@@ -178,7 +181,7 @@ class XEP_0198(BasePlugin):
     def request_ack(self, e=None):
         """Request an ack from the server."""
         req = stanza.RequestAck(self.xmpp)
-        self.xmpp.send_queue.put(str(req))
+        self.xmpp.send_raw(str(req), priority=PRIORITY_HIGH)
 
     def _handle_sm_feature(self, features):
         """
@@ -197,12 +200,14 @@ class XEP_0198(BasePlugin):
         if not self.sm_id:
             if 'bind' in self.xmpp.features:
                 self.enabled.set()
+                self.xmpp.send_ordered = True
                 enable = stanza.Enable(self.xmpp)
                 enable['resume'] = self.allow_resume
                 enable.send(now=True)
                 self.handled = 0
         elif self.sm_id and self.allow_resume:
             self.enabled.set()
+            self.xmpp.send_ordered = True
             resume = stanza.Resume(self.xmpp)
             resume['h'] = self.handled
             resume['previd'] = self.sm_id
@@ -252,6 +257,7 @@ class XEP_0198(BasePlugin):
         Raises an :term:`sm_failed` event.
         """
         self.enabled.clear()
+        self.xmpp.send_ordered = False
         self.unacked_queue.clear()
         self.xmpp.event('sm_failed', stanza)
 
@@ -15,6 +15,7 @@ from sleekxmpp.exceptions import IqError, IqTimeout
 from sleekxmpp.xmlstream import register_stanza_plugin
 from sleekxmpp.xmlstream.matcher import StanzaPath
 from sleekxmpp.xmlstream.handler import Callback
+from sleekxmpp.xmlstream.sendqueue import PRIORITY_HIGH
 from sleekxmpp.plugins import BasePlugin
 from sleekxmpp.plugins.xep_0199 import stanza, Ping
 
@@ -143,7 +144,8 @@ class XEP_0199(BasePlugin):
         iq['from'] = ifrom
         iq.enable('ping')
 
-        return iq.send(block=block, timeout=timeout, callback=callback)
+        return iq.send(block=block, timeout=timeout, callback=callback,
+                       priority=PRIORITY_HIGH)
 
     def ping(self, jid=None, ifrom=None, timeout=None):
         """Send a ping request and calculate RTT.
@@ -9,3 +9,4 @@
 from sleekxmpp.roster.item import RosterItem
 from sleekxmpp.roster.single import RosterNode
 from sleekxmpp.roster.multi import Roster
+from sleekxmpp.roster.store import WriteBehindStore, SQLiteStore
@@ -7,6 +7,11 @@
 """
 
 
+#: The order of preference for show values when choosing between
+#: resources with the same priority, from most to least available.
+SHOW_RANK = {'chat': 0, '': 1, 'away': 2, 'xa': 3, 'dnd': 4}
+
+
 class RosterItem(object):
 
     """
@@ -68,7 +73,9 @@ class RosterItem(object):
         whitelisted  -- Indicates if a subscription request from this
                         JID should be automatically accepted.
         name         -- A user supplied alias for the JID.
-        groups       -- A list of group names for the JID.
+        groups       -- A list of group names for the JID. Assign a new
+                        list to change the groups, so that the roster
+                        node's group index is updated.
 
     Attributes:
         xmpp        -- The main SleekXMPP instance.
@@ -79,6 +86,12 @@ class RosterItem(object):
         resources   -- A dictionary of online resources for this JID.
                        Will contain the fields 'show', 'status',
                        and 'priority'.
+        best_resource -- The online resource with the highest priority,
+                         preferring the most available show value
+                         between equal priorities, or None if the JID
+                         is offline. Kept up to date as presence is
+                         received, and fires the changed_presence event
+                         when it, or its show or status, changes.
 
     Methods:
         load                -- Retrieve the roster item from an
@@ -93,6 +106,7 @@ class RosterItem(object):
         unsubscribe         -- Unsubscribe from the JID.
         send_presence       -- Send a directed presence to the JID.
         send_last_presence  -- Resend the last sent presence.
+        presence            -- Return the aggregate presence of the JID.
         handle_available    -- Update the JID's resource information.
         handle_unavailable  -- Update the JID's resource information.
         handle_subscribe    -- Handle a subscription request.
@@ -104,8 +118,14 @@ class RosterItem(object):
         handle_probe        -- Handle a presence probe query.
     """
 
+    # Components may hold very large numbers of roster items, so
+    # avoid a per-item __dict__.
+    __slots__ = ('xmpp', 'jid', 'owner', 'last_status', 'resources',
+                 'roster', 'db', 'best_resource', '_state', '_db_state',
+                 '__weakref__')
+
     def __init__(self, xmpp, jid, owner=None,
-                 state=None, db=None, roster=None):
+                 state=None, db=None, roster=None, loaded=False):
         """
         Create a new roster item.
 
@@ -117,12 +137,15 @@ class RosterItem(object):
             state  -- A dictionary of initial state values.
             db     -- An optional interface to an external datastore.
             roster -- The roster object containing this entry.
+            loaded -- If True, the item's state has already been read
+                      from the datastore and is not loaded again.
         """
         self.xmpp = xmpp
         self.jid = jid
         self.owner = owner or self.xmpp.boundjid.bare
         self.last_status = None
         self.resources = {}
+        self.best_resource = None
         self.roster = roster
         self.db = db
         self._state = state or {
@@ -135,8 +158,12 @@ class RosterItem(object):
                 'name': '',
                 'groups': []}
 
-        self._db_state = {}
-        self.load()
+        self._db_state = None
+        if loaded:
+            if self.db:
+                self._db_state = {}
+        else:
+            self.load()
 
     def set_backend(self, db=None, save=True):
         """
@@ -158,20 +185,31 @@ class RosterItem(object):
         if one has been provided.
         """
         if self.db:
+            if self._db_state is None:
+                self._db_state = {}
             item = self.db.load(self.owner, self.jid,
                                        self._db_state)
             if item:
-                self['name'] = item['name']
-                self['groups'] = item['groups']
-                self['from'] = item['from']
-                self['to'] = item['to']
-                self['whitelisted'] = item['whitelisted']
-                self['pending_out'] = item['pending_out']
-                self['pending_in'] = item['pending_in']
-                self['subscription'] = self._subscription()
+                self._load_state(item)
             return self._state
         return None
 
+    def _load_state(self, item):
+        """
+        Set the state fields from a dictionary read from the datastore.
+
+        Arguments:
+            item -- The stored state fields.
+        """
+        self['name'] = item['name']
+        self['groups'] = item['groups']
+        self['from'] = item['from']
+        self['to'] = item['to']
+        self['whitelisted'] = item['whitelisted']
+        self['pending_out'] = item['pending_out']
+        self['pending_in'] = item['pending_in']
+        self['subscription'] = self._subscription()
+
     def save(self, remove=False):
         """
         Save the item's state information to an external datastore,
@@ -184,6 +222,8 @@ class RosterItem(object):
         if remove:
             self._state['removed'] = True
         if self.db:
+            if self._db_state is None:
+                self._db_state = {}
             self.db.save(self.owner, self.jid,
                          self._state, self._db_state)
 
@@ -217,6 +257,8 @@ class RosterItem(object):
             else:
                 value = str(value).lower()
                 self._state[key] = value in ('true', '1', 'on', 'yes')
+            if key != 'name' and self.roster is not None:
+                self.roster._reindex(self)
         else:
             raise KeyError
 
@@ -346,31 +388,93 @@ class RosterItem(object):
         else:
             self.last_status.send()
 
+    def presence(self):
+        """
+        Return the JID's aggregate presence: the number of online
+        resources, and the best resource with its show, status, and
+        priority values.
+        """
+        best = self.best_resource
+        if best is None:
+            return {'online': 0, 'resource': None, 'show': '',
+                    'status': '', 'priority': 0}
+        data = self.resources[best]
+        return {'online': len(self.resources),
+                'resource': best,
+                'show': data['show'],
+                'status': data['status'],
+                'priority': data['priority']}
+
+    def _rank(self, resource):
+        data = self.resources[resource]
+        return (data['priority'], -SHOW_RANK.get(data['show'], 1))
+
+    def _aggregate(self):
+        best = self.best_resource
+        if best is None:
+            return None
+        data = self.resources[best]
+        return (best, data['show'], data['status'], data['priority'])
+
+    def _update_best(self, resource):
+        """
+        Update the best resource after a resource became available,
+        changed its presence, or became unavailable.
+
+        Only the changed resource is compared with the current best
+        one, unless the best resource itself got worse or went away.
+
+        Arguments:
+            resource -- The changed resource.
+        """
+        best = self.best_resource
+        if resource in self.resources and best != resource:
+            if best is None or self._rank(resource) > self._rank(best):
+                self.best_resource = resource
+        elif resource == best:
+            best = None
+            for name in self.resources:
+                if best is None or self._rank(name) > self._rank(best):
+                    best = name
+            self.best_resource = best
+
     def handle_available(self, presence):
         resource = presence['from'].resource
         data = {'status': presence['status'],
                 'show': presence['show'],
                 'priority': presence['priority']}
         got_online = not self.resources
+        old_aggregate = self._aggregate()
         if resource not in self.resources:
             self.resources[resource] = {}
         old_status = self.resources[resource].get('status', '')
         old_show = self.resources[resource].get('show', None)
         self.resources[resource].update(data)
+        self._update_best(resource)
         if got_online:
+            if self.roster is not None:
+                self.roster._reindex(self)
             self.xmpp.event('got_online', presence)
         if old_show != presence['show'] or old_status != presence['status']:
             self.xmpp.event('changed_status', presence)
+        if self._aggregate() != old_aggregate:
+            self.xmpp.event('changed_presence', presence)
 
     def handle_unavailable(self, presence):
         resource = presence['from'].resource
         if not self.resources:
             return
+        old_aggregate = self._aggregate()
         if resource in self.resources:
             del self.resources[resource]
+            self._update_best(resource)
         self.xmpp.event('changed_status', presence)
         if not self.resources:
+            if self.roster is not None:
+                self.roster._reindex(self)
             self.xmpp.event('got_offline', presence)
+        if self._aggregate() != old_aggregate:
+            self.xmpp.event('changed_presence', presence)
 
     def handle_subscribe(self, presence):
         """
@@ -492,6 +596,9 @@ class RosterItem(object):
         a roster reset request.
         """
         self.resources = {}
+        self.best_resource = None
+        if self.roster is not None:
+            self.roster._reindex(self)
 
     def __repr__(self):
         return repr(self._state)
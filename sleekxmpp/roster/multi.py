@@ -26,6 +26,15 @@ class Roster(object):
     be provided. See the documentation for the RosterItem class for the
     methods that the datastore interface object must provide.
 
+    Each node's items are read from the datastore when the node is
+    first used. A datastore may be wrapped in a WriteBehindStore so
+    that saving roster items while handling presence does not wait
+    for storage, and SQLiteStore provides a file based datastore.
+    For example:
+
+        store = WriteBehindStore(SQLiteStore('roster.db'))
+        xmpp.roster.set_backend(store)
+
     Attributes:
         xmpp           -- The main SleekXMPP instance.
         db             -- Optional interface object to an external datastore.
@@ -36,7 +45,10 @@ class Roster(object):
 
     Methods:
         add           -- Create a new roster node for a JID.
+        flush         -- Write roster items waiting in the datastore.
         send_presence -- Shortcut for sending a presence stanza.
+        broadcast_presence -- Send a presence stanza to every
+                              subscribed contact.
     """
 
     def __init__(self, xmpp, db=None):
@@ -58,6 +70,7 @@ class Roster(object):
                 self.add(node)
 
         self.xmpp.add_filter('out', self._save_last_status)
+        self.xmpp.add_event_handler('disconnected', self.flush)
 
     def _save_last_status(self, stanza):
 
@@ -73,10 +86,11 @@ class Roster(object):
                 if sto:
                     self[sfrom][sto].last_status = stanza
                 else:
-                    self[sfrom].last_status = stanza
-                    with self[sfrom]._last_status_lock:
-                        for jid in self[sfrom]:
-                            self[sfrom][jid].last_status = None
+                    node = self[sfrom]
+                    node.last_status = stanza
+                    with node._last_status_lock:
+                        for item in node._jids.values():
+                            item.last_status = None
 
                 if not self.xmpp.sentpresence:
                     self.xmpp.event('sent_presence')
@@ -154,6 +168,17 @@ class Roster(object):
         for node in self:
             self[node].reset()
 
+    def flush(self, event=None):
+        """
+        Write any roster items the datastore is holding back,
+        such as those waiting in a WriteBehindStore.
+
+        Arguments:
+            event -- Unused; allows use as an event handler.
+        """
+        if self.db is not None and hasattr(self.db, 'flush'):
+            self.db.flush()
+
     def send_presence(self, **kwargs):
         """
         Create, initialize, and send a Presence stanza.
@@ -176,6 +201,15 @@ class Roster(object):
             kwargs['pfrom'] = self.jid
         self.xmpp.send_presence(**kwargs)
 
+    def broadcast_presence(self, **kwargs):
+        """
+        Send a presence stanza to every contact subscribed to the
+        presence of the sender's roster node.
+
+        See RosterNode.broadcast_presence for the arguments.
+        """
+        return self[kwargs.get('pfrom')].broadcast_presence(**kwargs)
+
     @property
     def auto_authorize(self):
         """
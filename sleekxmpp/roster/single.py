@@ -41,7 +41,18 @@ class RosterNode(object):
         unsubscribe   -- Unsubscribe from a JID.
         remove        -- Remove a JID from the roster.
         presence      -- Return presence information for a JID's resources.
+        best_resource -- Return a JID's highest priority online resource.
+        groups        -- Return a dictionary mapping group names to JIDs.
+        group         -- Return the JIDs in a group.
+        subscriptions -- Return the JIDs with a subscription state.
+        pending_in    -- Return the JIDs with unanswered subscription
+                         requests.
+        pending_out   -- Return the JIDs sent unanswered subscription
+                         requests.
+        online        -- Return the JIDs with available resources.
         send_presence -- Shortcut for sending a presence stanza.
+        broadcast_presence -- Send a presence stanza to every
+                              subscribed contact.
     """
 
     def __init__(self, xmpp, jid, db=None):
@@ -60,14 +71,64 @@ class RosterNode(object):
         self.auto_subscribe = True
         self.last_status = None
         self._version = ''
-        self._jids = {}
+        self._items = None
+        self._load_lock = threading.Lock()
         self._last_status_lock = threading.Lock()
 
-        if self.db:
-            if hasattr(self.db, 'version'):
-                self._version = self.db.version(self.jid)
-            for jid in self.db.entries(self.jid):
-                self.add(jid)
+        # Secondary indexes of the roster items, kept up to date
+        # by _reindex() as items change.
+        self._index_lock = threading.Lock()
+        self._indexed = {}
+        self._by_group = {}
+        self._by_subscription = {}
+        self._pending_in = set()
+        self._pending_out = set()
+        self._online = set()
+
+    @property
+    def _jids(self):
+        """
+        The roster items, keyed by bare JID.
+
+        The items are read from the datastore when first used, so
+        that creating a roster with many nodes does not read every
+        node's items up front.
+        """
+        if self._items is None:
+            self._load()
+        return self._items
+
+    def _load(self):
+        """
+        Read the roster items from the datastore.
+
+        If the datastore provides a load_items(owner_jid) method
+        returning a dictionary of item states keyed by JID, all of
+        the items are read with one call. Otherwise each JID listed
+        by entries() is loaded separately.
+        """
+        with self._load_lock:
+            if self._items is not None:
+                return
+            items = {}
+            if self.db:
+                if hasattr(self.db, 'version'):
+                    self._version = self.db.version(self.jid)
+                if hasattr(self.db, 'load_items'):
+                    for jid, state in self.db.load_items(self.jid).items():
+                        item = RosterItem(self.xmpp, jid, self.jid,
+                                          db=self.db, roster=self,
+                                          loaded=True)
+                        item._load_state(state)
+                        items[jid] = item
+                    self._items = items
+                    for item in items.values():
+                        self._reindex(item)
+                    return
+            self._items = items
+            if self.db:
+                for jid in self.db.entries(self.jid):
+                    self.add(jid)
 
     @property
     def version(self):
@@ -111,6 +172,7 @@ class RosterNode(object):
         key = key.bare
         if key in self._jids:
             del self._jids[key]
+            self._unindex(key)
 
     def __len__(self):
         """Return the number of JIDs referenced by the roster."""
@@ -126,18 +188,117 @@ class RosterNode(object):
 
     def groups(self):
         """Return a dictionary mapping group names to JIDs."""
-        result = {}
-        for jid in self._jids:
-            groups = self._jids[jid]['groups']
-            if not groups:
-                if '' not in result:
-                    result[''] = []
-                result[''].append(jid)
+        if self._items is None:
+            self._load()
+        with self._index_lock:
+            return dict((group, list(jids)) for group, jids
+                        in self._by_group.items())
+
+    def group(self, name):
+        """
+        Return the set of JIDs in a roster group.
+
+        Arguments:
+            name -- The group name, or '' for JIDs without a group.
+        """
+        if self._items is None:
+            self._load()
+        with self._index_lock:
+            return set(self._by_group.get(name, ()))
+
+    def subscriptions(self, subscription):
+        """
+        Return the set of JIDs with a subscription state.
+
+        Arguments:
+            subscription -- One of 'none', 'to', 'from', or 'both'.
+        """
+        if self._items is None:
+            self._load()
+        with self._index_lock:
+            return set(self._by_subscription.get(subscription, ()))
+
+    def pending_in(self):
+        """Return the set of JIDs with unanswered subscription requests."""
+        if self._items is None:
+            self._load()
+        with self._index_lock:
+            return set(self._pending_in)
+
+    def pending_out(self):
+        """Return the set of JIDs sent unanswered subscription requests."""
+        if self._items is None:
+            self._load()
+        with self._index_lock:
+            return set(self._pending_out)
+
+    def online(self):
+        """Return the set of JIDs with at least one available resource."""
+        if self._items is None:
+            self._load()
+        with self._index_lock:
+            return set(self._online)
+
+    def _reindex(self, item):
+        """
+        Update the secondary indexes for a roster item after its
+        state or resources changed.
+
+        Items which are still being created or loaded are indexed
+        once they have been added to the roster node.
+
+        Arguments:
+            item -- The changed roster item.
+        """
+        key = getattr(item.jid, 'bare', item.jid)
+        if self._items is None or self._items.get(key) is not item:
+            return
+        entry = (frozenset(item['groups'] or ('',)),
+                 item._subscription(),
+                 item['pending_in'],
+                 item['pending_out'],
+                 bool(item.resources))
+        with self._index_lock:
+            old = self._indexed.get(key)
+            if old == entry:
+                return
+            if old is not None:
+                self._unindex_entry(key, old)
+            self._indexed[key] = entry
+            groups, subscription, pending_in, pending_out, online = entry
             for group in groups:
-                if group not in result:
-                    result[group] = []
-                result[group].append(jid)
-        return result
+                self._by_group.setdefault(group, set()).add(key)
+            self._by_subscription.setdefault(subscription, set()).add(key)
+            if pending_in:
+                self._pending_in.add(key)
+            if pending_out:
+                self._pending_out.add(key)
+            if online:
+                self._online.add(key)
+
+    def _unindex(self, key):
+        """
+        Remove a JID from the secondary indexes.
+
+        Arguments:
+            key -- The bare JID of the removed item.
+        """
+        with self._index_lock:
+            old = self._indexed.pop(key, None)
+            if old is not None:
+                self._unindex_entry(key, old)
+
+    def _unindex_entry(self, key, entry):
+        groups, subscription, pending_in, pending_out, online = entry
+        for group in groups:
+            jids = self._by_group[group]
+            jids.discard(key)
+            if not jids:
+                del self._by_group[group]
+        self._by_subscription[subscription].discard(key)
+        self._pending_in.discard(key)
+        self._pending_out.discard(key)
+        self._online.discard(key)
 
     def __iter__(self):
         """Iterate over the roster items."""
@@ -152,8 +313,8 @@ class RosterNode(object):
             save -- If True, save the existing state to the new
                     backend datastore. Defaults to True.
         """
-        self.db = db
         existing_entries = set(self._jids)
+        self.db = db
         new_entries = set(self.db.entries(self.jid, {}))
 
         for jid in existing_entries:
@@ -205,6 +366,7 @@ class RosterNode(object):
         self._jids[key] = RosterItem(self.xmpp, jid, self.jid,
                                      state=state, db=self.db,
                                      roster=self)
+        self._reindex(self._jids[key])
         if save:
             self._jids[key].save()
 
@@ -292,6 +454,16 @@ class RosterNode(object):
         return self[jid].resources.get(resource,
                                        default_presence)
 
+    def best_resource(self, jid):
+        """
+        Return the online resource of a JID with the highest priority,
+        or None if the JID is offline.
+
+        Arguments:
+            jid -- The JID to lookup.
+        """
+        return self[jid].best_resource
+
     def reset(self):
         """
         Reset the state of the roster to forget any current
@@ -322,6 +494,41 @@ class RosterNode(object):
             kwargs['pfrom'] = self.jid
         self.xmpp.send_presence(**kwargs)
 
+    def broadcast_presence(self, **kwargs):
+        """
+        Send a presence stanza to every contact subscribed to the
+        roster owner's presence, as components must do themselves.
+
+        The presence is built and serialized once, and only the
+        recipient is changed for each contact. The presence becomes
+        the roster node's last_status. Clients, whose presence is
+        broadcast by the server, send a single undirected presence.
+
+        Returns the number of presence stanzas sent.
+
+        Arguments:
+            pshow     -- The presence's show value.
+            pstatus   -- The presence's status message.
+            ppriority -- This connections' priority.
+            pfrom     -- The sender of the presence, which should
+                         be the owner JID plus resource.
+            ptype     -- The type of presence, such as 'unavailable'.
+            pnick     -- Optional nickname of the presence's sender.
+        """
+        if not self.xmpp.is_component:
+            self.send_presence(**kwargs)
+            return 1
+
+        pres = self.xmpp.make_presence(pshow=kwargs.get('pshow'),
+                                       pstatus=kwargs.get('pstatus'),
+                                       ppriority=kwargs.get('ppriority'),
+                                       ptype=kwargs.get('ptype'),
+                                       pfrom=kwargs.get('pfrom') or self.jid,
+                                       pnick=kwargs.get('pnick'))
+        recipients = [jid for jid, item in self._jids.items()
+                      if item['from']]
+        return self.xmpp.send_many(pres, recipients)
+
     def send_last_presence(self):
         if self.last_status is None:
             self.send_presence()
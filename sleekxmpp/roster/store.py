@@ -0,0 +1,449 @@
+"""
+    SleekXMPP: The Sleek XMPP Library
+    Copyright (C) 2010  Nathanael C. Fritz
+    This file is part of SleekXMPP.
+
+    See the file LICENSE for copying permission.
+"""
+
+import json
+import logging
+import threading
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+from sleekxmpp.thirdparty import OrderedDict
+
+
+log = logging.getLogger(__name__)
+
+
+#: The number of seconds a saved roster item may wait before
+#: it is written to the datastore.
+FLUSH_DELAY = 1.0
+
+#: The number of waiting roster items which causes them to be
+#: written without waiting for FLUSH_DELAY to pass.
+FLUSH_BATCH = 1000
+
+#: The roster item fields persisted by the bundled datastores.
+STATE_FIELDS = ('name', 'groups', 'from', 'to', 'pending_in',
+                'pending_out', 'whitelisted', 'subscription')
+
+
+class WriteBehindStore(object):
+
+    """
+    A wrapper for a roster datastore interface which collects saved
+    roster items in memory and writes them to the datastore in
+    batches from a background thread, so that handling presence
+    never waits for storage.
+
+    Only the latest state of an item is written, no matter how many
+    times it was saved in the meantime. Items which are waiting to be
+    written, or are being written, are returned by load(),
+    load_items() and entries(), so the roster always reads its own
+    writes.
+
+    If the wrapped datastore provides a save_many(items) method taking
+    a list of (owner_jid, jid, item_state, db_state) tuples, each
+    batch is written with a single call. Otherwise save() is called
+    for each item. Any other methods, such as version() and
+    set_version(), are passed through to the wrapped datastore.
+
+    Items still waiting when the program exits are lost unless
+    flush() or close() is called. The Roster calls flush() when the
+    stream is disconnected.
+
+    Attributes:
+        db        -- The wrapped datastore interface.
+        delay     -- The number of seconds saved items may wait
+                     before being written. Defaults to FLUSH_DELAY.
+        max_batch -- The number of waiting items which causes a write
+                     to start early. Defaults to FLUSH_BATCH.
+
+    Methods:
+        entries    -- Return the roster owners, or an owner's JIDs.
+        load       -- Return the state of a roster item.
+        load_items -- Return the states of all of an owner's items.
+        save       -- Queue a roster item's state to be written.
+        flush      -- Write all waiting items now.
+        close      -- Write all waiting items and stop the thread.
+        stats      -- Return counters for the saved and written items.
+    """
+
+    def __init__(self, db, delay=FLUSH_DELAY, max_batch=FLUSH_BATCH):
+        """
+        Wrap a datastore interface.
+
+        Arguments:
+            db        -- The datastore interface to write to.
+            delay     -- The number of seconds saved items may wait.
+            max_batch -- The number of waiting items which causes
+                         a write to start early.
+        """
+        self.db = db
+        self.delay = delay
+        self.max_batch = max_batch
+
+        self._pending = OrderedDict()
+        self._writing = {}
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._stats = {'saves': 0,
+                       'writes': 0,
+                       'batches': 0,
+                       'errors': 0}
+
+    def __getattr__(self, name):
+        if name == 'db':
+            raise AttributeError(name)
+        return getattr(self.db, name)
+
+    def entries(self, owner, db_state=None):
+        """
+        Return the JIDs of the roster owners if owner is None, or
+        the JIDs in an owner's roster otherwise.
+
+        Arguments:
+            owner    -- The JID that owns the roster, or None.
+            db_state -- Unused.
+        """
+        result = OrderedDict((jid, None) for jid in
+                             self.db.entries(owner, {}))
+        for (item_owner, jid), (state, _) in self._unwritten():
+            if owner is None:
+                if not state.get('removed'):
+                    result[item_owner] = None
+            elif item_owner == owner:
+                if state.get('removed'):
+                    result.pop(jid, None)
+                else:
+                    result[jid] = None
+        return list(result)
+
+    def load(self, owner, jid, db_state):
+        """
+        Return the state of a roster item, or None if it is unknown.
+
+        Arguments:
+            owner    -- The JID that owns the roster.
+            jid      -- The JID of the roster item.
+            db_state -- The item's datastore specific information.
+        """
+        key = (owner, jid)
+        with self._cond:
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._writing.get(key)
+        if pending is not None:
+            state = pending[0]
+            return None if state.get('removed') else state
+        return self.db.load(owner, jid, db_state)
+
+    def load_items(self, owner):
+        """
+        Return a dictionary mapping the JIDs in an owner's roster to
+        the state of each item.
+
+        The wrapped datastore's load_items() is used if it has one.
+
+        Arguments:
+            owner -- The JID that owns the roster.
+        """
+        if hasattr(self.db, 'load_items'):
+            items = self.db.load_items(owner)
+        else:
+            items = {}
+            for jid in self.db.entries(owner, {}):
+                state = self.db.load(owner, jid, {})
+                if state:
+                    items[jid] = state
+        for (item_owner, jid), (state, _) in self._unwritten():
+            if item_owner == owner:
+                if state.get('removed'):
+                    items.pop(jid, None)
+                else:
+                    items[jid] = state
+        return items
+
+    def save(self, owner, jid, item_state, db_state):
+        """
+        Queue the state of a roster item to be written.
+
+        Arguments:
+            owner      -- The JID that owns the roster.
+            jid        -- The JID of the roster item.
+            item_state -- The item's state fields.
+            db_state   -- The item's datastore specific information.
+        """
+        state = dict(item_state)
+        state['groups'] = list(state.get('groups') or [])
+        with self._cond:
+            key = (owner, jid)
+            self._pending.pop(key, None)
+            self._pending[key] = (state, db_state)
+            self._stats['saves'] += 1
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(
+                        name='roster_write_behind',
+                        target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify()
+
+    def flush(self):
+        """Write all waiting roster items in the calling thread."""
+        while self._write_batch():
+            pass
+
+    def close(self):
+        """Write all waiting roster items and stop the writer thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self.flush()
+
+    def stats(self):
+        """
+        Return a dictionary with the number of save() calls, roster
+        items and batches written, write errors, and items waiting.
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._pending) + len(self._writing)
+        return stats
+
+    def _unwritten(self):
+        """
+        Return the (key, value) pairs of the items which have not been
+        written yet, including those being written, oldest first.
+        """
+        with self._cond:
+            return list(self._writing.items()) + list(self._pending.items())
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._pending) < self.max_batch:
+                    self._cond.wait(self.delay)
+                if self._closed:
+                    self._thread = None
+                    return
+            self.flush()
+
+    def _write_batch(self):
+        """
+        Write up to max_batch waiting items, returning the number
+        of items taken.
+        """
+        with self._write_lock:
+            with self._cond:
+                batch = []
+                while self._pending and len(batch) < self.max_batch:
+                    batch.append(self._pending.popitem(last=False))
+                # Reads keep finding the items until they are written.
+                self._writing = dict(batch)
+            if not batch:
+                return 0
+
+            items = [(owner, jid, state, db_state) for
+                     (owner, jid), (state, db_state) in batch]
+            try:
+                if hasattr(self.db, 'save_many'):
+                    self.db.save_many(items)
+                else:
+                    for item in items:
+                        self.db.save(*item)
+            except Exception:
+                log.exception('Error writing roster items, will retry.')
+                with self._cond:
+                    self._stats['errors'] += 1
+                    # Keep newer saves made while writing.
+                    for key, value in batch:
+                        if key not in self._pending:
+                            self._pending[key] = value
+                    self._writing = {}
+                return 0
+
+            with self._cond:
+                self._writing = {}
+                self._stats['writes'] += len(items)
+                self._stats['batches'] += 1
+            return len(batch)
+
+
+class SQLiteStore(object):
+
+    """
+    A roster datastore interface which keeps roster items and roster
+    versions in an SQLite database file.
+
+    Roster items are written in a single transaction for each batch
+    when used with a WriteBehindStore, and all of an owner's items
+    are read with a single query when the owner's roster is first
+    used.
+
+    The interface may be shared between threads.
+
+    Methods:
+        entries     -- Return the roster owners, or an owner's JIDs.
+        load        -- Return the state of a roster item.
+        load_items  -- Return the states of all of an owner's items.
+        save        -- Store or remove a roster item.
+        save_many   -- Store or remove several roster items at once.
+        version     -- Return an owner's roster version.
+        set_version -- Store an owner's roster version.
+        close       -- Close the database.
+    """
+
+    def __init__(self, path):
+        """
+        Open or create a roster database.
+
+        Arguments:
+            path -- The database file name, or ':memory:'.
+        """
+        if sqlite3 is None:
+            raise ImportError('The sqlite3 module is not available.')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            if path != ':memory:':
+                self._conn.execute('PRAGMA journal_mode=WAL')
+                self._conn.execute('PRAGMA synchronous=NORMAL')
+            with self._conn:
+                self._conn.execute(
+                        'CREATE TABLE IF NOT EXISTS roster_items ('
+                        'owner TEXT NOT NULL, jid TEXT NOT NULL, '
+                        'state TEXT NOT NULL, PRIMARY KEY (owner, jid))')
+                self._conn.execute(
+                        'CREATE TABLE IF NOT EXISTS roster_versions ('
+                        'owner TEXT PRIMARY KEY, version TEXT NOT NULL)')
+
+    def _query(self, sql, args=()):
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    def entries(self, owner, db_state=None):
+        """
+        Return the JIDs of the roster owners if owner is None, or
+        the JIDs in an owner's roster otherwise.
+
+        Arguments:
+            owner    -- The JID that owns the roster, or None.
+            db_state -- Unused.
+        """
+        if owner is None:
+            rows = self._query('SELECT DISTINCT owner FROM roster_items')
+        else:
+            rows = self._query('SELECT jid FROM roster_items '
+                               'WHERE owner = ?', (owner,))
+        return [row[0] for row in rows]
+
+    def load(self, owner, jid, db_state):
+        """
+        Return the state of a roster item, or None if it is unknown.
+
+        Arguments:
+            owner    -- The JID that owns the roster.
+            jid      -- The JID of the roster item.
+            db_state -- Unused.
+        """
+        rows = self._query('SELECT state FROM roster_items '
+                           'WHERE owner = ? AND jid = ?', (owner, jid))
+        if rows:
+            return json.loads(rows[0][0])
+        return None
+
+    def load_items(self, owner):
+        """
+        Return a dictionary mapping the JIDs in an owner's roster to
+        the state of each item.
+
+        Arguments:
+            owner -- The JID that owns the roster.
+        """
+        rows = self._query('SELECT jid, state FROM roster_items '
+                           'WHERE owner = ?', (owner,))
+        return dict((jid, json.loads(state)) for jid, state in rows)
+
+    def save(self, owner, jid, item_state, db_state):
+        """
+        Store a roster item, or remove it if its state is
+        marked as removed.
+
+        Arguments:
+            owner      -- The JID that owns the roster.
+            jid        -- The JID of the roster item.
+            item_state -- The item's state fields.
+            db_state   -- Unused.
+        """
+        self.save_many([(owner, jid, item_state, db_state)])
+
+    def save_many(self, items):
+        """
+        Store or remove several roster items in one transaction.
+
+        Arguments:
+            items -- A list of (owner_jid, jid, item_state, db_state)
+                     tuples.
+        """
+        stored = []
+        removed = []
+        for owner, jid, state, db_state in items:
+            if state.get('removed'):
+                removed.append((owner, jid))
+            else:
+                data = dict((key, state[key]) for key in STATE_FIELDS
+                            if key in state)
+                stored.append((owner, jid, json.dumps(data)))
+        with self._lock:
+            with self._conn:
+                if removed:
+                    self._conn.executemany(
+                            'DELETE FROM roster_items '
+                            'WHERE owner = ? AND jid = ?', removed)
+                if stored:
+                    self._conn.executemany(
+                            'INSERT OR REPLACE INTO roster_items '
+                            '(owner, jid, state) VALUES (?, ?, ?)', stored)
+
+    def version(self, owner):
+        """
+        Return the roster version for an owner, or ''.
+
+        Arguments:
+            owner -- The JID that owns the roster.
+        """
+        rows = self._query('SELECT version FROM roster_versions '
+                           'WHERE owner = ?', (owner,))
+        return rows[0][0] if rows else ''
+
+    def set_version(self, owner, version):
+        """
+        Store the roster version for an owner.
+
+        Arguments:
+            owner   -- The JID that owns the roster.
+            version -- The roster version.
+        """
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                        'INSERT OR REPLACE INTO roster_versions '
+                        '(owner, version) VALUES (?, ?)', (owner, version))
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._conn.close()
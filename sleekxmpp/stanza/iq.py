@@ -8,6 +8,8 @@
 
 from sleekxmpp.stanza.rootstanza import RootStanza
 from sleekxmpp.xmlstream import StanzaBase, ET
+from sleekxmpp.xmlstream.aio import create_future
+from sleekxmpp.xmlstream.sendqueue import PRIORITY_HIGH, PRIORITY_NORMAL
 from sleekxmpp.xmlstream.handler import Waiter, Callback
 from sleekxmpp.xmlstream.matcher import MatchIDSender, MatcherId
 from sleekxmpp.exceptions import IqTimeout, IqError
@@ -158,7 +160,8 @@ class Iq(RootStanza):
         StanzaBase.reply(self, clear)
         return self
 
-    def send(self, block=True, timeout=None, callback=None, now=False, timeout_callback=None):
+    def send(self, block=True, timeout=None, callback=None, now=False, timeout_callback=None,
+             priority=None):
         """
         Send an <iq> stanza over the XML stream.
 
@@ -190,10 +193,24 @@ class Iq(RootStanza):
                         response has been received with the originally-sent IQ
                         stanza.  Only called if there is a callback parameter
                         (and therefore are in async mode).
+            priority -- The lane of the send queue to use. Defaults to
+                        PRIORITY_HIGH for result and error stanzas, so
+                        that answers are not held back by bulk traffic,
+                        and PRIORITY_NORMAL otherwise.
+
+        When the stream is processed on an asyncio event loop, a blocking
+        send made from the loop's thread returns a future for the response
+        stanza instead of waiting for it.
         """
         if timeout is None:
             timeout = self.stream.response_timeout
 
+        if priority is None:
+            if self['type'] in ('result', 'error'):
+                priority = PRIORITY_HIGH
+            else:
+                priority = PRIORITY_NORMAL
+
         if self.stream.session_bind_event.is_set():
             matcher = MatchIDSender({
                 'id': self['id'],
@@ -205,29 +222,30 @@ class Iq(RootStanza):
 
         if callback is not None and self['type'] in ('get', 'set'):
             handler_name = 'IqCallback_%s' % self['id']
+            handler = Callback(handler_name,
+                               matcher,
+                               callback,
+                               once=True)
             if timeout_callback:
                 self.callback = callback
                 self.timeout_callback = timeout_callback
-                self.stream.schedule('IqTimeout_%s' % self['id'],
-                                     timeout,
-                                     self._fire_timeout,
-                                     repeat=False)
-                handler = Callback(handler_name,
-                                   matcher,
-                                   self._handle_result,
-                                   once=True)
+                self.stream.register_response_handler(handler, self['id'],
+                        timeout=timeout,
+                        timeout_callback=self._fire_timeout)
             else:
-                handler = Callback(handler_name,
-                                   matcher,
-                                   callback,
-                                   once=True)
-            self.stream.register_handler(handler)
-            StanzaBase.send(self, now=now)
+                self.stream.register_response_handler(handler, self['id'])
+            StanzaBase.send(self, now=now, priority=priority)
             return handler_name
+        elif block and self['type'] in ('get', 'set') and \
+                self.stream.loop is not None and \
+                self.stream._in_loop_thread():
+            # Blocking would stall the event loop, so return a
+            # future for the response instead.
+            return self._send_future(matcher, timeout, now, priority)
         elif block and self['type'] in ('get', 'set'):
             waitfor = Waiter('IqWait_%s' % self['id'], matcher)
-            self.stream.register_handler(waitfor)
-            StanzaBase.send(self, now=now)
+            self.stream.register_response_handler(waitfor, self['id'])
+            StanzaBase.send(self, now=now, priority=priority)
             result = waitfor.wait(timeout)
             if not result:
                 raise IqTimeout(self)
@@ -235,16 +253,50 @@ class Iq(RootStanza):
                 raise IqError(result)
             return result
         else:
-            return StanzaBase.send(self, now=now)
+            return StanzaBase.send(self, now=now, priority=priority)
+
+    def _send_future(self, matcher, timeout, now, priority=PRIORITY_NORMAL):
+        """
+        Send the stanza and return a future for the response, for use
+        when the stream is processed on an asyncio event loop.
+
+        The future's result is the response stanza. If an error
+        response is received, or no response arrives within the
+        timeout, the future's exception is set to IqError or
+        IqTimeout instead.
 
-    def _handle_result(self, iq):
-        # we got the IQ, so don't fire the timeout
-        self.stream.scheduler.remove('IqTimeout_%s' % self['id'])
-        self.callback(iq)
+        Arguments:
+            matcher -- The matcher used to recognize the response.
+            timeout -- The number of seconds to wait for the response.
+            now     -- Indicates if the send queue should be skipped.
+            priority -- The lane of the send queue to use.
+        """
+        future = create_future(self.stream.loop)
+
+        def handle_response(result):
+            if future.done():
+                return
+            if result['type'] == 'error':
+                future.set_exception(IqError(result))
+            else:
+                future.set_result(result)
+
+        def handle_timeout():
+            if not future.done():
+                future.set_exception(IqTimeout(self))
+
+        handler = Callback('IqFuture_%s' % self['id'],
+                           matcher,
+                           handle_response,
+                           once=True)
+        self.stream.register_response_handler(handler, self['id'],
+                timeout=timeout,
+                timeout_callback=handle_timeout)
+        StanzaBase.send(self, now=now, priority=priority)
+        return future
 
     def _fire_timeout(self):
-        # don't fire the handler for the IQ, if it finally does come in
-        self.stream.remove_handler('IqCallback_%s' % self['id'])
+        # The response handler has already been removed by the stream.
         self.timeout_callback(self)
 
     def _set_stanza_values(self, values):
@@ -23,6 +23,7 @@ class TestLiveSocket(object):
         next_recv -- Return the next received stanza.
         recv_data -- Dummy method to have same interface as TestSocket.
         recv      -- Read the next stanza from the socket.
+        recv_into -- Read the next stanza into a buffer.
         send      -- Write a stanza to the socket.
         makefile  -- Dummy call, returns self.
         read      -- Read the next stanza from the socket.
@@ -125,6 +126,20 @@ class TestLiveSocket(object):
             self.recv_queue.put(data)
         return data
 
+    def recv_into(self, buffer, nbytes=0, flags=0):
+        """
+        Read data from the socket into a buffer.
+
+        Store a copy in the receive queue.
+
+        Arguments:
+            Placeholders. Same as for socket.recv_into.
+        """
+        size = self.socket.recv_into(buffer, nbytes, flags)
+        with self.recv_queue_lock:
+            self.recv_queue.put(bytes(buffer[:size]))
+        return size
+
     def send(self, data):
         """
         Send data on the socket.
@@ -21,6 +21,7 @@ class TestSocket(object):
         next_sent -- Return the next sent stanza.
         recv_data -- Make a stanza available to read next.
         recv      -- Read the next stanza from the socket.
+        recv_into -- Read the next stanza into a buffer.
         send      -- Write a stanza to the socket.
         makefile  -- Dummy call, returns self.
         read      -- Read the next stanza from the socket.
@@ -38,6 +39,7 @@ class TestSocket(object):
         self.send_queue = Queue()
         self.is_live = False
         self.disconnected = False
+        self.recv_remainder = b''
 
     def __getattr__(self, name):
         """
@@ -109,6 +111,26 @@ class TestSocket(object):
             raise socket.error
         return self.read(block=True)
 
+    def recv_into(self, buffer, nbytes=0, flags=0):
+        """
+        Read a value from the received queue into a buffer. Any part
+        of the value that does not fit is kept for the next read.
+
+        Arguments:
+            buffer -- A writable buffer, such as a bytearray.
+            nbytes -- Optional maximum number of bytes to read.
+            flags  -- Placeholder. Same as for socket.Socket.recv_into.
+        """
+        data = self.recv_remainder
+        if not data:
+            data = self.recv()
+            if not isinstance(data, bytes):
+                data = data.encode('utf-8')
+        size = min(nbytes or len(buffer), len(data))
+        buffer[:size] = data[:size]
+        self.recv_remainder = data[size:]
+        return size
+
     def send(self, data):
         """
         Send data by placing it in the send queue.
@@ -124,6 +124,13 @@ class Mech(object):
     def process(self, challenge=b''):
         return b''
 
+    def fail(self):
+        """
+        Called when authentication using the mechanism has failed,
+        so that anything kept for later attempts can be discarded.
+        """
+        pass
+
 
 def choose(mech_list, credentials, security_settings, limit=None, min_mech=None):
     available_mechs = set(MECHANISMS.keys())
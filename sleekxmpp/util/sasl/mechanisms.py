@@ -18,10 +18,17 @@
 import sys
 import hmac
 import random
+import threading
 
 from base64 import b64encode, b64decode
 
+try:
+    from hashlib import pbkdf2_hmac
+except ImportError:
+    pbkdf2_hmac = None
+
 from sleekxmpp.util import bytes, hash, XOR, quote, num_to_bytes
+from sleekxmpp.thirdparty import OrderedDict
 from sleekxmpp.util.sasl.client import sasl_mech, Mech, \
                                        SASLCancelled, SASLFailed, \
                                        SASLMutualAuthFailed
@@ -179,6 +186,15 @@ class CRAM(Mech):
         return username + b' ' + bytes(mac.hexdigest())
 
 
+#: The number of SCRAM key sets kept for reuse when authenticating
+#: again with the same password, salt and iteration count. Entries
+#: are keyed by an HMAC of the password, never the password itself.
+SCRAM_CACHE_SIZE = 64
+
+_scram_cache = OrderedDict()
+_scram_cache_lock = threading.Lock()
+
+
 @sasl_mech(60)
 class SCRAM(Mech):
 
@@ -206,12 +222,15 @@ class SCRAM(Mech):
 
         self.step = 0
         self._mutual_auth = False
+        self._cache_key = None
 
     def HMAC(self, key, msg):
         return hmac.HMAC(key=key, msg=msg, digestmod=self.hash).digest()
 
     def Hi(self, text, salt, iterations):
         text = bytes(text)
+        if pbkdf2_hmac is not None:
+            return pbkdf2_hmac(self.hash().name, text, salt, iterations)
         ui1 = self.HMAC(text, salt + b'\0\0\0\01')
         ui = ui1
         for i in range(iterations - 1):
@@ -222,6 +241,38 @@ class SCRAM(Mech):
     def H(self, text):
         return self.hash(text).digest()
 
+    def keys(self, password, salt, iterations):
+        """
+        Return the SaltedPassword, ClientKey and ServerKey for a
+        password, reusing the keys from an earlier authentication
+        with the same salt and iteration count, as happens when
+        reconnecting, instead of deriving them again.
+        """
+        key = (self.hash_name, self.HMAC(salt, bytes(password)), iterations)
+        self._cache_key = key
+        with _scram_cache_lock:
+            keys = _scram_cache.pop(key, None)
+            if keys is not None:
+                _scram_cache[key] = keys
+                return keys
+
+        salted_password = self.Hi(password, salt, iterations)
+        keys = (salted_password,
+                self.HMAC(salted_password, b'Client Key'),
+                self.HMAC(salted_password, b'Server Key'))
+
+        with _scram_cache_lock:
+            _scram_cache[key] = keys
+            while len(_scram_cache) > SCRAM_CACHE_SIZE:
+                _scram_cache.popitem(last=False)
+        return keys
+
+    def fail(self):
+        """Forget the cached keys used for the failed attempt."""
+        if self._cache_key is not None:
+            with _scram_cache_lock:
+                _scram_cache.pop(self._cache_key, None)
+
     def saslname(self, value):
         value = value.decode("utf-8")
         escaped = []
@@ -295,17 +346,14 @@ class SCRAM(Mech):
         client_final_message_without_proof = channel_binding + b',' + \
                                              b'r=' + nonce
 
-        salted_password = self.Hi(self.credentials['password'],
-                                       salt,
-                                       iteration_count)
-        client_key = self.HMAC(salted_password, b'Client Key')
+        salted_password, client_key, server_key = self.keys(
+                self.credentials['password'], salt, iteration_count)
         stored_key = self.H(client_key)
         auth_message = self.client_first_message_bare + b',' + \
                        challenge + b',' + \
                        client_final_message_without_proof
         client_signature = self.HMAC(stored_key, auth_message)
         client_proof = XOR(client_key, client_signature)
-        server_key = self.HMAC(salted_password, b'Server Key')
 
         self.server_signature = self.HMAC(server_key, auth_message)
 
@@ -320,9 +368,11 @@ class SCRAM(Mech):
         error = data.get(b'e', 'Unknown error')
 
         if not verifier:
+            self.fail()
             raise SASLFailed(error)
 
         if b64decode(verifier) != self.server_signature:
+            self.fail()
             raise SASLMutualAuthFailed()
 
         self._mutual_auth = True
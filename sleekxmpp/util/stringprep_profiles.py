@@ -22,10 +22,26 @@ from unicodedata import ucd_3_2_0 as unicodedata
 from sleekxmpp.util import unicode
 
 
+#: The largest number of non-ASCII characters a profile remembers
+#: the mapping and checks for.
+LOOKUP_CACHE_SIZE = 65536
+
+
 class StringPrepError(UnicodeError):
     pass
 
 
+def _encodes_ascii(data):
+    try:
+        data.encode('ascii')
+    except UnicodeError:
+        return False
+    return True
+
+#: Return ``True`` if a string only contains ASCII characters.
+is_ascii = getattr(unicode, 'isascii', _encodes_ascii)
+
+
 def b1_mapping(char):
     """Map characters that are commonly mapped to nothing."""
     return '' if stringprep.in_table_b1(char) else None
@@ -134,17 +150,112 @@ def create(nfkc=True, bidi=True, mappings=None,
     :return: Unicode string of the resulting text passing the
              profile's requirements.
     """
+    mappings = mappings or []
+    prohibited = prohibited or []
+
+    # Find the result of the profile for each ASCII character. Runs
+    # of ASCII characters can not be changed by NFKC normalization or
+    # fail the bidi checks, so an ASCII string is mapped by using the
+    # table, if none of its characters are prohibited.
+    ascii_table = {}
+    ascii_prohibited = set()
+    ascii_fast = True
+    for code in range(128):
+        char = unicode(chr(code))
+        result = normalize(map_input(char, mappings), nfkc)
+        if result != char:
+            ascii_table[code] = result
+        for out in result:
+            if any(check(out) for check in prohibited):
+                ascii_prohibited.add(char)
+            if not is_ascii(out) or stringprep.in_table_c8(out) or \
+               stringprep.in_table_d1(out):
+                ascii_fast = False
+
+    # Other characters have their mapping, prohibition and bidi
+    # category looked up once and remembered.
+    char_map = {}
+    char_prohibited = {}
+    char_bidi = {}
+
+    def remember(cache, char, value):
+        if len(cache) < LOOKUP_CACHE_SIZE:
+            cache[char] = value
+        return value
+
+    def map_chars(data):
+        result = []
+        for char in data:
+            try:
+                result.append(char_map[char])
+            except KeyError:
+                result.append(remember(char_map, char,
+                                       map_input(char, mappings)))
+        return ''.join(result)
+
+    def prohibit_chars(data):
+        for char in data:
+            try:
+                bad = char_prohibited[char]
+            except KeyError:
+                bad = remember(char_prohibited, char,
+                               any(check(char) for check in prohibited))
+            if bad:
+                raise StringPrepError("Prohibited code point: %s" % char)
+
+    def bidi_category(char):
+        try:
+            return char_bidi[char]
+        except KeyError:
+            if stringprep.in_table_c8(char):
+                category = 'C8'
+            elif stringprep.in_table_d1(char):
+                category = 'R'
+            elif stringprep.in_table_d2(char):
+                category = 'L'
+            else:
+                category = None
+            return remember(char_bidi, char, category)
+
+    def check_bidi_chars(data):
+        if not data:
+            return
+
+        has_lcat = False
+        has_randal = False
+
+        for char in data:
+            category = bidi_category(char)
+            if category == 'C8':
+                raise StringPrepError("BIDI violation: seciton 6 (1)")
+            if category == 'R':
+                has_randal = True
+            elif category == 'L':
+                has_lcat = True
+
+        if has_randal and has_lcat:
+            raise StringPrepError("BIDI violation: section 6 (2)")
+
+        first_randal = bidi_category(data[0]) == 'R'
+        last_randal = bidi_category(data[-1]) == 'R'
+        if has_randal and not (first_randal and last_randal):
+            raise StringPrepError("BIDI violation: section 6 (3)")
+
     def profile(data, query=False):
         try:
             data = unicode(data)
         except UnicodeError:
             raise StringPrepError
 
-        data = map_input(data, mappings)
+        if ascii_fast and not (query and unassigned) and \
+           is_ascii(data) and ascii_prohibited.isdisjoint(data):
+            return data.translate(ascii_table)
+
+        data = map_chars(data)
         data = normalize(data, nfkc)
-        prohibit_output(data, prohibited)
+        prohibit_chars(data)
         if bidi:
-            check_bidi(data)
+            check_bidi_chars(data)
         if query and unassigned:
             check_unassigned(data, unassigned)
         return data
@@ -13,7 +13,8 @@ from sleekxmpp.xmlstream.stanzabase import register_stanza_plugin
 from sleekxmpp.xmlstream.tostring import tostring
 from sleekxmpp.xmlstream.xmlstream import XMLStream, RESPONSE_TIMEOUT
 from sleekxmpp.xmlstream.xmlstream import RestartStream
+from sleekxmpp.xmlstream.pool import SessionPool
 
 __all__ = ['JID', 'Scheduler', 'StanzaBase', 'ElementBase',
            'ET', 'StateMachine', 'tostring', 'XMLStream',
-           'RESPONSE_TIMEOUT', 'RestartStream']
+           'RESPONSE_TIMEOUT', 'RestartStream', 'SessionPool']
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+    sleekxmpp.xmlstream.aio
+    ~~~~~~~~~~~~~~~~~~~~~~~
+
+    This module provides the pieces needed to run an XML stream on
+    an :mod:`asyncio` event loop instead of in separate threads.
+
+    Nothing here relies on coroutine syntax; everything is driven by
+    plain loop callbacks so that the module may still be imported by
+    Python versions without :mod:`asyncio`.
+
+    Part of SleekXMPP: The Sleek XMPP Library
+
+    :copyright: (c) 2011 Nathanael C. Fritz
+    :license: MIT, see LICENSE for more details
+"""
+
+import threading
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+
+def create_future(loop):
+    """Return a new future bound to the given event loop.
+
+    :param loop: An :mod:`asyncio` event loop.
+    """
+    if hasattr(loop, 'create_future'):
+        return loop.create_future()
+    return asyncio.Future(loop=loop)
+
+
+class LoopQueue(object):
+
+    """
+    A stand-in for :class:`~queue.Queue` that hands each item to a
+    function on an event loop instead of storing it for a consumer
+    thread.
+
+    Putting ``None`` into the queue, which is used to wake up the
+    threads of a threaded stream, is ignored.
+
+    :param loop: The :mod:`asyncio` event loop.
+    :param callback: The function to execute on the loop for each item.
+    """
+
+    def __init__(self, loop, callback):
+        self.loop = loop
+        self.callback = callback
+
+    def put(self, item, block=True, timeout=None, priority=None,
+            force=False):
+        """Schedule the callback to process an item on the loop.
+
+        Items are processed in the order they were added, whatever
+        their priority.
+        """
+        if item is not None:
+            self.loop.call_soon_threadsafe(self.callback, item)
+        return True
+
+    def put_nowait(self, item, priority=None):
+        return self.put(item)
+
+    def release(self):
+        pass
+
+    def qsize(self):
+        return 0
+
+    def empty(self):
+        return True
+
+    def task_done(self):
+        pass
+
+    def join(self):
+        """Items are processed by the loop, so there is nothing to
+        wait for.
+        """
+        pass
+
+
+class NotifyingEvent(object):
+
+    """
+    A wrapper for :class:`threading.Event` which executes a function
+    each time the event is set.
+
+    :param callback: The function to execute when the event is set.
+    :param event: Optional existing event whose state is shared.
+    """
+
+    def __init__(self, callback, event=None):
+        self.callback = callback
+        self.event = event if event is not None else threading.Event()
+
+    def set(self):
+        self.event.set()
+        self.callback()
+
+    def clear(self):
+        self.event.clear()
+
+    def is_set(self):
+        return self.event.is_set()
+
+    isSet = is_set
+
+    def wait(self, timeout=None):
+        return self.event.wait(timeout)
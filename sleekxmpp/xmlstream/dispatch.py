@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+"""
+    sleekxmpp.xmlstream.dispatch
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    This module provides an index of stream handlers so that an
+    incoming stanza is only compared against the handlers which
+    could possibly match it, a table of handlers waiting for
+    responses to sent requests, and an event queue split into
+    shards so that events may be processed in parallel.
+
+    Part of SleekXMPP: The Sleek XMPP Library
+
+    :copyright: (c) 2011 Nathanael C. Fritz
+    :license: MIT, see LICENSE for more details
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+from sleekxmpp.util import Queue
+
+
+class HandlerIndex(object):
+
+    """
+    A registry of stream handlers, bucketed by the dispatch keys
+    reported by each handler's matcher.
+
+    A dispatch key is a tuple describing something that every stanza
+    accepted by a matcher must have, such as its root element tag or
+    its ``'id'`` value. The supported key forms are:
+
+        :``('tag', tag)``: The stanza's root element tag, in
+                           ``'{namespace}name'`` form.
+        :``('tag', tag, child)``: A root element tag along with the
+                                  tag of one of its direct children.
+        :``('path', name)``: A stanza path root name, which may be the
+                             stanza's name, its ``plugin_attrib`` value,
+                             or the name of a loaded plugin.
+        :``('path', name, type)``: A stanza path root name along with
+                                   the required ``'type'`` interface value.
+        :``('id', id)``: The stanza's ``'id'`` interface value.
+
+    Handlers that do not report any dispatch keys are checked against
+    every stanza. Candidate handlers are always returned in the order
+    they were registered.
+
+    Bucket lists are never modified in place; they are replaced on
+    each change so that the stream reader can iterate them without
+    holding a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+
+        #: Registered handlers, mapped to their sequence number
+        #: and the dispatch keys they were indexed with.
+        self._entries = {}
+
+        #: Handlers mapped by name, in registration order.
+        self._names = {}
+
+        #: Dispatch keys mapped to lists of ``(seq, handler)`` tuples.
+        self._buckets = {}
+
+        #: Handlers that must be checked against every stanza.
+        self._unindexed = []
+
+        self._typed_paths = 0
+        self._ids = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        entries = list(self._entries.items())
+        entries.sort(key=lambda entry: entry[1][0])
+        return iter([handler for handler, _ in entries])
+
+    def add(self, handler):
+        """Add a handler to the index.
+
+        :param handler: A :class:`~sleekxmpp.xmlstream.handler.base.BaseHandler`
+                        derived object.
+        """
+        keys = getattr(handler, 'dispatch_keys', None)
+        keys = keys() if keys is not None else None
+        if keys is not None:
+            keys = set(keys)
+
+        with self._lock:
+            seq = next(self._seq)
+            entry = (seq, handler)
+            self._entries[handler] = (seq, keys)
+            self._names[handler.name] = self._names.get(handler.name, []) + \
+                                        [handler]
+            if keys is None:
+                self._unindexed = self._unindexed + [entry]
+            else:
+                for key in keys:
+                    self._buckets[key] = self._buckets.get(key, []) + [entry]
+                    self._count_key(key, 1)
+
+    def remove(self, handler):
+        """Remove a handler from the index.
+
+        Returns ``True`` if the handler had been registered.
+
+        :param handler: The handler object to remove.
+        """
+        with self._lock:
+            if handler not in self._entries:
+                return False
+            seq, keys = self._entries.pop(handler)
+
+            named = [h for h in self._names[handler.name] if h is not handler]
+            if named:
+                self._names[handler.name] = named
+            else:
+                del self._names[handler.name]
+
+            if keys is None:
+                self._unindexed = [e for e in self._unindexed if e[0] != seq]
+            else:
+                for key in keys:
+                    bucket = [e for e in self._buckets[key] if e[0] != seq]
+                    if bucket:
+                        self._buckets[key] = bucket
+                    else:
+                        del self._buckets[key]
+                    self._count_key(key, -1)
+            return True
+
+    def remove_name(self, name):
+        """Remove the earliest registered handler with the given name.
+
+        Returns ``True`` if a handler was removed.
+
+        :param string name: The name of the handler.
+        """
+        named = self._names.get(name)
+        if not named:
+            return False
+        return self.remove(named[0])
+
+    def candidates(self, stanza):
+        """Return the handlers which may match a stanza, in the
+        order they were registered.
+
+        :param stanza: The :class:`~sleekxmpp.xmlstream.stanzabase.ElementBase`
+                       object to dispatch.
+        """
+        found = dict(self._unindexed)
+        buckets = self._buckets
+        if buckets:
+            for key in self._probe_keys(stanza):
+                bucket = buckets.get(key)
+                if bucket:
+                    found.update(bucket)
+        return [found[seq] for seq in sorted(found)]
+
+    def _probe_keys(self, stanza):
+        """Generate every dispatch key that a stanza may satisfy."""
+        xml = getattr(stanza, 'xml', stanza)
+        tag = xml.tag
+        yield ('tag', tag)
+        for child in xml:
+            yield ('tag', tag, child.tag)
+
+        if not hasattr(stanza, 'loaded_plugins'):
+            return
+
+        names = set(stanza.loaded_plugins)
+        names.add(stanza.name)
+        names.add(stanza.plugin_attrib)
+        stype = stanza['type'] if self._typed_paths else None
+        for name in names:
+            yield ('path', name)
+            if stype is not None:
+                yield ('path', name, stype)
+
+        if self._ids:
+            yield ('id', stanza['id'])
+
+    def _count_key(self, key, delta):
+        if key[0] == 'path' and len(key) > 2:
+            self._typed_paths += delta
+        elif key[0] == 'id':
+            self._ids += delta
+
+
+class ResponseTable(object):
+
+    """
+    A table of handlers waiting for responses to requests sent on
+    the stream, such as the result of an ``<iq type="get" />``.
+
+    Handlers are keyed by the ``'id'`` of the request, so that finding
+    the handlers for a response does not depend on the number of
+    requests in flight. The handler's own matcher is still used to
+    verify the response, for example to check the sender's JID.
+
+    Response timeouts are kept in a heap of deadlines in the same
+    table. Expiring entries is driven externally through
+    :meth:`expire()`; the table only tracks which expiry checks have
+    already been requested so that at most one is outstanding for
+    each distinct earliest deadline.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+
+        #: Handlers mapped to their ``(seq, id, timeout_callback)`` entry.
+        self._entries = {}
+
+        #: Request ``'id'`` values mapped to lists of waiting handlers.
+        self._ids = {}
+
+        #: Handlers mapped by name, in registration order.
+        self._names = {}
+
+        #: A heap of ``(deadline, seq, handler)`` tuples.
+        self._deadlines = []
+
+        #: Deadlines for which an expiry check has been requested.
+        self._armed = set()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, handler, sid, timeout=None, timeout_callback=None):
+        """Add a handler for the response to the request with the
+        given ``'id'`` value.
+
+        If the handler has a timeout, the deadline at which
+        :meth:`expire()` should next be called is returned if no
+        earlier check is already pending. Otherwise, ``None``
+        is returned.
+
+        :param handler: The handler waiting for the response.
+        :param string sid: The ``'id'`` value of the request.
+        :param timeout: Optional number of seconds to wait for the
+                        response before the entry expires.
+        :param timeout_callback: Function to execute if the entry
+                                 expires without a response.
+        """
+        with self._lock:
+            seq = next(self._seq)
+            self._entries[handler] = (seq, sid, timeout_callback)
+            self._ids[sid] = self._ids.get(sid, []) + [handler]
+            self._names[handler.name] = self._names.get(handler.name, []) + \
+                                        [handler]
+            if timeout is None:
+                return None
+            deadline = time.time() + timeout
+            heapq.heappush(self._deadlines, (deadline, seq, handler))
+            return self._arm(deadline)
+
+    def remove(self, handler):
+        """Remove a handler from the table.
+
+        Returns ``True`` if the handler was waiting for a response.
+
+        :param handler: The handler object to remove.
+        """
+        with self._lock:
+            return self._remove(handler)
+
+    def remove_name(self, name):
+        """Remove the earliest added handler with the given name.
+
+        Returns ``True`` if a handler was removed.
+
+        :param string name: The name of the handler.
+        """
+        with self._lock:
+            named = self._names.get(name)
+            if not named:
+                return False
+            return self._remove(named[0])
+
+    def match(self, stanza):
+        """Return the waiting handlers that accept a response stanza.
+
+        :param stanza: The :class:`~sleekxmpp.xmlstream.stanzabase.ElementBase`
+                       object received on the stream.
+        """
+        if not self._entries:
+            return []
+        waiting = self._ids.get(stanza['id'])
+        if not waiting:
+            return []
+        return [handler for handler in waiting if handler.match(stanza)]
+
+    def expire(self, checked=None, now=None):
+        """Remove the entries whose deadlines have passed.
+
+        Returns a tuple of the expired entries as ``(handler,
+        timeout_callback)`` pairs, and the deadline at which
+        :meth:`expire()` should be called next, or ``None`` if no
+        new check is needed.
+
+        :param checked: The deadline this check was requested for,
+                        as returned by :meth:`add()` or :meth:`expire()`.
+        :param now: The current time. Defaults to :func:`time.time()`.
+        """
+        if now is None:
+            now = time.time()
+        expired = []
+        with self._lock:
+            self._armed.discard(checked)
+            deadlines = self._deadlines
+            while deadlines:
+                deadline, seq, handler = deadlines[0]
+                entry = self._entries.get(handler)
+                if entry is None or entry[0] != seq:
+                    # The response was received or the handler removed.
+                    heapq.heappop(deadlines)
+                elif deadline <= now:
+                    heapq.heappop(deadlines)
+                    self._remove(handler)
+                    expired.append((handler, entry[2]))
+                else:
+                    return expired, self._arm(deadline)
+        return expired, None
+
+    def _arm(self, deadline):
+        for armed in self._armed:
+            if armed <= deadline:
+                return None
+        self._armed.add(deadline)
+        return deadline
+
+    def _remove(self, handler):
+        entry = self._entries.pop(handler, None)
+        if entry is None:
+            return False
+        seq, sid, _ = entry
+
+        waiting = [h for h in self._ids[sid] if h is not handler]
+        if waiting:
+            self._ids[sid] = waiting
+        else:
+            del self._ids[sid]
+
+        named = [h for h in self._names[handler.name] if h is not handler]
+        if named:
+            self._names[handler.name] = named
+        else:
+            del self._names[handler.name]
+        return True
+
+
+def shard_key(data):
+    """Return the key used to choose the shard for an event's data.
+
+    Stanzas are keyed by the bare JID of their sender, which for
+    groupchat traffic is the JID of the room. Other data, and stanzas
+    without a sender, use the key ``None``.
+
+    :param data: The stanza or other data the event is for.
+    """
+    interfaces = getattr(data, 'interfaces', None)
+    if not interfaces or 'from' not in interfaces:
+        return None
+    return data['from'].bare or None
+
+
+class ShardedQueue(object):
+
+    """
+    An event queue split into several queues, each of which is meant
+    to be consumed by a single event runner thread.
+
+    Items are assigned to a shard using the key returned by
+    :func:`shard_key()` for the item's data, so that all events for
+    the same sender are processed in order, while events for other
+    senders may be processed in parallel. Items with no key, such as
+    scheduled tasks, always go to the first shard, which is the queue
+    that was being used before sharding.
+
+    Wakeup (``None``) and ``'quit'`` items are given to every shard.
+
+    :param queue: The existing event queue, used as the first shard.
+    :param int shards: The total number of shards.
+    :param key: Optional function to use instead of :func:`shard_key()`.
+    """
+
+    def __init__(self, queue, shards, key=shard_key):
+        #: The queue for each shard.
+        self.queues = [queue] + [Queue() for _ in range(shards - 1)]
+        self.key = key
+
+    def __len__(self):
+        return len(self.queues)
+
+    def put(self, item, block=True, timeout=None):
+        """Add an item to the queue of the shard for its data.
+
+        :param tuple item: The event queue item.
+        """
+        if item is None or item[0] == 'quit':
+            for queue in self.queues:
+                queue.put(item, block, timeout)
+        else:
+            self.shard(item).put(item, block, timeout)
+
+    def put_nowait(self, item):
+        self.put(item, False)
+
+    def shard(self, item):
+        """Return the queue for an event queue item.
+
+        :param tuple item: The event queue item.
+        """
+        if item[0] == 'schedule' or len(item) < 3:
+            return self.queues[0]
+        key = self.key(item[2])
+        if key is None:
+            return self.queues[0]
+        return self.queues[hash(key) % len(self.queues)]
+
+    def qsize(self):
+        return sum(queue.qsize() for queue in self.queues)
+
+    def empty(self):
+        return not self.qsize()
@@ -54,6 +54,18 @@ class BaseHandler(object):
         """
         return self._matcher.match(xml)
 
+    def dispatch_keys(self):
+        """Return the dispatch keys of the handler's matcher, used to
+        index the handler by the stanzas it may accept.
+
+        Handlers which override :meth:`match()` should also override
+        this method to return ``None``.
+        """
+        keys = getattr(self._matcher, 'dispatch_keys', None)
+        if keys is None:
+            return None
+        return keys()
+
     def prerun(self, payload):
         """Prepare the handler for execution while the XML
         stream is being processed.
@@ -29,3 +29,14 @@ class MatcherBase(object):
         Meant to be overridden.
         """
         return False
+
+    def dispatch_keys(self):
+        """Return the dispatch keys which every matching stanza must have.
+
+        Used by :class:`~sleekxmpp.xmlstream.dispatch.HandlerIndex` to
+        avoid checking stanzas that can not match. Returning ``None``
+        means that every stanza must be checked.
+
+        Meant to be overridden.
+        """
+        return None
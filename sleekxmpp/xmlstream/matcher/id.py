@@ -27,3 +27,7 @@ class MatcherId(MatcherBase):
                     stanza to compare against.
         """
         return xml['id'] == self._criteria
+
+    def dispatch_keys(self):
+        """Only stanzas with the stored ``id`` value can match."""
+        return [('id', self._criteria)]
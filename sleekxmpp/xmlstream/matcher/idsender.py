@@ -45,3 +45,7 @@ class MatchIDSender(MatcherBase):
             return xml['id'] == self._criteria['id'] and allowed[_from]
         except KeyError:
             return False
+
+    def dispatch_keys(self):
+        """Only stanzas with the stored ``id`` value can match."""
+        return [('id', self._criteria['id'])]
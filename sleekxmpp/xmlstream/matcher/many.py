@@ -38,3 +38,17 @@ class MatchMany(MatcherBase):
             if m.match(xml):
                 return True
         return False
+
+    def dispatch_keys(self):
+        """
+        Combine the dispatch keys of each of the criteria. If any
+        of the criteria can not be indexed, neither can this matcher.
+        """
+        keys = []
+        for m in self._criteria:
+            m_keys = getattr(m, 'dispatch_keys', None)
+            m_keys = m_keys() if m_keys is not None else None
+            if m_keys is None:
+                return None
+            keys.extend(m_keys)
+        return keys
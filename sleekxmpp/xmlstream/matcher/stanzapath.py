@@ -10,7 +10,7 @@
 """
 
 from sleekxmpp.xmlstream.matcher.base import MatcherBase
-from sleekxmpp.xmlstream.stanzabase import fix_ns
+from sleekxmpp.xmlstream.stanzabase import fix_ns, compile_path
 
 
 class StanzaPath(MatcherBase):
@@ -28,6 +28,7 @@ class StanzaPath(MatcherBase):
                                           propagate_ns=False,
                                           default_ns='jabber:client')
         self._raw_criteria = criteria
+        self._path = compile_path(self._criteria)
 
     def match(self, stanza):
         """
@@ -40,4 +41,22 @@ class StanzaPath(MatcherBase):
         :param stanza: The :class:`~sleekxmpp.xmlstream.stanzabase.ElementBase`
                        stanza to compare against.
         """
-        return stanza.match(self._criteria) or stanza.match(self._raw_criteria)
+        return stanza._match_path(self._path, 0)
+
+    def dispatch_keys(self):
+        """
+        Only stanzas whose name, ``plugin_attrib``, or loaded plugins
+        include the root of the stanza path can match. If the root
+        also checks the ``'type'`` interface, that value is required
+        as well.
+        """
+        if not self._criteria:
+            return None
+        components = self._criteria[0].split('@')
+        tag = components[0]
+        if not tag or tag == '*':
+            return None
+        for attribute in components[1:]:
+            if attribute.startswith('type='):
+                return [('path', tag, attribute[5:])]
+        return [('path', tag)]
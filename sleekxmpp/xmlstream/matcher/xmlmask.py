@@ -61,6 +61,24 @@ class MatchXMLMask(MatcherBase):
             xml = xml.xml
         return self._mask_cmp(xml, self._criteria, True)
 
+    def dispatch_keys(self):
+        """
+        Only stanzas whose root element tag matches the root of the
+        mask, either as given or using the default namespace, can
+        match. If the mask includes subelements, the first one must
+        be present as a child of the stanza.
+        """
+        mask = self._criteria
+        if not hasattr(mask, 'attrib'):
+            return None
+        tags = [mask.tag]
+        if '}' not in mask.tag:
+            tags.append("{%s}%s" % (self.default_ns, mask.tag))
+        children = list(mask)
+        if children:
+            return [('tag', tag, children[0].tag) for tag in tags]
+        return [('tag', tag) for tag in tags]
+
     def _mask_cmp(self, source, mask, use_ns=False, default_ns='__no_ns__'):
         """Compare an XML object against an XML mask.
 
@@ -9,10 +9,19 @@
     :license: MIT, see LICENSE for more details
 """
 
+import re
+
 from sleekxmpp.xmlstream.stanzabase import ET, fix_ns
 from sleekxmpp.xmlstream.matcher.base import MatcherBase
 
 
+#: A single XPath step naming an element, with an optional predicate.
+STEP_RE = re.compile(r'^((?:\{[^}]*\})?[A-Za-z_][\w.\-]*)(?:\[.*\])?$')
+
+#: Splits an XPath expression on slashes that are not inside a namespace.
+STEP_SPLIT_RE = re.compile(r'/(?![^{]*\})')
+
+
 class MatchXPath(MatcherBase):
 
     """
@@ -34,6 +43,29 @@ class MatchXPath(MatcherBase):
 
     def __init__(self, criteria):
         self._criteria = fix_ns(criteria)
+        self._compile()
+
+    def _compile(self):
+        """
+        Split the expression into the tag that the stanza's root element
+        must have and the path to search for beneath it, so that stanzas
+        can be matched without wrapping them in another element.
+
+        Expressions whose first step is not a plain element name, such
+        as wildcards or predicates, are matched using a wrapper element.
+        """
+        self._root = None
+        self._rest = None
+        first = STEP_SPLIT_RE.split(self._criteria, 1)[0]
+        root = STEP_RE.match(first)
+        if root is None or root.group(1) != first:
+            return
+        self._root = first
+        rest = self._criteria[len(first):]
+        if rest.startswith('//'):
+            self._rest = '.' + rest
+        elif rest:
+            self._rest = rest[1:] or None
 
     def match(self, xml):
         """
@@ -53,7 +85,27 @@ class MatchXPath(MatcherBase):
         """
         if hasattr(xml, 'xml'):
             xml = xml.xml
+        if self._root is not None:
+            if xml.tag != self._root:
+                return False
+            return self._rest is None or xml.find(self._rest) is not None
         x = ET.Element('x')
         x.append(xml)
 
         return x.find(self._criteria) is not None
+
+    def dispatch_keys(self):
+        """
+        Only stanzas whose root element tag matches the first step of
+        the XPath expression can match. If the second step also names
+        an element, the root element must have a child with that tag.
+        """
+        steps = STEP_SPLIT_RE.split(self._criteria)
+        root = STEP_RE.match(steps[0])
+        if root is None:
+            return None
+        if len(steps) > 1:
+            child = STEP_RE.match(steps[1])
+            if child is not None:
+                return [('tag', root.group(1), child.group(1))]
+        return [('tag', root.group(1))]
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+    sleekxmpp.xmlstream.pool
+    ~~~~~~~~~~~~~~~~~~~~~~~~
+
+    This module provides a way to run many XML streams from a single
+    selector based event loop, sharing one pool of worker threads for
+    blocking operations and threaded handlers.
+
+    Part of SleekXMPP: The Sleek XMPP Library
+
+    :copyright: (c) 2011 Nathanael C. Fritz
+    :license: MIT, see LICENSE for more details
+"""
+
+import logging
+import threading
+
+from sleekxmpp.xmlstream.workers import WorkerPool
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None
+
+
+log = logging.getLogger(__name__)
+
+#: The default number of worker threads shared by the sessions in
+#: a :class:`SessionPool`.
+POOL_WORKERS = 8
+
+
+class SessionPool(object):
+
+    """
+    Drive multiple :class:`~sleekxmpp.xmlstream.xmlstream.XMLStream`
+    sessions from one :mod:`asyncio` event loop.
+
+    Each stream is processed with ``process(loop=...)``, so reading,
+    writing, scheduling and handler dispatch for every session take
+    place in the thread running the pool, instead of in a set of
+    threads per session. Connecting and reconnecting use the loop's
+    executor, and handlers registered with ``threaded=True`` use a
+    :class:`~sleekxmpp.xmlstream.workers.WorkerPool` shared by all
+    sessions.
+
+    Example::
+
+        pool = SessionPool()
+        for jid, password in accounts:
+            xmpp = ClientXMPP(jid, password)
+            pool.add(xmpp)
+        pool.run()
+
+    :param loop: Optional event loop to use. Defaults to a new
+                 :class:`asyncio.SelectorEventLoop`.
+    :param int workers: The number of worker threads to use for
+                        threaded handlers, and for connecting when no
+                        executor is given. Defaults to
+                        :data:`POOL_WORKERS`.
+    :param executor: Optional executor to use as the loop's default
+                     executor, shared by all sessions.
+    """
+
+    def __init__(self, loop=None, workers=POOL_WORKERS, executor=None):
+        if asyncio is None:
+            raise RuntimeError('SessionPool requires asyncio.')
+
+        #: The event loop running every session.
+        self.loop = loop if loop is not None else asyncio.SelectorEventLoop()
+
+        if executor is None and ThreadPoolExecutor is not None:
+            executor = ThreadPoolExecutor(workers)
+        #: The executor shared by all sessions.
+        self.executor = executor
+        if executor is not None:
+            self.loop.set_default_executor(executor)
+
+        #: The pool of threads for threaded handlers of all sessions.
+        self.handler_pool = WorkerPool(workers, name='SessionEvent')
+
+        #: The streams currently managed by the pool.
+        self.sessions = set()
+
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stop_when_idle = False
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def add(self, stream, connect=True, *args, **kwargs):
+        """Add a stream to the pool.
+
+        Unless ``connect=False`` is given, the stream's ``connect()``
+        method is called in a worker thread with any remaining
+        arguments before processing starts. Otherwise, the stream must
+        already be connected.
+
+        May be called from any thread, before or while the pool runs.
+
+        :param stream: The :class:`~sleekxmpp.xmlstream.xmlstream.XMLStream`
+                       object to process.
+        :param bool connect: Indicates if the pool should connect the
+                             stream. Defaults to ``True``.
+        """
+        with self._lock:
+            self._pending += 1
+        self.loop.call_soon_threadsafe(self._start, stream, connect,
+                                       args, kwargs)
+
+    def disconnect(self, wait=None):
+        """Disconnect every stream in the pool.
+
+        :param wait: Passed on to each stream's ``disconnect()``.
+        """
+        for stream in list(self.sessions):
+            stream.disconnect(wait=wait)
+
+    def run(self, forever=False):
+        """Run the event loop in the current thread.
+
+        :param bool forever: If ``False``, the loop stops once the pool
+                             no longer holds any sessions. Otherwise,
+                             it runs until :meth:`stop()` is called.
+                             Defaults to ``False``.
+        """
+        self._stop_when_idle = not forever
+        self.loop.call_soon(self._check_idle)
+        self.loop.run_forever()
+
+    def stop(self):
+        """Stop the event loop, leaving the sessions as they are."""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def close(self):
+        """Release the event loop and the worker threads."""
+        self.loop.close()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    def _start(self, stream, connect, args, kwargs):
+        if not connect:
+            self._process(stream)
+            return
+
+        def connected(future):
+            if not future.cancelled() and future.exception() is None \
+               and future.result():
+                self._process(stream)
+            else:
+                log.error('Could not connect session: %s', stream)
+                self._finish(None)
+
+        future = self.loop.run_in_executor(None,
+                                           lambda: stream.connect(*args,
+                                                                  **kwargs))
+        future.add_done_callback(connected)
+
+    def _process(self, stream):
+        self.sessions.add(stream)
+        stream.handler_pool = self.handler_pool
+        stream.process(loop=self.loop, block=False)
+        stream.loop_stopped.add_done_callback(lambda f: self._finish(stream))
+
+    def _finish(self, stream):
+        self.sessions.discard(stream)
+        with self._lock:
+            self._pending -= 1
+        self._check_idle()
+
+    def _check_idle(self):
+        if self._stop_when_idle and not self._pending:
+            self.loop.stop()
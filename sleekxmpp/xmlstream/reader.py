@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+    sleekxmpp.xmlstream.reader
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    This module provides a reader which receives data from a socket
+    into a reusable buffer and parses it incrementally.
+
+    Part of SleekXMPP: The Sleek XMPP Library
+
+    :copyright: (c) 2011 Nathanael C. Fritz
+    :license: MIT, see LICENSE for more details
+"""
+
+import errno
+import socket
+
+from sleekxmpp.xmlstream.stanzabase import ET
+
+
+#: The default number of bytes to request from the socket for each read.
+READ_SIZE = 4096
+
+#: The parser events used for processing the XML stream.
+PARSE_EVENTS = (b'end', b'start')
+
+
+def has_pull_parser():
+    """Return ``True`` if :class:`~xml.etree.ElementTree.XMLPullParser`
+    is available, which it is not before Python 3.4.
+    """
+    return hasattr(ET, 'XMLPullParser')
+
+
+class StreamReader(object):
+
+    """
+    Read an XML stream from a socket, with the data received into a
+    single buffer that is reused for every read and passed to an
+    :class:`~xml.etree.ElementTree.XMLPullParser` without copying.
+
+    The same reader works for plain and TLS sockets; it is given the
+    new socket after a TLS upgrade.
+
+    The parser is created when data is first fed to it, and requires
+    Python 3.4 or later. See :func:`has_pull_parser()`.
+
+    :param sock: The socket to read from.
+    :param int read_size: The number of bytes to request for each read.
+    """
+
+    def __init__(self, sock=None, read_size=READ_SIZE):
+        #: The socket data is read from.
+        self.socket = sock
+
+        #: The total number of bytes received.
+        self.bytes_received = 0
+
+        #: The number of reads which returned data.
+        self.reads = 0
+
+        self.parser = None
+        self.read_size = read_size
+
+    @property
+    def read_size(self):
+        """The number of bytes to request from the socket for each read.
+
+        Changing the read size replaces the buffer.
+        """
+        return len(self._buffer)
+
+    @read_size.setter
+    def read_size(self, value):
+        self._buffer = bytearray(value)
+        self._view = memoryview(self._buffer)
+
+    def reset(self):
+        """Start parsing a new XML stream."""
+        self.parser = None
+
+    def recv(self):
+        """Read available data from the socket into the buffer.
+
+        Blocks if the socket is blocking and no data is available.
+        Returns the number of bytes read, which is ``0`` if the
+        connection was closed.
+        """
+        while True:
+            try:
+                size = self.socket.recv_into(self._buffer)
+                break
+            except socket.error as serr:
+                if serr.errno != errno.EINTR:
+                    raise
+        if size:
+            self.bytes_received += size
+            self.reads += 1
+        return size
+
+    def feed(self, size):
+        """Parse the first ``size`` bytes of the buffer, returning
+        an iterator of the resulting parser events.
+
+        :param int size: The number of bytes returned by :meth:`recv()`.
+        """
+        if self.parser is None:
+            self.parser = ET.XMLPullParser(events=PARSE_EVENTS)
+        self.parser.feed(self._view[:size])
+        return self.parser.read_events()
+
+    def pending(self):
+        """Return ``True`` if a TLS socket has already decrypted data
+        which can be read without waiting for the network.
+        """
+        pending = getattr(self.socket, 'pending', None)
+        return bool(pending is not None and pending())
+
+    def stats(self):
+        """Return a dictionary of the reader's counters."""
+        return {'bytes_received': self.bytes_received,
+                'reads': self.reads,
+                'read_size': self.read_size}
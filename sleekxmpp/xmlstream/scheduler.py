@@ -12,13 +12,12 @@
     :license: MIT, see LICENSE for more details
 """
 
+import heapq
 import time
 import threading
 import logging
 import itertools
 
-from sleekxmpp.util import Queue, QueueEmpty
-
 
 #: The time in seconds to wait for events from the event queue, and also the
 #: time between checks for the process stop signal.
@@ -98,6 +97,12 @@ class Scheduler(object):
     A threaded scheduler that allows for updates mid-execution unlike the
     scheduler in the standard library.
 
+    Pending tasks are kept in a heap ordered by execution time, along
+    with an index of tasks by name. Adding a task and running the next
+    due task take O(log n) time, and removing a task only drops it from
+    the index; its heap entry is discarded once it reaches the top of
+    the heap, or when the heap is compacted.
+
     Based on: http://docs.python.org/library/sched.html#module-sched
 
     :param parentstop: An :class:`~threading.Event` to signal stopping
@@ -105,11 +110,8 @@ class Scheduler(object):
     """
 
     def __init__(self, parentstop=None):
-        #: A queue for storing tasks
-        self.addq = Queue()
-
-        #: A list of tasks in order of execution time.
-        self.schedule = []
+        #: Pending tasks, mapped by name.
+        self.tasks = {}
 
         #: If running in threaded mode, this will be the thread processing
         #: the schedule.
@@ -129,6 +131,21 @@ class Scheduler(object):
         #: and also the time between checks for the process stop signal.
         self.wait_timeout = WAIT_TIMEOUT
 
+        self._heap = []
+        self._stale = 0
+        self._seq = itertools.count()
+        self._wakeup = threading.Condition(self.schedule_lock)
+
+    @property
+    def schedule(self):
+        """A list of tasks in order of execution time."""
+        with self.schedule_lock:
+            tasks = list(self.tasks.values())
+        return sorted(tasks, key=lambda task: task.next)
+
+    def __len__(self):
+        return len(self.tasks)
+
     def process(self, threaded=True, daemon=False):
         """Begin accepting and processing scheduled tasks.
 
@@ -148,51 +165,33 @@ class Scheduler(object):
         self.run = True
         try:
             while self.run and not self.stop.is_set():
-                updated = False
-                if self.schedule:
-                    wait = self.schedule[0].next - time.time()
-                else:
-                    wait = self.wait_timeout
-                try:
-                    if wait <= 0.0:
-                        newtask = self.addq.get(False)
-                    else:
-                        newtask = None
-                        while self.run and \
-                              not self.stop.is_set() and \
-                              newtask is None and \
-                              wait > 0:
-                            try:
-                                newtask = self.addq.get(True, min(wait, self.wait_timeout))
-                            except QueueEmpty:          # Nothing to add, nothing to do. Check run flags and continue waiting.
-                                wait -= self.wait_timeout
-                except QueueEmpty:                      # Time to run some tasks, and no new tasks to add.
-                    self.schedule_lock.acquire()
-                    # select only those tasks which are to be executed now
-                    relevant = itertools.takewhile(
-                        lambda task: time.time() >= task.next, self.schedule)
-                    # run the tasks and keep the return value in a tuple
-                    status = map(lambda task: (task, task.run()), relevant)
-                    # remove non-repeating tasks
-                    for task, doRepeat in status:
-                        if not doRepeat:
-                            try:
-                                self.schedule.remove(task)
-                            except ValueError:
-                                pass
+                with self.schedule_lock:
+                    due = self._pop_due(time.time())
+                    if not due:
+                        if self._heap:
+                            wait = self._heap[0][0] - time.time()
                         else:
-                            # only need to resort tasks if a repeated task has
-                            # been kept in the list.
-                            updated = True
-                else:                                   # Add new task
-                    self.schedule_lock.acquire()
-                    if newtask is not None:
-                        self.schedule.append(newtask)
-                        updated = True
-                finally:
-                    if updated:
-                        self.schedule.sort(key=lambda task: task.next)
-                    self.schedule_lock.release()
+                            wait = self.wait_timeout
+                        if wait > 0:
+                            self._wakeup.wait(min(wait, self.wait_timeout))
+                        continue
+
+                for task in due:
+                    try:
+                        repeat = task.run()
+                    except Exception:
+                        log.exception('Error processing scheduled task: %s',
+                                      task.name)
+                        repeat = task.repeat
+                        task.reset()
+                    with self.schedule_lock:
+                        if self.tasks.get(task.name) is not task:
+                            # Removed while running.
+                            continue
+                        if repeat:
+                            self._push(task)
+                        else:
+                            del self.tasks[task.name]
         except KeyboardInterrupt:
             self.run = False
         except SystemExit:
@@ -213,18 +212,8 @@ class Scheduler(object):
         :param pointer: A pointer to an event queue for queuing callback
                         execution instead of executing immediately.
         """
-        try:
-            self.schedule_lock.acquire()
-            for task in self.schedule:
-                if task.name == name:
-                    raise ValueError("Key %s already exists" % name)
-
-            self.addq.put(Task(name, seconds, callback, args,
-                               kwargs, repeat, qpointer))
-        except:
-            raise
-        finally:
-            self.schedule_lock.release()
+        self._add_task(Task(name, seconds, callback, args,
+                            kwargs, repeat, qpointer))
 
     def remove(self, name):
         """Remove a scheduled task ahead of schedule, and without
@@ -232,19 +221,192 @@ class Scheduler(object):
 
         :param string name: The name of the task to remove.
         """
-        try:
-            self.schedule_lock.acquire()
-            the_task = None
-            for task in self.schedule:
-                if task.name == name:
-                    the_task = task
-            if the_task is not None:
-                self.schedule.remove(the_task)
-        except:
-            raise
-        finally:
-            self.schedule_lock.release()
+        with self.schedule_lock:
+            if self.tasks.pop(name, None) is None:
+                return
+            self._stale += 1
+            if self._stale > 1024 and self._stale * 2 > len(self._heap):
+                self._compact()
+
+    def drain(self):
+        """Remove and return all pending tasks, in order of
+        execution time.
+        """
+        with self.schedule_lock:
+            tasks = self.schedule
+            self.tasks = {}
+            self._heap = []
+            self._stale = 0
+        return tasks
 
     def quit(self):
         """Shutdown the scheduler."""
+        with self.schedule_lock:
+            self.run = False
+            self._wakeup.notify_all()
+
+    def _add_task(self, task):
+        with self.schedule_lock:
+            if task.name in self.tasks:
+                raise ValueError("Key %s already exists" % task.name)
+            self.tasks[task.name] = task
+            self._push(task)
+            if self._heap[0][2] is task:
+                self._wakeup.notify()
+
+    def _push(self, task):
+        heapq.heappush(self._heap, (task.next, next(self._seq), task))
+
+    def _pop_due(self, now):
+        """Pop the tasks due to run, skipping removed tasks."""
+        due = []
+        heap = self._heap
+        while heap:
+            when, _, task = heap[0]
+            if self.tasks.get(task.name) is not task or when != task.next:
+                heapq.heappop(heap)
+                self._stale = max(self._stale - 1, 0)
+            elif when <= now:
+                heapq.heappop(heap)
+                due.append(task)
+            else:
+                break
+        return due
+
+    def _compact(self):
+        """Rebuild the heap without the entries of removed tasks."""
+        self._heap = [entry for entry in self._heap
+                      if self.tasks.get(entry[2].name) is entry[2] and
+                         entry[0] == entry[2].next]
+        heapq.heapify(self._heap)
+        self._stale = 0
+
+
+class LoopScheduler(object):
+
+    """
+    A scheduler with the same interface as :class:`Scheduler` that
+    uses the timers of an :mod:`asyncio` event loop instead of a
+    separate thread.
+
+    Tasks may be added or removed from any thread.
+
+    :param loop: The :mod:`asyncio` event loop that will run tasks.
+    :param parentstop: An :class:`~threading.Event` to signal stopping
+                       the scheduler.
+    """
+
+    def __init__(self, loop, parentstop=None):
+        #: The event loop used for timing tasks.
+        self.loop = loop
+
+        #: Tasks mapped by name, along with their pending timer handles.
+        self.tasks = {}
+
+        #: A flag indicating that the scheduler is running.
+        self.run = True
+
+        #: An :class:`~threading.Event` instance for signalling to stop
+        #: the scheduler.
+        self.stop = parentstop
+
+        #: Lock for accessing the task map.
+        self.schedule_lock = threading.RLock()
+
+    @property
+    def schedule(self):
+        """A list of tasks in order of execution time."""
+        with self.schedule_lock:
+            tasks = [task for task, _ in self.tasks.values()]
+        return sorted(tasks, key=lambda task: task.next)
+
+    def adopt(self, scheduler, queues=None):
+        """Take over the pending tasks of a threaded :class:`Scheduler`,
+        which must not be processing tasks itself.
+
+        :param scheduler: The :class:`Scheduler` to empty.
+        :param dict queues: Optional mapping of old event queues to
+                            their replacements, for tasks that queue
+                            their callbacks.
+        """
+        for task in scheduler.drain():
+            if queues and task.qpointer in queues:
+                task.qpointer = queues[task.qpointer]
+            self._add_task(task)
+
+    def process(self, threaded=True, daemon=False):
+        """Tasks are executed by the event loop; nothing to start."""
+        self.run = True
+
+    def add(self, name, seconds, callback, args=None,
+            kwargs=None, repeat=False, qpointer=None):
+        """Schedule a new task.
+
+        :param string name: The name of the task.
+        :param int seconds: The number of seconds to wait before executing.
+        :param callback: The function to execute.
+        :param tuple args: The arguments to pass to the callback.
+        :param dict kwargs: The keyword arguments to pass to the callback.
+        :param bool repeat: Indicates if the task should repeat.
+                            Defaults to ``False``.
+        :param pointer: A pointer to an event queue for queuing callback
+                        execution instead of executing immediately.
+        """
+        self._add_task(Task(name, seconds, callback, args,
+                            kwargs, repeat, qpointer))
+
+    def remove(self, name):
+        """Remove a scheduled task ahead of schedule, and without
+        executing it.
+
+        :param string name: The name of the task to remove.
+        """
+        with self.schedule_lock:
+            task = self.tasks.pop(name, None)
+        if task is not None and task[1] is not None:
+            self.loop.call_soon_threadsafe(task[1].cancel)
+
+    def quit(self):
+        """Shutdown the scheduler, cancelling all pending tasks."""
         self.run = False
+        with self.schedule_lock:
+            tasks = list(self.tasks.values())
+            self.tasks = {}
+        for task, handle in tasks:
+            if handle is not None:
+                self.loop.call_soon_threadsafe(handle.cancel)
+
+    def _add_task(self, task):
+        with self.schedule_lock:
+            if task.name in self.tasks:
+                raise ValueError("Key %s already exists" % task.name)
+            self.tasks[task.name] = [task, None]
+        self.loop.call_soon_threadsafe(self._start_timer, task)
+
+    def _start_timer(self, task):
+        with self.schedule_lock:
+            entry = self.tasks.get(task.name)
+            if entry is None or entry[0] is not task:
+                return
+            delay = max(task.next - time.time(), 0)
+            entry[1] = self.loop.call_later(delay, self._run_task, task)
+
+    def _run_task(self, task):
+        with self.schedule_lock:
+            entry = self.tasks.get(task.name)
+            if entry is None or entry[0] is not task:
+                return
+            if not self.run or (self.stop is not None and self.stop.is_set()):
+                return
+        try:
+            repeat = task.run()
+        except Exception:
+            log.exception('Error processing scheduled task: %s', task.name)
+            repeat = task.repeat
+        if repeat:
+            self._start_timer(task)
+        else:
+            with self.schedule_lock:
+                entry = self.tasks.get(task.name)
+                if entry is not None and entry[0] is task:
+                    del self.tasks[task.name]
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+    sleekxmpp.xmlstream.sendqueue
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    This module provides a bounded, prioritized queue for data
+    waiting to be written to the stream.
+
+    Part of SleekXMPP: The Sleek XMPP Library
+
+    :copyright: (c) 2011 Nathanael C. Fritz
+    :license: MIT, see LICENSE for more details
+"""
+
+from __future__ import with_statement
+
+import collections
+import logging
+import threading
+import time
+
+from sleekxmpp.util import QueueEmpty
+from sleekxmpp.xmlstream.workers import BLOCK, DROP
+
+
+log = logging.getLogger(__name__)
+
+
+#: The lane for data which keeps the stream alive, such as stream
+#: management acks, pings and IQ responses.
+PRIORITY_HIGH = 0
+
+#: The lane used for data sent without a priority.
+PRIORITY_NORMAL = 1
+
+#: The lane for bulk data, such as presence broadcasts.
+PRIORITY_LOW = 2
+
+PRIORITIES = (PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW)
+
+
+class SendQueue(object):
+
+    """
+    A stand-in for :class:`~queue.Queue` which keeps a separate lane
+    for each priority and may limit the number of items it holds.
+
+    Items are taken from the highest priority lane which is not
+    empty, and in the order they were added within a lane.
+
+    When :attr:`max_size` items are queued, the queue's :attr:`policy`
+    decides what happens to new items of normal or low priority:
+
+        :``'block'``: Wait until there is room in the queue.
+        :``'drop'``: Discard the item and count it in :attr:`dropped`.
+
+    High priority items are always accepted, so that a full queue
+    can not hold back the data needed to keep the stream alive.
+    Putting ``None`` into the queue, which is used to wake up the
+    send thread, is also always accepted.
+
+    :param int max_size: The maximum number of queued items, or
+                         ``0`` for no limit.
+    :param string policy: What to do when the queue is full.
+                          Defaults to ``'block'``.
+    :param watermark: Optional function called with ``True`` when the
+                      queue fills up to :attr:`high_water` items, and
+                      with ``False`` once it has drained back down to
+                      :attr:`low_water` items.
+    """
+
+    def __init__(self, max_size=0, policy=BLOCK, watermark=None):
+        if policy not in (BLOCK, DROP):
+            raise ValueError("Unknown queue policy: %s" % policy)
+
+        #: The maximum number of queued items.
+        self.max_size = max_size
+
+        #: The action to take when the queue is full.
+        self.policy = policy
+
+        #: The number of queued items at which the queue is considered
+        #: to be filling up. Defaults to :attr:`max_size` when ``None``.
+        self.high_water = None
+
+        #: The number of queued items at which a filling queue is
+        #: considered drained. Defaults to half of the high water mark
+        #: when ``None``.
+        self.low_water = None
+
+        self.watermark = watermark
+
+        #: The number of items discarded because the queue was full.
+        self.dropped = 0
+
+        #: The largest number of items that have been queued at once.
+        self.peak_size = 0
+
+        self._lanes = tuple(collections.deque() for _ in PRIORITIES)
+        self._size = 0
+        self._unfinished = 0
+        self._releases = 0
+        self._high = False
+
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._all_done = threading.Condition(self._lock)
+
+    @property
+    def is_high(self):
+        """``True`` while the queue is above its high water mark."""
+        return self._high
+
+    def _marks(self):
+        high = self.high_water
+        if high is None:
+            high = self.max_size
+        low = self.low_water
+        if low is None:
+            low = high // 2
+        return high, low
+
+    def _full(self):
+        return self.max_size and self._size >= self.max_size
+
+    def put(self, item, block=True, timeout=None, priority=PRIORITY_NORMAL,
+            force=False):
+        """Add an item to the queue.
+
+        Returns ``False`` if the item was discarded because the queue
+        was full, and ``True`` otherwise.
+
+        :param item: The data to queue.
+        :param bool block: Indicates if a full queue should be waited
+                           on when using the ``'block'`` policy.
+        :param float timeout: The longest time in seconds to wait for
+                              room in the queue before discarding the
+                              item, or ``None`` to wait indefinitely.
+        :param int priority: The lane to use for the item.
+        :param bool force: Accept the item without waiting even if the
+                           queue is full, as is done for high priority
+                           items. Defaults to ``False``.
+        """
+        if item is None:
+            priority = PRIORITY_HIGH
+        with self._lock:
+            if priority != PRIORITY_HIGH and not force and self._full():
+                if self.policy == BLOCK and block:
+                    releases = self._releases
+                    if timeout is not None:
+                        expires = time.time() + timeout
+                    while self._full() and releases == self._releases:
+                        if timeout is None:
+                            self._not_full.wait()
+                        else:
+                            remaining = expires - time.time()
+                            if remaining <= 0:
+                                break
+                            self._not_full.wait(remaining)
+                if self._full():
+                    self.dropped += 1
+                    log.warning('Send queue full, dropping: %s', item)
+                    return False
+
+            self._lanes[priority].append(item)
+            self._size += 1
+            if item is not None:
+                self._unfinished += 1
+            self.peak_size = max(self.peak_size, self._size)
+            self._not_empty.notify()
+
+            high, low = self._marks()
+            notify = not self._high and high and self._size >= high
+            if notify:
+                self._high = True
+
+        if notify and self.watermark is not None:
+            self.watermark(True)
+        return True
+
+    def put_nowait(self, item, priority=PRIORITY_NORMAL):
+        return self.put(item, False, priority=priority)
+
+    def get(self, block=True, timeout=None):
+        """Remove and return the next item from the queue.
+
+        Raises :class:`~queue.Empty` if no item is available.
+
+        :param bool block: Indicates if an empty queue should be
+                           waited on.
+        :param float timeout: The longest time in seconds to wait for
+                              an item, or ``None`` to wait indefinitely.
+        """
+        with self._lock:
+            if not block:
+                if not self._size:
+                    raise QueueEmpty
+            elif timeout is None:
+                while not self._size:
+                    self._not_empty.wait()
+            else:
+                expires = time.time() + timeout
+                while not self._size:
+                    remaining = expires - time.time()
+                    if remaining <= 0:
+                        raise QueueEmpty
+                    self._not_empty.wait(remaining)
+
+            for lane in self._lanes:
+                if lane:
+                    item = lane.popleft()
+                    break
+            self._size -= 1
+            self._not_full.notify()
+
+            notify = self._high and self._size <= self._marks()[1]
+            if notify:
+                self._high = False
+
+        if notify and self.watermark is not None:
+            self.watermark(False)
+        return item
+
+    def get_nowait(self):
+        return self.get(False)
+
+    def release(self):
+        """Wake all threads waiting for room in the queue, which then
+        discard their items. Used when the stream is stopping.
+        """
+        with self._lock:
+            self._releases += 1
+            self._not_full.notify_all()
+
+    def task_done(self):
+        """Mark an item taken from the queue as processed."""
+        with self._lock:
+            if self._unfinished <= 0:
+                raise ValueError('task_done() called too many times')
+            self._unfinished -= 1
+            if not self._unfinished:
+                self._all_done.notify_all()
+
+    def join(self):
+        """Wait until every queued item has been processed."""
+        with self._lock:
+            while self._unfinished:
+                self._all_done.wait()
+
+    def qsize(self):
+        """Return the number of queued items."""
+        return self._size
+
+    def empty(self):
+        return not self._size
+
+    def stats(self):
+        """Return a dictionary of the queue's size and counters."""
+        with self._lock:
+            return {'queued': self._size,
+                    'lanes': [len(lane) for lane in self._lanes],
+                    'peak_size': self.peak_size,
+                    'max_size': self.max_size,
+                    'dropped': self.dropped,
+                    'high': self._high}
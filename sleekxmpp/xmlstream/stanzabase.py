@@ -22,6 +22,7 @@ from xml.etree import cElementTree as ET
 from sleekxmpp.util import safedict
 from sleekxmpp.xmlstream import JID
 from sleekxmpp.xmlstream.tostring import tostring
+from sleekxmpp.xmlstream.sendqueue import PRIORITY_NORMAL
 from sleekxmpp.thirdparty import OrderedDict
 
 
@@ -35,6 +36,35 @@ XML_TYPE = type(ET.Element('xml'))
 XML_NS = 'http://www.w3.org/XML/1998/namespace'
 
 
+# Ways that a stanza interface may be accessed, as resolved
+# by ElementBase._resolve_accessor().
+_SUBSTANZAS = 0
+_METHOD = 1
+_SUB = 2
+_BOOL = 3
+_ATTR = 4
+_PLUGIN = 5
+_NONE = 6
+
+_GET = 1
+_SET = 2
+_DEL = 3
+
+#: The maximum number of interface names whose accessors are cached
+#: for each stanza class and operation.
+ACCESSOR_CACHE_SIZE = 1024
+
+# Incremented when a plugin is registered, invalidating every
+# stanza class's table of resolved interface accessors.
+_accessor_generation = 0
+
+# Shared, empty plugin containers used by stanzas which have no
+# plugins. They are replaced with new containers before any change.
+_NO_PLUGINS = OrderedDict()
+_NO_ITERABLES = []
+_NO_LOADED_PLUGINS = frozenset()
+
+
 def register_stanza_plugin(stanza, plugin, iterable=False, overrides=False):
     """
     Associate a stanza object as a plugin for another stanza.
@@ -91,6 +121,10 @@ def register_stanza_plugin(stanza, plugin, iterable=False, overrides=False):
         for interface in plugin.overrides:
             stanza.plugin_overrides[interface] = plugin.plugin_attrib
 
+    # Interface accessors may now resolve differently.
+    global _accessor_generation
+    _accessor_generation += 1
+
 
 # To maintain backwards compatibility for now, preserve the camel case name.
 registerStanzaPlugin = register_stanza_plugin
@@ -203,6 +237,53 @@ def fix_ns(xpath, split=False, propagate_ns=True, default_ns=''):
     return '/'.join(fixed)
 
 
+#: The maximum number of stanza paths whose compiled form is cached.
+PATH_CACHE_SIZE = 1024
+
+_path_cache = {}
+
+
+def compile_path(xpath):
+    """Compile a stanza path into the form used by
+    :meth:`ElementBase.match`.
+
+    Each step of the path becomes a tuple of the raw step text, the
+    tag or plugin name, a tuple of ``(interface, value)`` attribute
+    checks, and the step's local name without a namespace, so that
+    matching a stanza requires no string parsing.
+
+    Compiled paths for strings are cached.
+
+    :param xpath: A stanza path string, such as ``'message@type=chat/body'``,
+                  or a list of already split path steps.
+    :rtype: tuple
+    """
+    if isinstance(xpath, tuple):
+        return xpath
+    if isinstance(xpath, list):
+        return tuple(_compile_step(step) for step in xpath)
+    try:
+        return _path_cache[xpath]
+    except KeyError:
+        pass
+    steps = fix_ns(xpath, split=True, propagate_ns=False)
+    path = tuple(_compile_step(step) for step in steps)
+    if len(_path_cache) >= PATH_CACHE_SIZE:
+        _path_cache.clear()
+    _path_cache[xpath] = path
+    return path
+
+
+def _compile_step(step):
+    components = step.split('@')
+    attributes = []
+    for attribute in components[1:]:
+        name, value = attribute.split('=', 1)
+        attributes.append((name, value))
+    local = components[0].split('}')[-1]
+    return (step, components[0], tuple(attributes), local)
+
+
 class ElementBase(object):
 
     """
@@ -401,21 +482,32 @@ class ElementBase(object):
     #: The default XML namespace: ``http://www.w3.org/XML/1998/namespace``.
     xml_ns = XML_NS
 
+    # Subclasses which do not declare their own __slots__ will
+    # still have a __dict__ for any other attributes.
+    __slots__ = ('xml', 'tag', 'parent', 'loaded_plugins',
+                 '_plugins', '_iterables', '_pending', '_index', '_cow',
+                 '__weakref__')
+
     def __init__(self, xml=None, parent=None):
+        #: Set on stanzas whose XML may be shared with copies made by
+        #: :meth:`share()`, so that the XML is copied before any change.
+        self._cow = False
         self._index = 0
 
         #: The underlying XML object for the stanza. It is a standard
         #: :class:`xml.etree.cElementTree` object.
         self.xml = xml
 
-        #: An ordered dictionary of plugin stanzas, mapped by their
-        #: :attr:`plugin_attrib` value.
-        self.plugins = OrderedDict()
-        self.loaded_plugins = set()
+        self._plugins = _NO_PLUGINS
+        self._iterables = _NO_ITERABLES
 
-        #: A list of child stanzas whose class is included in
-        #: :attr:`plugin_iterables`.
-        self.iterables = []
+        #: Child XML elements, paired with their plugin classes, whose
+        #: plugin stanzas have not been created yet. See :attr:`plugins`.
+        self._pending = None
+
+        #: The set of :attr:`plugin_attrib` values of the plugins
+        #: which are present in the stanza.
+        self.loaded_plugins = _NO_LOADED_PLUGINS
 
         #: The name of the tag for the stanza's root element. It is the
         #: same as calling :meth:`tag_name()` and is formatted as
@@ -439,13 +531,70 @@ class ElementBase(object):
             # If we generated our own XML, then everything is ready.
             return
 
-        # Initialize values using provided XML
+        # Note which plugins are present in the provided XML, but
+        # wait until the plugins are used to create them.
+        pending = None
         for child in self.xml:
-            if child.tag in self.plugin_tag_map:
-                plugin_class = self.plugin_tag_map[child.tag]
-                self.init_plugin(plugin_class.plugin_attrib,
-                                 existing_xml=child,
-                                 reuse=False)
+            plugin_class = self.plugin_tag_map.get(child.tag, None)
+            if plugin_class is None:
+                continue
+            if pending is None:
+                pending = []
+                self.loaded_plugins = set()
+            pending.append((child, plugin_class))
+            self.loaded_plugins.add(plugin_class.plugin_attrib)
+            if plugin_class.plugin_multi_attrib and \
+               plugin_class in self.plugin_iterables:
+                self.loaded_plugins.add(plugin_class.plugin_multi_attrib)
+        self._pending = pending
+
+    @property
+    def plugins(self):
+        """An ordered dictionary of plugin stanzas, mapped by their
+        :attr:`plugin_attrib` value and language.
+
+        Plugins for the XML a stanza was created from are only
+        created once this, or :attr:`iterables`, is first used.
+        """
+        if self._pending is not None:
+            self._load_plugins()
+        if self._plugins is _NO_PLUGINS:
+            self._plugins = OrderedDict()
+        return self._plugins
+
+    @plugins.setter
+    def plugins(self, value):
+        if self._pending is not None:
+            self._load_plugins()
+        self._plugins = value
+
+    @property
+    def iterables(self):
+        """A list of child stanzas whose class is included in
+        :attr:`plugin_iterables`.
+        """
+        if self._pending is not None:
+            self._load_plugins()
+        if self._iterables is _NO_ITERABLES:
+            self._iterables = []
+        return self._iterables
+
+    @iterables.setter
+    def iterables(self, value):
+        if self._pending is not None:
+            self._load_plugins()
+        self._iterables = value
+
+    def _load_plugins(self):
+        """Create the plugin stanzas for the XML the stanza was
+        created from.
+        """
+        pending = self._pending
+        self._pending = None
+        for child, plugin_class in pending:
+            self.init_plugin(plugin_class.plugin_attrib,
+                             existing_xml=child,
+                             reuse=False)
 
     def setup(self, xml=None):
         """Initialize the stanza's XML contents.
@@ -498,14 +647,17 @@ class ElementBase(object):
 
         plugin_class = self.plugin_attrib_map[name]
 
+        if self._pending is not None:
+            self._load_plugins()
+
         if plugin_class.is_extension:
-            if (name, None) in self.plugins:
-                return self.plugins[(name, None)]
+            if (name, None) in self._plugins:
+                return self._plugins[(name, None)]
             else:
                 return None if check else self.init_plugin(name, lang)
         else:
-            if (name, lang) in self.plugins:
-                return self.plugins[(name, lang)]
+            if (name, lang) in self._plugins:
+                return self._plugins[(name, lang)]
             else:
                 return None if check else self.init_plugin(name, lang)
 
@@ -526,6 +678,8 @@ class ElementBase(object):
         if reuse and (attrib, lang) in self.plugins:
             return self.plugins[(attrib, lang)]
 
+        if existing_xml is None:
+            self._writable()
         plugin = plugin_class(parent=self, xml=existing_xml)
 
         if plugin.is_extension:
@@ -540,6 +694,8 @@ class ElementBase(object):
             if plugin_class.plugin_multi_attrib:
                 self.init_plugin(plugin_class.plugin_multi_attrib)
 
+        if self.loaded_plugins is _NO_LOADED_PLUGINS:
+            self.loaded_plugins = set()
         self.loaded_plugins.add(attrib)
 
         return plugin
@@ -642,6 +798,84 @@ class ElementBase(object):
                         plugin.values = value
         return self
 
+    def _accessor(self, op, attrib):
+        """Return how to get, set, or delete a stanza interface.
+
+        Resolving an interface name is done once for each stanza class,
+        and the result kept in a table for the class until a stanza
+        plugin is registered.
+
+        :param op: One of ``_GET``, ``_SET``, or ``_DEL``.
+        :param string attrib: The interface name, which may include
+                              a language, as in ``'body|en'``.
+        """
+        cls = self.__class__
+        tables = cls.__dict__.get('_accessor_tables', None)
+        if tables is None or tables[0] != _accessor_generation:
+            tables = [_accessor_generation, {}, {}, {}]
+            cls._accessor_tables = tables
+        table = tables[op]
+        try:
+            return table[attrib]
+        except KeyError:
+            pass
+        accessor = cls._resolve_accessor(op, attrib)
+        if len(table) >= ACCESSOR_CACHE_SIZE:
+            table.clear()
+        table[attrib] = accessor
+        return accessor
+
+    @classmethod
+    def _resolve_accessor(cls, op, full_attrib):
+        """Find how a stanza interface is accessed for a stanza class.
+
+        Returns a tuple of the interface name, the requested language,
+        the keyword arguments for access methods, the plugin and method
+        name overriding the interface (if any), the kind of access, and
+        the name of the access method (if any).
+
+        :param op: One of ``_GET``, ``_SET``, or ``_DEL``.
+        :param string full_attrib: The interface name, which may
+                                   include a language.
+        """
+        attrib_lang = ('%s|' % full_attrib).split('|')
+        attrib = attrib_lang[0]
+        lang = attrib_lang[1] or None
+
+        kwargs = {}
+        if lang and attrib in cls.lang_interfaces:
+            kwargs['lang'] = lang
+        kwargs = safedict(kwargs)
+
+        override = None
+        method = None
+        if op == _GET and attrib == 'substanzas':
+            kind = _SUBSTANZAS
+        elif attrib in cls.interfaces or attrib == 'lang':
+            prefix = {_GET: 'get', _SET: 'set', _DEL: 'del'}[op]
+            method1 = '%s_%s' % (prefix, attrib.lower())
+            method2 = '%s%s' % (prefix, attrib.title())
+
+            name = cls.plugin_overrides.get(method1, None)
+            if name:
+                override = (name, method1)
+
+            if hasattr(cls, method1):
+                kind, method = _METHOD, method1
+            elif hasattr(cls, method2):
+                kind, method = _METHOD, method2
+            elif attrib in cls.sub_interfaces:
+                kind = _SUB
+            elif attrib in cls.bool_interfaces:
+                kind = _BOOL
+            else:
+                kind = _ATTR
+        elif attrib in cls.plugin_attrib_map:
+            kind = _PLUGIN
+        else:
+            kind = _NONE
+        return (attrib, lang, kwargs, override, kind, method)
+
     def __getitem__(self, attrib):
         """Return the value of a stanza interface using dict-like syntax.
 
@@ -672,44 +906,29 @@ class ElementBase(object):
         :param string attrib: The name of the requested stanza interface.
         """
         full_attrib = attrib
-        attrib_lang = ('%s|' % attrib).split('|')
-        attrib = attrib_lang[0]
-        lang = attrib_lang[1] or None
-
-        kwargs = {}
-        if lang and attrib in self.lang_interfaces:
-            kwargs['lang'] = lang
+        attrib, lang, kwargs, override, kind, method = \
+                self._accessor(_GET, full_attrib)
 
-        kwargs = safedict(kwargs)
-
-        if attrib == 'substanzas':
+        if kind == _SUBSTANZAS:
             return self.iterables
-        elif attrib in self.interfaces or attrib == 'lang':
-            get_method = "get_%s" % attrib.lower()
-            get_method2 = "get%s" % attrib.title()
-
-            if self.plugin_overrides:
-                name = self.plugin_overrides.get(get_method, None)
-                if name:
-                    plugin = self._get_plugin(name, lang)
-                    if plugin:
-                        handler = getattr(plugin, get_method, None)
-                        if handler:
-                            return handler(**kwargs)
-
-            if hasattr(self, get_method):
-                return getattr(self, get_method)(**kwargs)
-            elif hasattr(self, get_method2):
-                return getattr(self, get_method2)(**kwargs)
-            else:
-                if attrib in self.sub_interfaces:
-                    return self._get_sub_text(attrib, lang=lang)
-                elif attrib in self.bool_interfaces:
-                    elem = self.xml.find('{%s}%s' % (self.namespace, attrib))
-                    return elem is not None
-                else:
-                    return self._get_attr(attrib)
-        elif attrib in self.plugin_attrib_map:
+
+        if override is not None:
+            plugin = self._get_plugin(override[0], lang)
+            if plugin:
+                handler = getattr(plugin, override[1], None)
+                if handler:
+                    return handler(**kwargs)
+
+        if kind == _METHOD:
+            return getattr(self, method)(**kwargs)
+        elif kind == _SUB:
+            return self._get_sub_text(attrib, lang=lang)
+        elif kind == _BOOL:
+            elem = self.xml.find('{%s}%s' % (self.namespace, attrib))
+            return elem is not None
+        elif kind == _ATTR:
+            return self._get_attr(attrib)
+        elif kind == _PLUGIN:
             plugin = self._get_plugin(attrib, lang)
             if plugin and plugin.is_extension:
                 return plugin[full_attrib]
@@ -749,60 +968,41 @@ class ElementBase(object):
         :param string attrib: The name of the stanza interface to modify.
         :param value: The new value of the stanza interface.
         """
+        self._writable()
         full_attrib = attrib
-        attrib_lang = ('%s|' % attrib).split('|')
-        attrib = attrib_lang[0]
-        lang = attrib_lang[1] or None
+        attrib, lang, kwargs, override, kind, method = \
+                self._accessor(_SET, full_attrib)
 
-        kwargs = {}
-        if lang and attrib in self.lang_interfaces:
-            kwargs['lang'] = lang
-
-        kwargs = safedict(kwargs)
-
-        if attrib in self.interfaces or attrib == 'lang':
-            if value is not None:
-                set_method = "set_%s" % attrib.lower()
-                set_method2 = "set%s" % attrib.title()
-
-                if self.plugin_overrides:
-                    name = self.plugin_overrides.get(set_method, None)
-                    if name:
-                        plugin = self._get_plugin(name, lang)
-                        if plugin:
-                            handler = getattr(plugin, set_method, None)
-                            if handler:
-                                return handler(value, **kwargs)
-
-                if hasattr(self, set_method):
-                    getattr(self, set_method)(value, **kwargs)
-                elif hasattr(self, set_method2):
-                    getattr(self, set_method2)(value, **kwargs)
-                else:
-                    if attrib in self.sub_interfaces:
-                        if lang == '*':
-                            return self._set_all_sub_text(attrib,
-                                                          value,
-                                                          lang='*')
-                        return self._set_sub_text(attrib, text=value,
-                                                          lang=lang)
-                    elif attrib in self.bool_interfaces:
-                        if value:
-                            return self._set_sub_text(attrib, '',
-                                    keep=True,
-                                    lang=lang)
-                        else:
-                            return self._set_sub_text(attrib, '',
-                                    keep=False,
-                                    lang=lang)
-                    else:
-                        self._set_attr(attrib, value)
-            else:
-                self.__delitem__(attrib)
-        elif attrib in self.plugin_attrib_map:
+        if kind == _PLUGIN:
             plugin = self._get_plugin(attrib, lang)
             if plugin:
                 plugin[full_attrib] = value
+            return self
+        elif kind == _NONE:
+            return self
+
+        if value is None:
+            self.__delitem__(attrib)
+            return self
+
+        if override is not None:
+            plugin = self._get_plugin(override[0], lang)
+            if plugin:
+                handler = getattr(plugin, override[1], None)
+                if handler:
+                    return handler(value, **kwargs)
+
+        if kind == _METHOD:
+            getattr(self, method)(value, **kwargs)
+        elif kind == _SUB:
+            if lang == '*':
+                return self._set_all_sub_text(attrib, value, lang='*')
+            return self._set_sub_text(attrib, text=value, lang=lang)
+        elif kind == _BOOL:
+            return self._set_sub_text(attrib, '', keep=bool(value),
+                                                  lang=lang)
+        else:
+            self._set_attr(attrib, value)
         return self
 
     def __delitem__(self, attrib):
@@ -837,42 +1037,26 @@ class ElementBase(object):
 
         :param attrib: The name of the affected stanza interface.
         """
+        self._writable()
         full_attrib = attrib
-        attrib_lang = ('%s|' % attrib).split('|')
-        attrib = attrib_lang[0]
-        lang = attrib_lang[1] or None
-
-        kwargs = {}
-        if lang and attrib in self.lang_interfaces:
-            kwargs['lang'] = lang
-
-        kwargs = safedict(kwargs)
-
-        if attrib in self.interfaces or attrib == 'lang':
-            del_method = "del_%s" % attrib.lower()
-            del_method2 = "del%s" % attrib.title()
-
-            if self.plugin_overrides:
-                name = self.plugin_overrides.get(del_method, None)
-                if name:
-                    plugin = self._get_plugin(attrib, lang)
-                    if plugin:
-                        handler = getattr(plugin, del_method, None)
-                        if handler:
-                            return handler(**kwargs)
-
-            if hasattr(self, del_method):
-                getattr(self, del_method)(**kwargs)
-            elif hasattr(self, del_method2):
-                getattr(self, del_method2)(**kwargs)
+        attrib, lang, kwargs, override, kind, method = \
+                self._accessor(_DEL, full_attrib)
+
+        if kind in (_METHOD, _SUB, _BOOL, _ATTR):
+            if override is not None:
+                plugin = self._get_plugin(attrib, lang)
+                if plugin:
+                    handler = getattr(plugin, override[1], None)
+                    if handler:
+                        return handler(**kwargs)
+
+            if kind == _METHOD:
+                getattr(self, method)(**kwargs)
+            elif kind == _ATTR:
+                self._del_attr(attrib)
             else:
-                if attrib in self.sub_interfaces:
-                    return self._del_sub(attrib, lang=lang)
-                elif attrib in self.bool_interfaces:
-                    return self._del_sub(attrib, lang=lang)
-                else:
-                    self._del_attr(attrib)
-        elif attrib in self.plugin_attrib_map:
+                return self._del_sub(attrib, lang=lang)
+        elif kind == _PLUGIN:
             plugin = self._get_plugin(attrib, lang, check=True)
             if not plugin:
                 return self
@@ -898,6 +1082,7 @@ class ElementBase(object):
         :param value: The new value of the attribute, or None or '' to
                       remove it.
         """
+        self._writable()
         if value is None or value == '':
             self.__delitem__(name)
         else:
@@ -908,6 +1093,7 @@ class ElementBase(object):
 
         :param name: The name of the attribute.
         """
+        self._writable()
         if name in self.xml.attrib:
             del self.xml.attrib[name]
 
@@ -983,6 +1169,7 @@ class ElementBase(object):
         :param keep: Indicates if the element should be kept if its text is
                      removed. Defaults to False.
         """
+        self._writable()
         default_lang = self.get_lang()
         if lang is None:
             lang = default_lang
@@ -1056,6 +1243,7 @@ class ElementBase(object):
         :param bool all: If True, remove all empty elements in the path to the
                          deleted element. Defaults to False.
         """
+        self._writable()
         path = self._fix_ns(name, split=True)
         original_target = path[-1]
 
@@ -1105,50 +1293,56 @@ class ElementBase(object):
                              may be either a string or a list of element
                              names with attribute checks.
         """
-        if not isinstance(xpath, list):
-            xpath = self._fix_ns(xpath, split=True, propagate_ns=False)
+        return self._match_path(compile_path(xpath), 0)
 
-        # Extract the tag name and attribute checks for the first XPath node.
-        components = xpath[0].split('@')
-        tag = components[0]
-        attributes = components[1:]
+    def _match_path(self, path, index):
+        """Compare a stanza object against a compiled stanza path,
+        starting at the given step.
 
-        if tag not in (self.name, "{%s}%s" % (self.namespace, self.name)) and \
-            tag not in self.loaded_plugins and tag not in self.plugin_attrib:
+        :param tuple path: A stanza path from :func:`compile_path`.
+        :param int index: The step to match against this stanza.
+        """
+        tag = path[index][1]
+        if tag != self.name and tag not in self.loaded_plugins and \
+           tag not in self.plugin_attrib and \
+           (tag[:1] != '{' or tag != "{%s}%s" % (self.namespace, self.name)):
             # The requested tag is not in this stanza, so no match.
             return False
 
-        # Check the rest of the XPath against any substanzas.
+        last = index + 1 == len(path)
+
+        # Check the rest of the path against any substanzas.
         matched_substanzas = False
-        for substanza in self.iterables:
-            if xpath[1:] == []:
-                break
-            matched_substanzas = substanza.match(xpath[1:])
-            if matched_substanzas:
-                break
+        if not last:
+            if self._pending is not None:
+                self._load_plugins()
+            for substanza in self._iterables:
+                if substanza._match_path(path, index + 1):
+                    matched_substanzas = True
+                    break
 
         # Check attribute values.
-        for attribute in attributes:
-            name, value = attribute.split('=')
+        for name, value in path[index][2]:
             if self[name] != value:
                 return False
 
-        # Check sub interfaces.
-        if len(xpath) > 1:
-            next_tag = xpath[1]
-            if next_tag in self.sub_interfaces and self[next_tag]:
+        if not last:
+            next_step, _, _, next_tag = path[index + 1]
+
+            # Check sub interfaces.
+            if next_step in self.sub_interfaces and self[next_step]:
                 return True
 
-        # Attempt to continue matching the XPath using the stanza's plugins.
-        if not matched_substanzas and len(xpath) > 1:
-            # Convert {namespace}tag@attribs to just tag
-            next_tag = xpath[1].split('@')[0].split('}')[-1]
-            langs = [name[1] for name in self.plugins if name[0] == next_tag]
-            for lang in langs:
-                plugin = self._get_plugin(next_tag, lang)
-                if plugin and plugin.match(xpath[1:]):
-                    return True
-            return False
+            # Attempt to continue matching the path using the
+            # stanza's plugins.
+            if not matched_substanzas:
+                for name, lang in self._plugins:
+                    if name != next_tag:
+                        continue
+                    plugin = self._get_plugin(next_tag, lang)
+                    if plugin and plugin._match_path(path, index + 1):
+                        return True
+                return False
 
         # Everything matched.
         return True
@@ -1225,6 +1419,7 @@ class ElementBase(object):
         :param item: Either an XML object or a stanza object to add to
                      this stanza's contents.
         """
+        self._writable()
         if not isinstance(item, ElementBase):
             if type(item) == XML_TYPE:
                 return self.appendxml(item)
@@ -1249,6 +1444,7 @@ class ElementBase(object):
 
         :param XML xml: The XML object to add to the stanza.
         """
+        self._writable()
         self.xml.append(xml)
         return self
 
@@ -1260,6 +1456,7 @@ class ElementBase(object):
 
         :param int index: The index of the substanza to remove.
         """
+        self._writable()
         substanza = self.iterables.pop(index)
         self.xml.remove(substanza.xml)
         return substanza
@@ -1273,6 +1470,7 @@ class ElementBase(object):
 
         Any attribute values will be preserved.
         """
+        self._writable()
         for child in list(self.xml):
             self.xml.remove(child)
 
@@ -1407,6 +1605,52 @@ class ElementBase(object):
         """
         return self.__class__(xml=copy.deepcopy(self.xml), parent=self.parent)
 
+    def share(self):
+        """Return a copy of the stanza object that shares the same
+        underlying XML object until either stanza is modified.
+
+        The XML is copied by the first stanza to change it through its
+        interfaces, plugins, or methods such as :meth:`append()` and
+        :meth:`clear()`. Changes made directly to the :attr:`xml`
+        object are not detected; call :meth:`_writable()` first
+        when doing so.
+        """
+        self._cow = True
+        stanza = self.__class__(xml=self.xml, parent=self.parent)
+        stanza._cow = True
+        return stanza
+
+    def _writable(self):
+        """Ensure that the stanza's XML is not shared with any copies
+        made by :meth:`share()` before it is modified.
+        """
+        stanza = self
+        while not stanza._cow:
+            parent = stanza.parent() if stanza.parent is not None else None
+            if parent is None:
+                return
+            stanza = parent
+        stanza._cow = False
+        old = stanza.xml
+        new = copy.deepcopy(old)
+        stanza._rebind(dict(zip(old.iter(), new.iter())))
+
+    def _rebind(self, elements):
+        """Switch the stanza and its substanzas over to a copy
+        of their XML.
+
+        :param dict elements: A mapping of the original XML elements
+                              to their copies.
+        """
+        self.xml = elements.get(self.xml, self.xml)
+        if self._pending is not None:
+            self._pending = [(elements.get(child, child), plugin_class)
+                             for child, plugin_class in self._pending]
+        for plugin in self._plugins.values():
+            plugin._rebind(elements)
+        for stanza in self._iterables:
+            stanza._rebind(elements)
+
     def __str__(self, top_level_ns=True):
         """Return a string serialization of the underlying XML object.
 
@@ -1583,14 +1827,16 @@ class StanzaBase(ElementBase):
         log.exception('Error handling {%s}%s stanza', self.namespace,
                                                       self.name)
 
-    def send(self, now=False):
+    def send(self, now=False, priority=PRIORITY_NORMAL):
         """Queue the stanza to be sent on the XML stream.
 
         :param bool now: Indicates if the queue should be skipped and the
                          stanza sent immediately. Useful for stream
                          initialization. Defaults to ``False``.
+        :param int priority: The lane of the send queue to use.
+                             Defaults to ``PRIORITY_NORMAL``.
         """
-        self.stream.send(self, now=now)
+        self.stream.send(self, now=now, priority=priority)
 
     def __copy__(self):
         """Return a copy of the stanza object that does not share the
@@ -1599,6 +1845,18 @@ class StanzaBase(ElementBase):
         return self.__class__(xml=copy.deepcopy(self.xml),
                               stream=self.stream)
 
+    def share(self):
+        """Return a copy of the stanza object that shares the same
+        underlying XML object until either stanza is modified, and
+        shares the same XML stream.
+
+        See :meth:`ElementBase.share()`.
+        """
+        self._cow = True
+        stanza = self.__class__(xml=self.xml, stream=self.stream)
+        stanza._cow = True
+        return stanza
+
     def __str__(self, top_level_ns=False):
         """Serialize the stanza's XML to a string.
 
@@ -15,6 +15,7 @@
 
 from __future__ import unicode_literals
 
+import re
 import sys
 
 if sys.version_info < (3, 0):
@@ -23,6 +24,37 @@ if sys.version_info < (3, 0):
 
 XML_NS = 'http://www.w3.org/XML/1998/namespace'
 
+#: The maximum number of tag and attribute names whose namespace and
+#: local name split is cached.
+TAG_CACHE_SIZE = 4096
+
+_tag_cache = {}
+
+
+def split_tag(tag):
+    """Split a ``'{namespace}name'`` tag or attribute name into its
+    namespace and local name.
+
+    Results are cached, since the same names are serialized
+    over and over.
+
+    :param string tag: The tag or attribute name.
+    :rtype: tuple
+    """
+    try:
+        return _tag_cache[tag]
+    except KeyError:
+        pass
+    if '}' in tag:
+        ns, name = tag.split('}', 1)
+        result = (ns[1:], name)
+    else:
+        result = ('', tag)
+    if len(_tag_cache) >= TAG_CACHE_SIZE:
+        _tag_cache.clear()
+    _tag_cache[tag] = result
+    return result
+
 
 def tostring(xml=None, xmlns='', stream=None, outbuffer='',
              top_level=False, open_only=False, namespaces=None):
@@ -49,94 +81,128 @@ def tostring(xml=None, xmlns='', stream=None, outbuffer='',
 
     :rtype: Unicode string
     """
-    # Add previous results to the start of the output.
     output = [outbuffer]
+    serialize(xml, output.append, xmlns, stream, top_level,
+              open_only, namespaces)
+    return ''.join(output)
 
-    # Extract the element's tag name.
-    tag_name = xml.tag.split('}', 1)[-1]
 
-    # Extract the element's namespace if it is defined.
-    if '}' in xml.tag:
-        tag_xmlns = xml.tag.split('}', 1)[0][1:]
-    else:
-        tag_xmlns = ''
+def serialize(xml, write, xmlns='', stream=None, top_level=False,
+              open_only=False, namespaces=None):
+    """Serialize an XML object, passing the output in pieces to
+    a writer function.
 
-    default_ns = ''
-    stream_ns = ''
-    use_cdata = False
+    The output is the same as for :func:`tostring()`, but the XML
+    is walked without recursion and the pieces may be written straight
+    into another buffer, such as a list or an encoding byte buffer.
 
+    :param XML xml: The XML object to serialize.
+    :param write: A function accepting each piece of output as a
+                  Unicode string.
+    :param string xmlns: Optional namespace of an element wrapping the XML
+                         object.
+    :param stream: The XML stream that generated the XML object.
+    :param bool top_level: Indicates that the element is the outermost
+                           element.
+    :param bool open_only: Only output the opening tag of the element.
+    :param set namespaces: Track which namespaces are in active use so
+                           that new ones can be declared when needed.
+    """
     if stream:
         default_ns = stream.default_ns
         stream_ns = stream.stream_ns
         use_cdata = stream.use_cdata
-
-    # Output the tag name and derived namespace of the element.
-    namespace = ''
-    if tag_xmlns:
-        if top_level and tag_xmlns not in [default_ns, xmlns, stream_ns] \
-          or not top_level and tag_xmlns != xmlns:
-            namespace = ' xmlns="%s"' % tag_xmlns
-    if stream and tag_xmlns in stream.namespace_map:
-        mapped_namespace = stream.namespace_map[tag_xmlns]
-        if mapped_namespace:
-            tag_name = "%s:%s" % (mapped_namespace, tag_name)
-    output.append("<%s" % tag_name)
-    output.append(namespace)
-
-    # Output escaped attribute values.
-    new_namespaces = set()
-    for attrib, value in xml.attrib.items():
-        value = escape(value, use_cdata)
-        if '}' not in attrib:
-            output.append(' %s="%s"' % (attrib, value))
+        namespace_map = stream.namespace_map
+    else:
+        default_ns = ''
+        stream_ns = ''
+        use_cdata = False
+        namespace_map = None
+
+    if namespaces is None:
+        namespaces = set()
+
+    # The stack holds elements still to be written, as (element,
+    # outer namespace) pairs, and the closing output for elements
+    # whose children are being written, as (None, (output, namespaces
+    # introduced by the element)) pairs.
+    stack = [(xml, xmlns)]
+    while stack:
+        elem, outer = stack.pop()
+        if elem is None:
+            write(outer[0])
+            namespaces.difference_update(outer[1])
+            continue
+
+        tag_xmlns, tag_name = split_tag(elem.tag)
+
+        # Output the tag name and derived namespace of the element.
+        write('<')
+        if tag_xmlns:
+            if top_level:
+                if tag_xmlns not in (default_ns, outer, stream_ns):
+                    namespace = ' xmlns="%s"' % tag_xmlns
+                else:
+                    namespace = ''
+            elif tag_xmlns != outer:
+                namespace = ' xmlns="%s"' % tag_xmlns
+            else:
+                namespace = ''
         else:
-            attrib_ns = attrib.split('}')[0][1:]
-            attrib = attrib.split('}')[1]
+            namespace = ''
+        if namespace_map and tag_xmlns in namespace_map:
+            mapped_namespace = namespace_map[tag_xmlns]
+            if mapped_namespace:
+                tag_name = "%s:%s" % (mapped_namespace, tag_name)
+        write(tag_name)
+        if namespace:
+            write(namespace)
+        top_level = False
+
+        # Output escaped attribute values.
+        new_namespaces = ()
+        for attrib, value in elem.attrib.items():
+            value = escape(value, use_cdata)
+            if '}' not in attrib:
+                write(' %s="%s"' % (attrib, value))
+                continue
+            attrib_ns, attrib = split_tag(attrib)
             if attrib_ns == XML_NS:
-                output.append(' xml:%s="%s"' % (attrib, value))
-            elif stream and attrib_ns in stream.namespace_map:
-                mapped_ns = stream.namespace_map[attrib_ns]
+                write(' xml:%s="%s"' % (attrib, value))
+            elif namespace_map and attrib_ns in namespace_map:
+                mapped_ns = namespace_map[attrib_ns]
                 if mapped_ns:
-                    if namespaces is None:
-                        namespaces = set()
                     if attrib_ns not in namespaces:
                         namespaces.add(attrib_ns)
-                        new_namespaces.add(attrib_ns)
-                        output.append(' xmlns:%s="%s"' % (
-                            mapped_ns, attrib_ns))
-                    output.append(' %s:%s="%s"' % (
-                        mapped_ns, attrib, value))
-
-    if open_only:
-        # Only output the opening tag, regardless of content.
-        output.append(">")
-        return ''.join(output)
-
-    if len(xml) or xml.text:
-        # If there are additional child elements to serialize.
-        output.append(">")
-        if xml.text:
-            output.append(escape(xml.text, use_cdata))
-        if len(xml):
-            for child in xml:
-                output.append(tostring(child, tag_xmlns, stream,
-                    namespaces=namespaces))
-        output.append("</%s>" % tag_name)
-    elif xml.text:
-        # If we only have text content.
-        output.append(">%s</%s>" % (escape(xml.text, use_cdata), tag_name))
-    else:
-        # Empty element.
-        output.append(" />")
-    if xml.tail:
-        # If there is additional text after the element.
-        output.append(escape(xml.tail, use_cdata))
-    for ns in new_namespaces:
-        # Remove namespaces introduced in this context. This is necessary
-        # because the namespaces object continues to be shared with other
-        # contexts.
-        namespaces.remove(ns)
-    return ''.join(output)
+                        new_namespaces += (attrib_ns,)
+                        write(' xmlns:%s="%s"' % (mapped_ns, attrib_ns))
+                    write(' %s:%s="%s"' % (mapped_ns, attrib, value))
+
+        if open_only:
+            # Only output the opening tag, regardless of content.
+            write('>')
+            return
+
+        tail = escape(elem.tail, use_cdata) if elem.tail else ''
+        if len(elem) or elem.text:
+            # If there are additional child elements to serialize.
+            write('>')
+            if elem.text:
+                write(escape(elem.text, use_cdata))
+            # Remove namespaces introduced in this context once the
+            # element is closed, since the namespaces set is shared
+            # with other contexts.
+            stack.append((None, ('</%s>%s' % (tag_name, tail),
+                                 new_namespaces)))
+            for child in reversed(elem):
+                stack.append((child, tag_xmlns))
+        else:
+            # Empty element.
+            write(' />')
+            if tail:
+                # If there is additional text after the element.
+                write(tail)
+            namespaces.difference_update(new_namespaces)
 
 
 def escape(text, use_cdata=False):
@@ -149,24 +215,19 @@ def escape(text, use_cdata=False):
         if type(text) != types.UnicodeType:
             text = unicode(text, 'utf-8', 'ignore')
 
-    escapes = {'&': '&amp;',
-               '<': '&lt;',
-               '>': '&gt;',
-               "'": '&apos;',
-               '"': '&quot;'}
-
     if not use_cdata:
-        text = list(text)
-        for i, c in enumerate(text):
-            text[i] = escapes.get(c, c)
-        return ''.join(text)
-    else:
-        escape_needed = False
-        for c in text:
-            if c in escapes:
-                escape_needed = True
-                break
-        if escape_needed:
-            escaped = map(lambda x : "<![CDATA[%s]]>" % x, text.split("]]>"))
-            return "<![CDATA[]]]><![CDATA[]>]]>".join(escaped)
-        return text
+        # Chained replacements are faster than either a translation
+        # table or a regular expression, and '&' must come first.
+        if '&' in text:
+            text = text.replace('&', '&amp;')
+        return text.replace('<', '&lt;') \
+                   .replace('>', '&gt;') \
+                   .replace("'", '&apos;') \
+                   .replace('"', '&quot;')
+    elif _ESCAPE_RE.search(text) is not None:
+        escaped = map(lambda x : "<![CDATA[%s]]>" % x, text.split("]]>"))
+        return "<![CDATA[]]]><![CDATA[]>]]>".join(escaped)
+    return text
+
+
+_ESCAPE_RE = re.compile('[&<>\'"]')
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+    sleekxmpp.xmlstream.workers
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    This module provides a bounded pool of worker threads for
+    executing event handlers outside of the event runner.
+
+    Part of SleekXMPP: The Sleek XMPP Library
+
+    :copyright: (c) 2011 Nathanael C. Fritz
+    :license: MIT, see LICENSE for more details
+"""
+
+from __future__ import with_statement
+
+import collections
+import logging
+import threading
+import time
+
+
+log = logging.getLogger(__name__)
+
+
+#: Wait for room in the queue before accepting more work.
+BLOCK = 'block'
+
+#: Discard work that does not fit in the queue.
+DROP = 'drop'
+
+#: Execute work that does not fit in the queue in the submitting thread.
+CALLER_RUNS = 'caller'
+
+#: The time in seconds an idle worker thread waits for more
+#: work before exiting.
+IDLE_TIMEOUT = 2.0
+
+
+class WorkerPool(object):
+
+    """
+    A pool of at most :attr:`max_workers` threads executing submitted
+    functions in the order they were submitted.
+
+    Worker threads are started as needed and exit after being idle
+    for :data:`IDLE_TIMEOUT` seconds.
+
+    Work may be submitted with a key, such as an event name, and the
+    number of functions with the same key executing at once can be
+    limited using :meth:`set_limit()`. Work held back by a key's limit
+    still counts towards the queue size.
+
+    When the queue is full, the pool's :attr:`policy` decides what
+    happens to newly submitted work:
+
+        :``'block'``: Wait until there is room in the queue.
+        :``'drop'``: Discard the work and count it in :attr:`dropped`.
+        :``'caller'``: Execute the work in the submitting thread.
+
+    :param int max_workers: The maximum number of worker threads.
+    :param int max_queue: The maximum number of functions waiting to
+                          execute, or ``0`` for no limit.
+    :param string policy: What to do when the queue is full.
+                          Defaults to ``'block'``.
+    :param bool daemon: Indicates if worker threads should be
+                        daemon threads. Defaults to ``True``.
+    :param string name: Prefix for the names of worker threads.
+    """
+
+    def __init__(self, max_workers=16, max_queue=0, policy=BLOCK,
+                 daemon=True, name='Worker'):
+        if policy not in (BLOCK, DROP, CALLER_RUNS):
+            raise ValueError("Unknown queue policy: %s" % policy)
+
+        #: The maximum number of worker threads.
+        self.max_workers = max_workers
+
+        #: The maximum number of functions waiting to execute.
+        self.max_queue = max_queue
+
+        #: The action to take when the queue is full.
+        self.policy = policy
+
+        self.daemon = daemon
+        self.name = name
+
+        #: The number of functions submitted to the pool.
+        self.submitted = 0
+
+        #: The number of functions that have finished executing.
+        self.completed = 0
+
+        #: The number of functions discarded because the queue was full.
+        self.dropped = 0
+
+        #: The largest number of functions that have been waiting at once.
+        self.peak_queue = 0
+
+        self._cond = threading.Condition()
+        self._queue = collections.deque()
+        self._deferred = {}
+        self._waiting = 0
+        self._running = {}
+        self._limits = {}
+        self._workers = 0
+        self._idle = 0
+        self._active = 0
+
+    @property
+    def workers(self):
+        """The number of worker threads currently running."""
+        return self._workers
+
+    @property
+    def active(self):
+        """The number of functions currently executing."""
+        return self._active
+
+    def qsize(self):
+        """Return the number of functions waiting to execute."""
+        return self._waiting
+
+    def stats(self):
+        """Return a dictionary of the pool's queue and thread counts."""
+        with self._cond:
+            return {'workers': self._workers,
+                    'active': self._active,
+                    'queued': self._waiting,
+                    'peak_queue': self.peak_queue,
+                    'submitted': self.submitted,
+                    'completed': self.completed,
+                    'dropped': self.dropped}
+
+    def set_limit(self, key, limit):
+        """Limit the number of functions submitted with the given
+        key that may execute at once.
+
+        :param key: The key used when submitting work.
+        :param int limit: The maximum number of concurrent executions,
+                          or ``None`` to remove the limit.
+        """
+        with self._cond:
+            if limit is None:
+                self._limits.pop(key, None)
+            else:
+                self._limits[key] = max(1, limit)
+            self._promote(key)
+
+    def submit(self, func, args=(), key=None):
+        """Queue a function for execution by a worker thread.
+
+        Returns ``False`` if the function was discarded because the
+        queue was full, and ``True`` otherwise.
+
+        :param func: The function to execute.
+        :param tuple args: The arguments to pass to the function.
+        :param key: Optional key for limiting concurrent execution.
+        """
+        with self._cond:
+            if self.max_queue and self._waiting >= self.max_queue:
+                if self.policy == DROP:
+                    self.dropped += 1
+                    log.warning('%s pool queue full, dropping: %s',
+                                self.name, func)
+                    return False
+                elif self.policy == BLOCK:
+                    while self._waiting >= self.max_queue:
+                        self._cond.wait()
+                else:
+                    run_here = True
+            else:
+                run_here = False
+
+            self.submitted += 1
+            if not run_here:
+                self._waiting += 1
+                self.peak_queue = max(self.peak_queue, self._waiting)
+                limit = self._limits.get(key)
+                if limit is not None and self._running.get(key, 0) >= limit:
+                    self._deferred.setdefault(key, collections.deque()) \
+                                  .append((func, args, key))
+                else:
+                    self._running[key] = self._running.get(key, 0) + 1
+                    self._queue.append((func, args, key))
+                    self._wake()
+                return True
+
+        self._execute(func, args)
+        with self._cond:
+            self.completed += 1
+        return True
+
+    def _wake(self):
+        if self._idle:
+            self._cond.notify_all()
+        if len(self._queue) > self._idle and \
+           self._workers < self.max_workers:
+            self._workers += 1
+            thread = threading.Thread(name='%s_%s' % (self.name,
+                                                      self._workers),
+                                      target=self._worker)
+            thread.daemon = self.daemon
+            thread.start()
+
+    def _promote(self, key):
+        deferred = self._deferred.get(key)
+        limit = self._limits.get(key)
+        while deferred and (limit is None or
+                            self._running.get(key, 0) < limit):
+            self._running[key] = self._running.get(key, 0) + 1
+            self._queue.append(deferred.popleft())
+            self._wake()
+        if deferred is not None and not deferred:
+            del self._deferred[key]
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                expires = time.time() + IDLE_TIMEOUT
+                while not self._queue:
+                    remaining = expires - time.time()
+                    if remaining <= 0:
+                        self._workers -= 1
+                        return
+                    self._idle += 1
+                    self._cond.wait(remaining)
+                    self._idle -= 1
+                func, args, key = self._queue.popleft()
+                self._waiting -= 1
+                self._active += 1
+                # Wake any submitters waiting for room in the queue.
+                self._cond.notify_all()
+
+            self._execute(func, args)
+
+            with self._cond:
+                self._active -= 1
+                self.completed += 1
+                self._running[key] -= 1
+                if not self._running[key]:
+                    del self._running[key]
+                self._promote(key)
+
+    def _execute(self, func, args):
+        try:
+            func(*args)
+        except Exception:
+            log.exception('Error in %s pool: %s', self.name, func)
@@ -17,6 +17,7 @@ from __future__ import with_statement, unicode_literals
 import base64
 import copy
 import logging
+import os
 import signal
 import socket as Socket
 import ssl
@@ -34,13 +35,24 @@ import sleekxmpp
 from sleekxmpp.util import Queue, QueueEmpty, safedict
 from sleekxmpp.thirdparty.statemachine import StateMachine
 from sleekxmpp.xmlstream import Scheduler, tostring, cert
+from sleekxmpp.xmlstream.tostring import escape
+from sleekxmpp.xmlstream.aio import LoopQueue, NotifyingEvent, create_future
+from sleekxmpp.xmlstream.dispatch import HandlerIndex, ResponseTable
+from sleekxmpp.xmlstream.dispatch import ShardedQueue
+from sleekxmpp.xmlstream.scheduler import LoopScheduler
+from sleekxmpp.xmlstream.workers import WorkerPool
+from sleekxmpp.xmlstream.reader import StreamReader, READ_SIZE, \
+                                      PARSE_EVENTS, has_pull_parser
+from sleekxmpp.xmlstream.sendqueue import SendQueue, PRIORITY_NORMAL, \
+                                          PRIORITY_LOW
 from sleekxmpp.xmlstream.stanzabase import StanzaBase, ET, ElementBase
 from sleekxmpp.xmlstream.handler import Waiter, XMLCallback
 from sleekxmpp.xmlstream.matcher import MatchXMLMask
 from sleekxmpp.xmlstream.resolver import resolve, default_resolver
 
 # In Python 2.x, file socket objects are broken. A patched socket
-# wrapper is provided for this case in filesocket.py.
+# wrapper is provided for this case in filesocket.py. It is used
+# to parse the stream since there is no ET.XMLPullParser.
 if sys.version_info < (3, 0):
     from sleekxmpp.xmlstream.filesocket import FileSocket, Socket26
 
@@ -59,6 +71,21 @@ WAIT_TIMEOUT = 1.0
 #: a GIL increasing this value can provide better performance.
 HANDLER_THREADS = 1
 
+#: The default number of event runner threads for streams that split
+#: their event queue by sender, to process stanzas from different
+#: senders in parallel. See :attr:`XMLStream.event_shards`.
+EVENT_SHARDS = 1
+
+#: The maximum number of threads used to execute event handlers
+#: registered with ``threaded=True``.
+HANDLER_POOL_SIZE = 32
+
+#: The maximum number of threaded event handler calls waiting for a
+#: free thread. Once reached, the event runner waits for room in the
+#: pool's queue, unless :attr:`XMLStream.handler_pool` uses a different
+#: policy. Use ``0`` for no limit.
+HANDLER_POOL_QUEUE = 1000
+
 #: The time in seconds to delay between attempts to resend data
 #: after an SSL error.
 SSL_RETRY_DELAY = 0.5
@@ -67,6 +94,23 @@ SSL_RETRY_DELAY = 0.5
 #: an SSL error.
 SSL_RETRY_MAX = 10
 
+#: The approximate maximum number of bytes of queued data to combine
+#: into a single write when :attr:`XMLStream.send_batching` is enabled.
+SEND_BATCH_SIZE = 65536
+
+#: The time in seconds to wait for more data to add to a batch
+#: before writing it, when :attr:`XMLStream.send_batching` is enabled.
+SEND_BATCH_DELAY = 0.0
+
+#: The maximum number of buffers which may be written with a single
+#: ``sendmsg`` call, which also limits the number of items in a batch.
+try:
+    IOV_MAX = os.sysconf(str('SC_IOV_MAX'))
+except (AttributeError, TypeError, ValueError, OSError):
+    IOV_MAX = -1
+if IOV_MAX <= 0:
+    IOV_MAX = 1024
+
 #: Maximum time to delay between connection attempts is one hour.
 RECONNECT_MAX_DELAY = 600
 
@@ -197,8 +241,16 @@ class XMLStream(object):
         #: The desired, or actual, address of the connected server.
         self.address = (host, int(port))
 
-        #: A file-like wrapper for the socket for use with the
-        #: :mod:`~xml.etree.ElementTree` module.
+        #: The :class:`~sleekxmpp.xmlstream.reader.StreamReader` used
+        #: to receive and parse the stream. Its ``read_size`` may be
+        #: changed, and it counts the bytes received. It is ``None``
+        #: before Python 3.4, which has no ``ET.XMLPullParser``.
+        self.reader = None
+        if has_pull_parser():
+            self.reader = StreamReader(read_size=READ_SIZE)
+
+        #: A file-like wrapper for the socket for use with
+        #: ``ET.iterparse()`` when there is no :attr:`reader`.
         self.filesocket = None
         self.set_socket(socket)
 
@@ -290,11 +342,64 @@ class XMLStream(object):
         #: A queue of stream, custom, and scheduled events to be processed.
         self.event_queue = Queue()
 
-        #: A queue of string data to be sent over the stream.
-        self.send_queue = Queue()
+        #: If ``True``, stanzas given to more than one handler are
+        #: shared using :meth:`~sleekxmpp.xmlstream.stanzabase.ElementBase.share()`
+        #: instead of being copied for each handler, and the XML is only
+        #: copied by handlers that modify it. Handlers which change a
+        #: stanza's XML object directly, instead of through its
+        #: interfaces, must not be used with this setting.
+        self.copy_on_write = False
+
+        #: The number of event runner threads to use, each with its own
+        #: share of the event queue. Events for stanzas from the same
+        #: bare JID, or the same MUC room, always go to the same runner,
+        #: so they are handled in the order they were received, while a
+        #: slow handler only delays events for the senders sharing its
+        #: runner. With the default of ``1``, :data:`HANDLER_THREADS`
+        #: runners share a single queue instead. Must be set before
+        #: calling :meth:`process()`, and is ignored when processing
+        #: on an event loop.
+        self.event_shards = EVENT_SHARDS
+
+        #: A :class:`~sleekxmpp.xmlstream.sendqueue.SendQueue` of string
+        #: data to be sent over the stream. Its size is not limited by
+        #: default; setting ``send_queue.max_size`` bounds it, with
+        #: ``send_queue.policy`` deciding if senders wait for room or
+        #: have their data dropped. The ``'send_queue_high'`` and
+        #: ``'send_queue_low'`` events are raised with the queue's
+        #: statistics when it fills up to its high water mark and
+        #: when it has drained again.
+        self.send_queue = SendQueue(watermark=self.__send_watermark)
         self.send_queue_lock = threading.Lock()
         self.send_lock = threading.RLock()
 
+        #: If ``True``, the send thread combines data waiting in
+        #: :attr:`send_queue` into a single write of up to about
+        #: :attr:`send_batch_size` bytes and :data:`IOV_MAX` items,
+        #: waiting up to
+        #: :attr:`send_batch_delay` seconds for more data to arrive.
+        #: This saves system calls and TLS records when sending many
+        #: stanzas at once, such as presence broadcasts.
+        self.send_batching = False
+        self.send_batch_size = SEND_BATCH_SIZE
+        self.send_batch_delay = SEND_BATCH_DELAY
+
+        #: If ``True``, stanzas are queued in the order they passed
+        #: through the ``'out_sync'`` filters: they all use the normal
+        #: lane of :attr:`send_queue`, whatever their priority, and are
+        #: never dropped or kept waiting by a full queue. Stream
+        #: management sets this while it is enabled, since the server
+        #: acks stanzas by counting them in the order they arrive.
+        self.send_ordered = False
+
+        self.__send_stats = {'batches': 0,
+                             'stanzas': 0,
+                             'bytes': 0,
+                             'last_batch': 0,
+                             'max_batch': 0,
+                             'last_flush_latency': 0.0,
+                             'max_flush_latency': 0.0}
+
         #: A :class:`~sleekxmpp.xmlstream.scheduler.Scheduler` instance for
         #: executing callbacks in the future based on time delays.
         self.scheduler = Scheduler(self.stop)
@@ -305,7 +410,8 @@ class XMLStream(object):
 
         self.__thread = {}
         self.__root_stanza = []
-        self.__handlers = []
+        self.__handlers = HandlerIndex()
+        self.__responses = ResponseTable()
         self.__event_handlers = {}
         self.__event_handlers_lock = threading.Lock()
         self.__filters = {'in': [], 'out': [], 'out_sync': []}
@@ -315,12 +421,35 @@ class XMLStream(object):
         self._use_daemons = False
         self._disconnect_wait_for_threads = True
 
+        #: The pool of threads executing event handlers registered
+        #: with ``threaded=True``. Work is keyed by event name, so
+        #: the number of concurrent handlers for an event can be
+        #: limited with ``handler_pool.set_limit(name, limit)``.
+        self.handler_pool = WorkerPool(HANDLER_POOL_SIZE,
+                                       HANDLER_POOL_QUEUE,
+                                       daemon=self._use_daemons,
+                                       name='Event')
+
         self._id = 0
         self._id_lock = threading.Lock()
 
         #: We use an ID prefix to ensure that all ID values are unique.
         self._id_prefix = '%s-' % uuid.uuid4()
 
+        #: The :mod:`asyncio` event loop processing the stream, if one
+        #: was given to :meth:`process()`. Otherwise, ``None``, and the
+        #: stream is processed using threads.
+        self.loop = None
+        self._loop_thread = None
+
+        #: A future which is resolved once processing on :attr:`loop`
+        #: has stopped.
+        self.loop_stopped = None
+        self.__loop_reading = False
+        self.__loop_writing = False
+        self.__loop_out = bytearray()
+        self.__loop_held = []
+
         #: The :attr:`auto_reconnnect` setting controls whether or not
         #: the stream will be restarted in the event of an error.
         self.auto_reconnect = True
@@ -684,6 +813,10 @@ class XMLStream(object):
                            prevents error loops when trying to
                            disconnect after a socket error.
         """
+        if self.loop is not None and not self._in_loop_thread():
+            self.loop.call_soon_threadsafe(self.disconnect,
+                                           reconnect, wait, send_close)
+            return
         self.state.transition('connected', 'disconnected',
                               wait=2.0,
                               func=self._disconnect,
@@ -715,8 +848,10 @@ class XMLStream(object):
         # Wait for confirmation that the stream was
         # closed in the other direction. If we didn't
         # send a stream footer we don't need to wait
-        # since the server won't know to respond.
-        if send_close:
+        # since the server won't know to respond. When
+        # running on an event loop, nothing could be read
+        # while waiting, so don't.
+        if send_close and self.loop is None:
             log.info('Waiting for %s from server', self.stream_footer)
             self.stream_end_event.wait(4)
         else:
@@ -727,10 +862,14 @@ class XMLStream(object):
             if self._disconnect_wait_for_threads:
                 self._wait_for_threads()
 
+        if self.loop is not None:
+            self.__loop_stop_io(flush=True)
+
         try:
             self.socket.shutdown(Socket.SHUT_RDWR)
             self.socket.close()
-            self.filesocket.close()
+            if self.filesocket is not None:
+                self.filesocket.close()
         except (Socket.error, ssl.SSLError) as serr:
             self.event('socket_error', serr, direct=True)
         finally:
@@ -739,14 +878,20 @@ class XMLStream(object):
             return True
 
     def abort(self):
+        if self.loop is not None and not self._in_loop_thread():
+            self.loop.call_soon_threadsafe(self.abort)
+            return
         self.session_started_event.clear()
         self.set_stop()
         if self._disconnect_wait_for_threads:
             self._wait_for_threads()
+        if self.loop is not None:
+            self.__loop_stop_io()
         try:
             self.socket.shutdown(Socket.SHUT_RDWR)
             self.socket.close()
-            self.filesocket.close()
+            if self.filesocket is not None:
+                self.filesocket.close()
         except Socket.error:
             pass
         self.state.transition_any(['connected', 'disconnected'], 'disconnected', func=lambda: True)
@@ -783,24 +928,28 @@ class XMLStream(object):
     def set_socket(self, socket, ignore=False):
         """Set the socket to use for the stream.
 
-        The filesocket will be recreated as well.
+        The stream's reader, or file wrapper, will use the new socket
+        as well.
 
         :param socket: The new socket object to use.
         :param bool ignore: If ``True``, don't set the connection
                             state to ``'connected'``.
         """
         self.socket = socket
+        if self.reader is not None:
+            self.reader.socket = socket
         if socket is not None:
-            # ElementTree.iterparse requires a file.
-            # 0 buffer files have to be binary.
-
-            # Use the correct fileobject type based on the Python
-            # version to work around a broken implementation in
-            # Python 2.x.
-            if sys.version_info < (3, 0):
-                self.filesocket = FileSocket(self.socket)
-            else:
-                self.filesocket = self.socket.makefile('rb', 0)
+            if self.reader is None:
+                # ElementTree.iterparse requires a file.
+                # 0 buffer files have to be binary.
+
+                # Use the correct fileobject type based on the Python
+                # version to work around a broken implementation in
+                # Python 2.x.
+                if sys.version_info < (3, 0):
+                    self.filesocket = FileSocket(self.socket)
+                else:
+                    self.filesocket = self.socket.makefile('rb', 0)
             if not ignore:
                 self.state._set_state('connected')
 
@@ -863,7 +1012,16 @@ class XMLStream(object):
             self.socket = ssl_socket
 
         try:
-            self.socket.do_handshake()
+            if self.loop is not None:
+                # The handshake is performed in blocking mode, even
+                # when running on an event loop.
+                self.socket.setblocking(True)
+                try:
+                    self.socket.do_handshake()
+                finally:
+                    self.socket.setblocking(False)
+            else:
+                self.socket.do_handshake()
         except (Socket.error, ssl.SSLError):
             log.error('CERT: Invalid certificate trust chain.')
             if not self.event_handled('ssl_invalid_chain'):
@@ -1057,21 +1215,70 @@ class XMLStream(object):
                 derived object to execute.
         """
         if handler.stream is None:
-            self.__handlers.append(handler)
+            self.__handlers.add(handler)
             handler.stream = weakref.ref(self)
 
+    def register_response_handler(self, handler, sid, timeout=None,
+                                  timeout_callback=None):
+        """Add a stream handler that will be executed when the response
+        to a request sent on the stream is received.
+
+        Response handlers are looked up by the ``'id'`` of the request
+        and are checked before any other stream handlers. They are
+        otherwise treated like handlers added with
+        :meth:`register_handler()`, and may be removed by name using
+        :meth:`remove_handler()`.
+
+        :param handler:
+                The :class:`~sleekxmpp.xmlstream.handler.base.BaseHandler`
+                derived object to execute.
+        :param string sid: The ``'id'`` value of the request.
+        :param int timeout: Time in seconds to wait for a response before
+                            removing the handler and executing
+                            ``timeout_callback``. Defaults to
+                            :attr:`response_timeout` if a
+                            ``timeout_callback`` is given; otherwise the
+                            handler does not expire.
+        :param timeout_callback: Optional function to execute, without
+                                 arguments, if no response arrives in time.
+        """
+        if handler.stream is not None:
+            return
+        handler.stream = weakref.ref(self)
+        if timeout_callback is None:
+            timeout = None
+        elif timeout is None:
+            timeout = self.response_timeout
+        deadline = self.__responses.add(handler, sid, timeout,
+                                        timeout_callback)
+        if deadline is not None:
+            self.__schedule_response_timeouts(deadline)
+
+    def __schedule_response_timeouts(self, deadline):
+        """Schedule a check for expired response handlers."""
+        self.schedule('Response timeouts %r' % deadline,
+                      max(deadline - time.time(), 0),
+                      self.__expire_responses,
+                      args=(deadline,))
+
+    def __expire_responses(self, deadline):
+        """Remove expired response handlers and queue their
+        timeout callbacks.
+        """
+        expired, deadline = self.__responses.expire(deadline)
+        for handler, timeout_callback in expired:
+            self.event_queue.put(('schedule', timeout_callback, tuple(), {},
+                                  'Response timeout: %s' % handler.name))
+        if deadline is not None:
+            self.__schedule_response_timeouts(deadline)
+
     def remove_handler(self, name):
         """Remove any stream event handlers with the given name.
 
         :param name: The name of the handler.
         """
-        idx = 0
-        for handler in self.__handlers:
-            if handler.name == name:
-                self.__handlers.pop(idx)
-                return True
-            idx += 1
-        return False
+        return self.__handlers.remove_name(name) or \
+               self.__responses.remove_name(name)
 
     def get_dns_records(self, domain, port=None):
         """Get the DNS records for a domain.
@@ -1116,13 +1323,15 @@ class XMLStream(object):
                      this handler.
         :param pointer: The function to execute.
         :param threaded: If set to ``True``, the handler will execute
-                         in its own thread. Defaults to ``False``.
+                         in a thread from :attr:`handler_pool`.
+                         Defaults to ``False``.
         :param disposable: If set to ``True``, the handler will be
                            discarded after one use. Defaults to ``False``.
         """
         if not name in self.__event_handlers:
             self.__event_handlers[name] = []
-        self.__event_handlers[name].append((pointer, threaded, disposable))
+        self.__event_handlers[name].append((pointer, threaded,
+                                            disposable, name))
 
     def del_event_handler(self, name, pointer):
         """Remove a function as a handler for an event.
@@ -1167,7 +1376,7 @@ class XMLStream(object):
             #TODO:  Data should not be copied, but should be read only,
             #       but this might break current code so it's left for future.
 
-            out_data = copy.copy(data) if len(handlers) > 1 else data
+            out_data = self._copy_data(data) if len(handlers) > 1 else data
             old_exception = getattr(data, 'exception', None)
             if direct:
                 try:
@@ -1218,7 +1427,8 @@ class XMLStream(object):
         """
         return xml
 
-    def send(self, data, mask=None, timeout=None, now=False, use_filters=True):
+    def send(self, data, mask=None, timeout=None, now=False, use_filters=True,
+             priority=PRIORITY_NORMAL):
         """A wrapper for :meth:`send_raw()` for sending stanza objects.
 
         May optionally block until an expected response is received.
@@ -1240,6 +1450,10 @@ class XMLStream(object):
                                  applied to the given stanza data. Disabling
                                  filters is useful when resending stanzas.
                                  Defaults to ``True``.
+        :param int priority: The lane of the send queue to use, such as
+                             :data:`~sleekxmpp.xmlstream.sendqueue.PRIORITY_HIGH`
+                             for data which must not wait behind bulk
+                             traffic. Defaults to ``PRIORITY_NORMAL``.
         """
         if timeout is None:
             timeout = self.response_timeout
@@ -1260,6 +1474,9 @@ class XMLStream(object):
             self.register_handler(wait_for)
 
         if isinstance(data, ElementBase):
+            # The synchronous filters see stanzas in the order they are
+            # queued. Waiting for room in the queue is done after the
+            # lock is released, so other senders are not held back.
             with self.send_queue_lock:
                 if use_filters:
                     for filter in self.__filters['out_sync']:
@@ -1269,12 +1486,101 @@ class XMLStream(object):
                 str_data = tostring(data.xml, xmlns=self.default_ns,
                                               stream=self,
                                               top_level=True)
-                self.send_raw(str_data, now)
+                ordered = self.send_ordered
+                if ordered:
+                    self.send_raw(str_data, now, force=True)
+            if not ordered:
+                self.send_raw(str_data, now, priority=priority)
         else:
-            self.send_raw(data, now)
+            self.send_raw(data, now, priority=priority)
         if mask is not None:
             return wait_for.wait(timeout)
 
+    def send_many(self, data, recipients, use_filters=True,
+                  priority=PRIORITY_LOW):
+        """Send a copy of a stanza to each of many recipients, such as
+        when broadcasting presence to every contact of a component.
+
+        The stanza is passed through the outgoing filters and
+        serialized once, without a ``to`` address, and only the
+        recipient is changed for each copy. The copies are then
+        added to the send queue in a few large pieces instead of
+        one at a time.
+
+        If synchronous outgoing filters are registered, such as by
+        stream management, each copy is still given to those filters
+        as a separate stanza object. While :attr:`send_ordered` is set,
+        the copies use the normal lane and are never dropped.
+
+        Returns the number of copies queued, which leaves out copies
+        dropped because the send queue was full.
+
+        :param data: The :class:`~sleekxmpp.xmlstream.stanzabase.StanzaBase`
+                     stanza to send.
+        :param recipients: The JIDs to send the stanza to.
+        :param bool use_filters: Indicates if outgoing filters should be
+                                 applied. Defaults to ``True``.
+        :param int priority: The lane of the send queue to use.
+                             Defaults to ``PRIORITY_LOW``.
+        """
+        if use_filters:
+            for filter in self.__filters['out']:
+                data = filter(data)
+                if data is None:
+                    return 0
+
+        marker = 'to-%s' % uuid.uuid4().hex
+        with self.send_queue_lock:
+            sto = data.xml.get('to')
+            data.xml.set('to', marker)
+            try:
+                prefix, suffix = tostring(data.xml, xmlns=self.default_ns,
+                                          stream=self,
+                                          top_level=True).split(marker)
+            finally:
+                if sto is None:
+                    del data.xml.attrib['to']
+                else:
+                    data.xml.set('to', sto)
+
+            sync_filters = self.__filters['out_sync'] if use_filters else ()
+            chunks = []
+            chunk = []
+            size = 0
+            for jid in recipients:
+                jid = str(jid)
+                if sync_filters:
+                    stanza = copy.copy(data)
+                    stanza['to'] = jid
+                    for filter in sync_filters:
+                        stanza = filter(stanza)
+                        if stanza is None:
+                            break
+                    if stanza is None:
+                        continue
+                text = prefix + escape(jid) + suffix
+                chunk.append(text)
+                size += len(text)
+                if size >= self.send_batch_size:
+                    chunks.append((''.join(chunk), len(chunk)))
+                    chunk = []
+                    size = 0
+            if chunk:
+                chunks.append((''.join(chunk), len(chunk)))
+
+            if self.send_ordered:
+                for text, copies in chunks:
+                    self.send_raw(text, force=True)
+                return sum(copies for text, copies in chunks)
+
+        # Waiting for room in the queue is done after the lock is
+        # released, so other senders are not held back.
+        count = 0
+        for text, copies in chunks:
+            if self.send_raw(text, priority=priority):
+                count += copies
+        return count
+
     def send_xml(self, data, mask=None, timeout=None, now=False):
         """Send an XML object on the stream, and optionally wait
         for a response.
@@ -1297,16 +1603,31 @@ class XMLStream(object):
             timeout = self.response_timeout
         return self.send(tostring(data), mask, timeout, now)
 
-    def send_raw(self, data, now=False, reconnect=None):
+    def send_raw(self, data, now=False, reconnect=None,
+                 priority=PRIORITY_NORMAL, force=False):
         """Send raw data across the stream.
 
+        Returns ``False`` if the data was dropped because the send
+        queue was full, and ``True`` otherwise.
+
         :param string data: Any string value.
         :param bool reconnect: Indicates if the stream should be
                                restarted if there is an error sending
                                the stanza. Used mainly for testing.
                                Defaults to :attr:`auto_reconnect`.
+        :param int priority: The lane of the send queue to use.
+                             Defaults to ``PRIORITY_NORMAL``.
+        :param bool force: Queue the data without waiting, even if the
+                           send queue is full. Defaults to ``False``.
         """
-        if now:
+        if self.loop is not None:
+            if now:
+                log.debug("SEND (IMMED): %s", data)
+                self._call_in_loop(self.__loop_write, data)
+            else:
+                return self.send_queue.put(data, priority=priority,
+                                           force=force)
+        elif now:
             log.debug("SEND (IMMED): %s", data)
             try:
                 data = data.encode('utf-8')
@@ -1346,7 +1667,7 @@ class XMLStream(object):
                 if not self.stop.is_set():
                     self.disconnect(reconnect, send_close=False)
         else:
-            self.send_queue.put(data)
+            return self.send_queue.put(data, priority=priority, force=force)
         return True
 
     def _start_thread(self, name, target, track=True):
@@ -1390,6 +1711,11 @@ class XMLStream(object):
         # Unlock queues
         self.event_queue.put(None)
         self.send_queue.put(None)
+        self.send_queue.release()
+
+        if self.loop is not None:
+            self.scheduler.quit()
+            self._call_in_loop(self.__loop_finish)
 
     def _wait_for_threads(self):
         with self.__thread_cond:
@@ -1426,8 +1752,16 @@ class XMLStream(object):
                     Defaults to ``True``. This does **not** mean that no
                     threads are used at all if ``threaded=False``.
 
+        :param loop: An :mod:`asyncio` event loop. If given, reading,
+                    parsing, sending, scheduling, and running handlers
+                    all take place on the loop instead of in separate
+                    threads. Handlers registered with ``threaded=True``
+                    still run in :attr:`handler_pool`. With
+                    ``block=True`` the loop is run until the stream
+                    is stopped; otherwise, the caller must run it.
+
         Regardless of these threading options, these threads will
-        always exist:
+        always exist when no event loop is used:
 
         - The event queue processor
         - The send queue processor
@@ -1441,9 +1775,26 @@ class XMLStream(object):
         else:
             threaded = kwargs.get('threaded', True)
 
-        for t in range(0, HANDLER_THREADS):
-            log.debug("Starting HANDLER THREAD")
-            self._start_thread('event_thread_%s' % t, self._event_runner)
+        loop = kwargs.get('loop', None)
+        if loop is not None:
+            self._process_loop(loop)
+            if not threaded:
+                loop.run_until_complete(self.loop_stopped)
+            return
+
+        if self.event_shards > 1:
+            if not isinstance(self.event_queue, ShardedQueue):
+                self.event_queue = ShardedQueue(self.event_queue,
+                                                self.event_shards)
+            for t, queue in enumerate(self.event_queue.queues):
+                log.debug("Starting HANDLER THREAD for shard %s", t)
+                self._start_thread('event_thread_%s' % t,
+                                   self.__shard_runner(queue))
+        else:
+            for t in range(0, HANDLER_THREADS):
+                log.debug("Starting HANDLER THREAD")
+                self._start_thread('event_thread_%s' % t,
+                                   self._event_runner)
 
         self._start_thread('send_thread', self._send_thread)
         self._start_thread('scheduler_thread', self._scheduler_thread)
@@ -1519,47 +1870,275 @@ class XMLStream(object):
 
         Stream events are raised for each received stanza.
         """
-        depth = 0
-        root = None
-        for event, xml in ET.iterparse(self.filesocket, (b'end', b'start')):
-            if event == b'start':
-                if depth == 0:
-                    # We have received the start of the root element.
-                    root = xml
-                    log.debug('RECV: %s', tostring(root, xmlns=self.default_ns,
-                                                         stream=self,
-                                                         top_level=True,
-                                                         open_only=True))
-                    # Perform any stream initialization actions, such
-                    # as handshakes.
-                    self.stream_end_event.clear()
-                    self.start_stream_handler(root)
-
-                    # We have a successful stream connection, so reset
-                    # exponential backoff for new reconnect attempts.
-                    self.reconnect_delay = 1.0
-                depth += 1
-            if event == b'end':
-                depth -= 1
-                if depth == 0:
-                    # The stream's root element has closed,
-                    # terminating the stream.
-                    log.debug("End of stream recieved")
-                    self.stream_end_event.set()
-                    return False
-                elif depth == 1:
-                    # We only raise events for stanzas that are direct
-                    # children of the root element.
-                    try:
-                        self.__spawn_event(xml)
-                    except RestartStream:
-                        return True
-                    if root is not None:
-                        # Keep the root element empty of children to
-                        # save on memory use.
-                        root.clear()
+        self.__parse_depth = 0
+        self.__parse_root = None
+        if self.filesocket is not None:
+            for event, xml in ET.iterparse(self.filesocket, PARSE_EVENTS):
+                result = self.__parse_event(event, xml)
+                if result is not None:
+                    return result
+            log.debug("Ending read XML loop")
+            return
+
+        reader = self.reader
+        reader.reset()
+        while True:
+            size = reader.recv()
+            if not size:
+                break
+            for event, xml in reader.feed(size):
+                result = self.__parse_event(event, xml)
+                if result is not None:
+                    return result
         log.debug("Ending read XML loop")
 
+    def __parse_event(self, event, xml):
+        """Process a single event from the XML parser.
+
+        Returns ``True`` if the stream must be restarted, ``False`` if
+        the stream has ended, and ``None`` otherwise.
+
+        :param event: Either ``b'start'`` or ``b'end'``.
+        :param xml: The :class:`~xml.etree.ElementTree.Element` XML object
+                    the event applies to.
+        """
+        if event == b'start':
+            if self.__parse_depth == 0:
+                # We have received the start of the root element.
+                self.__parse_root = xml
+                log.debug('RECV: %s', tostring(xml, xmlns=self.default_ns,
+                                                    stream=self,
+                                                    top_level=True,
+                                                    open_only=True))
+                # Perform any stream initialization actions, such
+                # as handshakes.
+                self.stream_end_event.clear()
+                self.start_stream_handler(xml)
+
+                # We have a successful stream connection, so reset
+                # exponential backoff for new reconnect attempts.
+                self.reconnect_delay = 1.0
+            self.__parse_depth += 1
+        if event == b'end':
+            self.__parse_depth -= 1
+            if self.__parse_depth == 0:
+                # The stream's root element has closed,
+                # terminating the stream.
+                log.debug("End of stream recieved")
+                self.stream_end_event.set()
+                return False
+            elif self.__parse_depth == 1:
+                # We only raise events for stanzas that are direct
+                # children of the root element.
+                try:
+                    self.__spawn_event(xml)
+                except RestartStream:
+                    return True
+                if self.__parse_root is not None:
+                    # Keep the root element empty of children to
+                    # save on memory use.
+                    self.__parse_root.clear()
+        return None
+
+    def _in_loop_thread(self):
+        """Return ``True`` if called from the thread running the
+        stream's event loop.
+        """
+        return self._loop_thread is threading.current_thread()
+
+    def _call_in_loop(self, func, *args):
+        """Execute a function on the stream's event loop, immediately
+        if already running in the loop's thread.
+        """
+        if self._in_loop_thread():
+            func(*args)
+        else:
+            self.loop.call_soon_threadsafe(func, *args)
+
+    def _process_loop(self, loop):
+        """Move stream processing onto an :mod:`asyncio` event loop.
+
+        The event and send queues are replaced by ones that pass their
+        items to the loop, and any tasks already scheduled are moved to
+        a scheduler driven by the loop's timers.
+
+        :param loop: The :mod:`asyncio` event loop.
+        """
+        self.loop = loop
+        self.loop_stopped = create_future(loop)
+
+        queue = LoopQueue(loop, self._run_event)
+        queues = {self.event_queue: queue}
+        if isinstance(self.event_queue, ShardedQueue):
+            queues.update((shard, queue) for shard in self.event_queue.queues)
+        self.event_queue = queue
+        self.send_queue = LoopQueue(loop, self.__loop_send)
+
+        scheduler = LoopScheduler(loop, self.stop)
+        scheduler.adopt(self.scheduler, queues)
+        self.scheduler = scheduler
+
+        self.session_started_event = NotifyingEvent(
+                lambda: self._call_in_loop(self.__loop_release),
+                self.session_started_event)
+
+        loop.call_soon_threadsafe(self.__loop_start)
+
+    def __loop_start(self):
+        """Begin reading the stream on the event loop."""
+        self._loop_thread = threading.current_thread()
+        if self.stop.is_set() or not self.state.ensure('connected'):
+            return
+        self.socket.setblocking(False)
+        self.loop.add_reader(self.socket.fileno(), self.__loop_read)
+        self.__loop_reading = True
+        self.__loop_restart()
+        if self.__loop_out:
+            self.__loop_flush()
+
+    def __loop_restart(self):
+        """Start a new incoming stream, resending the stream header
+        if the session has not already started.
+        """
+        self.__parse_depth = 0
+        self.__parse_root = None
+        self.reader.reset()
+        if not self.session_started_event.is_set():
+            self.send_raw(self.stream_header, now=True)
+
+    def __loop_read(self):
+        """Read available data from the socket and process any
+        complete stanzas.
+        """
+        try:
+            while self.__loop_reading:
+                size = self.reader.recv()
+                if not size:
+                    log.debug("Connection closed by the server")
+                    self.__loop_lost()
+                    return
+                self.__loop_feed(size)
+                if not self.reader.pending():
+                    return
+        except (ssl.SSLWantReadError, ssl.SSLWantWriteError):
+            return
+        except (Socket.error, ssl.SSLError) as serr:
+            if serr.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return
+            self.event('socket_error', serr, direct=True)
+            log.error('Socket Error #%s: %s', serr.errno, serr.strerror)
+            self.__loop_lost()
+        except (SyntaxError, ExpatError) as e:
+            log.error("Error reading from XML stream.")
+            self.exception(e)
+            self.__loop_lost()
+        except Exception as e:
+            if not self.stop.is_set():
+                log.error('Connection error.')
+            self.exception(e)
+            self.__loop_lost()
+
+    def __loop_feed(self, size):
+        """Feed received data to the incremental XML parser."""
+        for event, xml in self.reader.feed(size):
+            result = self.__parse_event(event, xml)
+            if result is True:
+                self.__loop_restart()
+                return
+            elif result is False:
+                self.__loop_lost()
+                return
+
+    def __loop_lost(self):
+        """Handle the end of the incoming stream, reconnecting in
+        the loop's executor if permitted.
+        """
+        self.__loop_stop_io()
+        if self.stop.is_set() or not self.auto_reconnect:
+            self.disconnect()
+            return
+
+        self.state.transition('connected', 'disconnected',
+                              func=self._disconnect,
+                              args=(True, False, False))
+
+        def reconnected(future):
+            if not future.cancelled() and future.result():
+                self.__loop_start()
+
+        future = self.loop.run_in_executor(None, self.reconnect)
+        future.add_done_callback(reconnected)
+
+    def __loop_stop_io(self, flush=False):
+        """Stop watching the socket, optionally sending any
+        remaining output first.
+        """
+        if self.__loop_reading:
+            self.__loop_reading = False
+            self.loop.remove_reader(self.socket.fileno())
+        if self.__loop_writing:
+            self.__loop_writing = False
+            self.loop.remove_writer(self.socket.fileno())
+        if flush and self.__loop_out:
+            try:
+                self.socket.setblocking(True)
+                self.socket.sendall(bytes(self.__loop_out))
+            except (Socket.error, ssl.SSLError) as serr:
+                self.event('socket_error', serr, direct=True)
+        self.__loop_out = bytearray()
+
+    def __loop_finish(self):
+        """Signal that the stream has stopped processing."""
+        if self.loop_stopped is not None and not self.loop_stopped.done():
+            self.loop_stopped.set_result(True)
+
+    def __loop_send(self, data):
+        """Send queued data once the session has started."""
+        if self.session_started_event.is_set() and not self.__loop_held:
+            log.debug("SEND: %s", data)
+            self.__loop_write(data)
+        else:
+            self.__loop_held.append(data)
+
+    def __loop_release(self):
+        """Send data that was queued before the session started."""
+        held = self.__loop_held
+        self.__loop_held = []
+        for data in held:
+            self.__loop_send(data)
+
+    def __loop_write(self, data):
+        """Buffer data to be written to the socket."""
+        self.__loop_out.extend(data.encode('utf-8'))
+        if not self.__loop_writing:
+            self.__loop_flush()
+
+    def __loop_flush(self):
+        """Write as much buffered data as the socket will accept."""
+        if not self.__loop_reading:
+            # Data will be flushed once the stream is (re)started.
+            return
+        try:
+            while self.__loop_out:
+                sent = self.socket.send(self.__loop_out)
+                del self.__loop_out[:sent]
+        except (ssl.SSLWantReadError, ssl.SSLWantWriteError):
+            pass
+        except (Socket.error, ssl.SSLError) as serr:
+            if serr.errno not in (errno.EAGAIN, errno.EWOULDBLOCK,
+                                  errno.EINTR):
+                self.event('socket_error', serr, direct=True)
+                log.warning("Failed to send %s", self.__loop_out)
+                self.__loop_lost()
+                return
+
+        if self.__loop_out and not self.__loop_writing:
+            self.__loop_writing = True
+            self.loop.add_writer(self.socket.fileno(), self.__loop_flush)
+        elif not self.__loop_out and self.__loop_writing:
+            self.__loop_writing = False
+            self.loop.remove_writer(self.socket.fileno())
+
     def _build_stanza(self, xml, default_ns=None):
         """Create a stanza object from a given XML object.
 
@@ -1611,21 +2190,22 @@ class XMLStream(object):
 
         # Match the stanza against registered handlers. Handlers marked
         # to run "in stream" will be executed immediately; the rest will
-        # be queued.
+        # be queued. Only handlers indexed under keys that the stanza
+        # can satisfy need to be checked.
         unhandled = True
-        matched_handlers = [h for h in self.__handlers if h.match(stanza)]
+        matched_handlers = self.__responses.match(stanza)
+        matched_handlers += [h for h in self.__handlers.candidates(stanza) \
+                                 if h.match(stanza)]
         for handler in matched_handlers:
             if len(matched_handlers) > 1:
-                stanza_copy = copy.copy(stanza)
+                stanza_copy = self._copy_data(stanza)
             else:
                 stanza_copy = stanza
             handler.prerun(stanza_copy)
             self.event_queue.put(('stanza', handler, stanza_copy))
-            try:
-                if handler.check_delete():
-                    self.__handlers.remove(handler)
-            except:
-                pass  # not thread safe
+            if handler.check_delete():
+                if not self.__handlers.remove(handler):
+                    self.__responses.remove(handler)
             unhandled = False
 
         # Some stanzas require responses, such as Iq queries. A default
@@ -1633,6 +2213,16 @@ class XMLStream(object):
         if unhandled:
             stanza.unhandled()
 
+    def _copy_data(self, data):
+        """Return a copy of event data for a handler, sharing the XML
+        of stanzas if :attr:`copy_on_write` is enabled.
+
+        :param data: The stanza or other event data to copy.
+        """
+        if self.copy_on_write and hasattr(data, 'share'):
+            return data.share()
+        return copy.copy(data)
+
     def _threaded_event_wrapper(self, func, args):
         """Capture exceptions for event handlers that run
         in individual threads.
@@ -1652,60 +2242,32 @@ class XMLStream(object):
             else:
                 self.exception(e)
 
-    def _event_runner(self):
+    def __shard_runner(self, queue):
+        """Return a target for an event runner thread consuming
+        a single shard of the event queue.
+        """
+        return lambda: self._event_runner(queue)
+
+    def _event_runner(self, queue=None):
         """Process the event queue and execute handlers.
 
-        The number of event runner threads is controlled by HANDLER_THREADS.
+        The number of event runner threads is controlled by HANDLER_THREADS,
+        or by :attr:`event_shards` if the event queue is sharded.
 
         Stream event handlers will all execute in this thread. Custom event
         handlers may be spawned in individual threads.
+
+        :param queue: The queue to process. Defaults to :attr:`event_queue`.
         """
         log.debug("Loading event runner")
+        if queue is None:
+            queue = self.event_queue
         try:
             while not self.stop.is_set():
-                event = self.event_queue.get()
+                event = queue.get()
                 if event is None:
                     continue
-
-                etype, handler = event[0:2]
-                args = event[2:]
-                orig = copy.copy(args[0])
-
-                if etype == 'stanza':
-                    try:
-                        handler.run(args[0])
-                    except Exception as e:
-                        error_msg = 'Error processing stream handler: %s'
-                        log.exception(error_msg, handler.name)
-                        orig.exception(e)
-                elif etype == 'schedule':
-                    name = args[2]
-                    try:
-                        log.debug('Scheduled event: %s: %s', name, args[0])
-                        handler(*args[0], **args[1])
-                    except Exception as e:
-                        log.exception('Error processing scheduled task')
-                        self.exception(e)
-                elif etype == 'event':
-                    func, threaded, disposable = handler
-                    try:
-                        if threaded:
-                            x = threading.Thread(
-                                    name="Event_%s" % str(func),
-                                    target=self._threaded_event_wrapper,
-                                    args=(func, args))
-                            x.daemon = self._use_daemons
-                            x.start()
-                        else:
-                            func(*args)
-                    except Exception as e:
-                        error_msg = 'Error processing event handler: %s'
-                        log.exception(error_msg, str(func))
-                        if hasattr(orig, 'exception'):
-                            orig.exception(e)
-                        else:
-                            self.exception(e)
-                elif etype == 'quit':
+                if not self._run_event(event):
                     log.debug("Quitting event runner thread")
                     break
         except KeyboardInterrupt:
@@ -1718,6 +2280,129 @@ class XMLStream(object):
 
         self._end_thread('event runner')
 
+    def _run_event(self, event):
+        """Execute the handler for a single item from the event queue.
+
+        Returns ``False`` if the item requests that event processing
+        stop, and ``True`` otherwise.
+
+        :param tuple event: The event queue item.
+        """
+        etype, handler = event[0:2]
+        args = event[2:]
+        orig = self._copy_data(args[0])
+
+        if etype == 'stanza':
+            try:
+                handler.run(args[0])
+            except Exception as e:
+                error_msg = 'Error processing stream handler: %s'
+                log.exception(error_msg, handler.name)
+                orig.exception(e)
+        elif etype == 'schedule':
+            name = args[2]
+            try:
+                log.debug('Scheduled event: %s: %s', name, args[0])
+                handler(*args[0], **args[1])
+            except Exception as e:
+                log.exception('Error processing scheduled task')
+                self.exception(e)
+        elif etype == 'event':
+            func, threaded, disposable, name = handler
+            try:
+                if threaded:
+                    self.handler_pool.submit(self._threaded_event_wrapper,
+                                             (func, args), key=name)
+                else:
+                    func(*args)
+            except Exception as e:
+                error_msg = 'Error processing event handler: %s'
+                log.exception(error_msg, str(func))
+                if hasattr(orig, 'exception'):
+                    orig.exception(e)
+                else:
+                    self.exception(e)
+        elif etype == 'quit':
+            return False
+        return True
+
+    def send_stats(self):
+        """Return a dictionary of statistics for data written by
+        the send thread.
+
+        The values are the number of items waiting in the send queue
+        (``'queued'``), the total number of batches, stanzas and bytes
+        sent, the number of stanzas in the last and largest batch, and
+        the last and largest time in seconds from taking a batch's
+        first stanza from the queue until the batch was written.
+        Without :attr:`send_batching`, every batch is a single stanza.
+        """
+        stats = dict(self.__send_stats)
+        stats['queued'] = self.send_queue.qsize()
+        return stats
+
+    def __send_watermark(self, high):
+        """Raise an event when the send queue fills up or drains.
+
+        :param bool high: ``True`` if the queue reached its high water
+                          mark, ``False`` if it drained back down.
+        """
+        if high:
+            log.warning('Send queue is filling up: %s',
+                        self.send_queue.qsize())
+            self.event('send_queue_high', self.send_queue.stats())
+        else:
+            self.event('send_queue_low', self.send_queue.stats())
+
+    def __fill_batch(self, batch):
+        """Add data waiting in the send queue to a batch.
+
+        Returns the number of items taken from the queue.
+
+        :param list batch: The data to send, starting with the
+                           first item taken from the queue.
+        """
+        size = len(batch[0])
+        deadline = time.time() + self.send_batch_delay
+        taken = 0
+        while size < self.send_batch_size and len(batch) < IOV_MAX and \
+              not self.stop.is_set():
+            try:
+                timeout = deadline - time.time()
+                if timeout > 0:
+                    data = self.send_queue.get(True, timeout)
+                else:
+                    data = self.send_queue.get(False)
+            except QueueEmpty:
+                break
+            if data is None:
+                continue
+            batch.append(data)
+            size += len(data)
+            taken += 1
+        return taken
+
+    def __send_vectored(self, parts):
+        """Try to write several buffers with a single ``sendmsg`` call.
+
+        Returns the number of bytes sent, which is ``0`` if the socket
+        does not support vectored writes, as is the case for TLS, or
+        if the system refused to write so many buffers at once.
+
+        :param list parts: The encoded data to send.
+        """
+        if len(parts) < 2 or len(parts) > IOV_MAX or \
+           isinstance(self.socket, ssl.SSLSocket) or \
+           not isinstance(self.socket, Socket.socket) or \
+           not hasattr(self.socket, 'sendmsg'):
+            return 0
+        try:
+            return self.socket.sendmsg(parts)
+        except Socket.error as serr:
+            if serr.errno != errno.EMSGSIZE:
+                raise
+            return 0
+
     def _send_thread(self):
         """Extract stanzas from the send queue and send them on the stream."""
         try:
@@ -1725,6 +2410,7 @@ class XMLStream(object):
                 while not self.stop.is_set() and \
                       not self.session_started_event.is_set():
                     self.session_started_event.wait(timeout=0.1)                            # Wait for session start
+                items = 0
                 if self.__failed_send_stanza is not None:
                     data = self.__failed_send_stanza
                     self.__failed_send_stanza = None
@@ -1732,9 +2418,18 @@ class XMLStream(object):
                     data = self.send_queue.get()                                            # Wait for data to send
                     if data is None:
                         continue
-                log.debug("SEND: %s", data)
-                enc_data = data.encode('utf-8')
-                total = len(enc_data)
+                    items = 1
+                started = time.time()
+                batch = [data]
+                if self.send_batching:
+                    items += self.__fill_batch(batch)
+                    if len(batch) > 1:
+                        data = ''.join(batch)
+                for part in batch:
+                    log.debug("SEND: %s", part)
+                parts = [part.encode('utf-8') for part in batch]
+                total = sum(len(part) for part in parts)
+                enc_data = None
                 sent = 0
                 count = 0
                 tries = 0
@@ -1743,6 +2438,12 @@ class XMLStream(object):
                         while sent < total and not self.stop.is_set() and \
                               self.session_started_event.is_set():
                             try:
+                                if enc_data is None:
+                                    sent = self.__send_vectored(parts)
+                                    enc_data = b''.join(parts)
+                                    if sent:
+                                        count += 1
+                                        continue
                                 sent += self.socket.send(enc_data[sent:])
                                 count += 1
                             except Socket.error as serr:
@@ -1762,7 +2463,9 @@ class XMLStream(object):
                                 tries += 1
                     if count > 1:
                         log.debug('SENT: %d chunks', count)
-                    self.send_queue.task_done()
+                    for _ in range(items):
+                        self.send_queue.task_done()
+                    self.__count_sent(items or 1, total, started)
                 except (Socket.error, ssl.SSLError) as serr:
                     self.event('socket_error', serr, direct=True)
                     log.warning("Failed to send %s", data)
@@ -1781,6 +2484,18 @@ class XMLStream(object):
 
         self._end_thread('send')
 
+    def __count_sent(self, stanzas, size, started):
+        """Record a completed write in the send statistics."""
+        stats = self.__send_stats
+        latency = time.time() - started
+        stats['batches'] += 1
+        stats['stanzas'] += stanzas
+        stats['bytes'] += size
+        stats['last_batch'] = stanzas
+        stats['max_batch'] = max(stats['max_batch'], stanzas)
+        stats['last_flush_latency'] = latency
+        stats['max_flush_latency'] = max(stats['max_flush_latency'], latency)
+
     def _scheduler_thread(self):
         self.scheduler.process(threaded=False)
         self._end_thread('scheduler')
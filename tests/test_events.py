@@ -92,5 +92,29 @@ class TestEvents(SleekTest):
         msg = "Event was not triggered the correct number of times: %s"
         self.failUnless(happened == [True], msg % happened)
 
+    def testCopyOnWriteEvent(self):
+        """Test that handlers sharing a stanza do not see each other's changes"""
+        bodies = []
+
+        def modify(msg):
+            bodies.append(msg['body'])
+            msg.reply()
+            msg['body'] = 'Changed'
+
+        def read(msg):
+            bodies.append(msg['body'])
+
+        self.xmpp.copy_on_write = True
+        self.xmpp.add_event_handler("message", modify)
+        self.xmpp.add_event_handler("message", read)
+
+        self.recv("""
+          <message from="tester@localhost"><body>Original</body></message>
+        """)
+        time.sleep(0.1)
+
+        self.assertEqual(bodies, ['Original', 'Original'],
+                "Handlers did not receive the original stanza: %s" % bodies)
+
 
 suite = unittest.TestLoader().loadTestsFromTestCase(TestEvents)
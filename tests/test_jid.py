@@ -1,9 +1,13 @@
 # -*- encoding: utf8 -*-
 from __future__ import unicode_literals
+import pickle
+import sleekxmpp.jid
+import stringprep
 import unittest
 from sleekxmpp.test import SleekTest
 from sleekxmpp import JID, InvalidJID
-from sleekxmpp.jid import nodeprep
+from sleekxmpp.jid import nodeprep, resourceprep, JIDCache
+from sleekxmpp.util import stringprep_profiles
 
 
 class TestJIDClass(SleekTest):
@@ -286,5 +290,78 @@ class TestJIDClass(SleekTest):
         node = 'ᴹᴵᴷᴬᴱᴸ'
         self.assertEqual(nodeprep(node), nodeprep(nodeprep(node)))
 
+    def testStringPrepLookups(self):
+        """Test that the ASCII and lookup table paths of nodeprep
+        match applying each step of the profile."""
+        def reference(data):
+            data = stringprep_profiles.map_input(data, [
+                stringprep_profiles.b1_mapping,
+                stringprep.map_table_b2])
+            data = stringprep_profiles.normalize(data)
+            stringprep_profiles.prohibit_output(data, [
+                stringprep.in_table_c11, stringprep.in_table_c12,
+                stringprep.in_table_c21, stringprep.in_table_c22,
+                stringprep.in_table_c3, stringprep.in_table_c4,
+                stringprep.in_table_c5, stringprep.in_table_c6,
+                stringprep.in_table_c7, stringprep.in_table_c8,
+                stringprep.in_table_c9,
+                lambda c: c in ' \'"&/:<>@'])
+            stringprep_profiles.check_bidi(data)
+            return data
+
+        for value in ('User', 'üser', 'MIKAEL', 'ᴹᴵᴷᴬᴱᴸ', 'ﬁle',
+                      '\u05d0\u05d1', 'user\u00ad'):
+            self.assertEqual(nodeprep(value), reference(value))
+            self.assertEqual(nodeprep(value), nodeprep(value))
+
+        for value in ('user@host', 'a b', 'a\x00', '\u05d0a'):
+            self.assertRaises(stringprep_profiles.StringPrepError,
+                              nodeprep, value)
+        self.assertEqual(resourceprep('Home Office'), 'Home Office')
+
+    def testPickle(self):
+        """Test pickling and copying JIDs."""
+        j = JID('user@example.com/resource')
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            self.assertEqual(pickle.loads(pickle.dumps(j, protocol)), j)
+        self.failIf(hasattr(j, '__dict__'))
+
+    def testCacheLRU(self):
+        """Test evicting the least recently used cached JIDs."""
+        cache = JIDCache(2)
+        cache.put('a@example.com', ('a', 'example.com', None))
+        cache.put('b@example.com', ('b', 'example.com', None))
+        cache.put('me@example.com', ('me', 'example.com', None), True)
+        cache.get('a@example.com')
+        cache.put('c@example.com', ('c', 'example.com', None))
+
+        self.assertEqual(cache.get('b@example.com'), None)
+        self.failIf(cache.get('a@example.com') is None)
+        self.failIf(cache.get('me@example.com') is None)
+
+        cache.resize(1)
+        self.assertEqual(cache.get('c@example.com'), None)
+        self.assertEqual(cache.stats(), {'size': 1,
+                                         'pinned': 1,
+                                         'max_size': 1,
+                                         'hits': 3,
+                                         'misses': 2,
+                                         'evictions': 2})
+
+    def testCacheMaxSizeSetting(self):
+        """Test changing JID_CACHE_MAX_SIZE at runtime."""
+        cache = JIDCache()
+        old_size = sleekxmpp.jid.JID_CACHE_MAX_SIZE
+        sleekxmpp.jid.JID_CACHE_MAX_SIZE = 2
+        try:
+            for user in ('a', 'b', 'c'):
+                cache.put('%s@example.com' % user,
+                          (user, 'example.com', None))
+        finally:
+            sleekxmpp.jid.JID_CACHE_MAX_SIZE = old_size
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('a@example.com'), None)
+        self.assertEqual(cache.max_size, old_size)
+
 
 suite = unittest.TestLoader().loadTestsFromTestCase(TestJIDClass)
@@ -0,0 +1,65 @@
+import unittest
+from sleekxmpp import BaseXMPP, Presence
+
+
+class TestRosterIndex(unittest.TestCase):
+    """
+    Test the secondary indexes kept by roster nodes.
+    """
+
+    def setUp(self):
+        self.xmpp = BaseXMPP(default_ns='jabber:client')
+        self.node = self.xmpp.roster['owner@example.com']
+
+    def testGroups(self):
+        """Test finding JIDs by group."""
+        self.node.add('a@example.com', groups=['Friends', 'Work'])
+        self.node.add('b@example.com', groups=['Friends'])
+        self.node.add('c@example.com')
+
+        self.assertEqual(self.node.group('Friends'),
+                         set(['a@example.com', 'b@example.com']))
+        self.assertEqual(self.node.group(''), set(['c@example.com']))
+
+        self.node['a@example.com']['groups'] = ['Family']
+        del self.node['b@example.com']
+        groups = self.node.groups()
+        self.assertEqual(sorted(groups), ['', 'Family'])
+        self.assertEqual(groups['Family'], ['a@example.com'])
+
+    def testSubscriptions(self):
+        """Test finding JIDs by subscription state."""
+        self.node.add('a@example.com', afrom=True, ato=True)
+        self.node.add('b@example.com', pending_in=True)
+        self.node.add('c@example.com', ato=True, pending_out=False)
+
+        self.assertEqual(self.node.subscriptions('both'),
+                         set(['a@example.com']))
+        self.assertEqual(self.node.pending_in(), set(['b@example.com']))
+
+        self.node['b@example.com']['pending_in'] = False
+        self.node['b@example.com']['from'] = True
+        self.node['c@example.com']['pending_out'] = True
+        self.assertEqual(self.node.pending_in(), set())
+        self.assertEqual(self.node.pending_out(), set(['c@example.com']))
+        self.assertEqual(self.node.subscriptions('from'),
+                         set(['b@example.com']))
+        self.assertEqual(self.node.subscriptions('none'), set())
+
+    def testOnline(self):
+        """Test finding JIDs with available resources."""
+        item = self.node['a@example.com']
+        pres = Presence(self.xmpp)
+        pres['from'] = 'a@example.com/home'
+        item.handle_available(pres)
+        self.assertEqual(self.node.online(), set(['a@example.com']))
+
+        item.handle_unavailable(pres)
+        self.assertEqual(self.node.online(), set())
+
+        item.handle_available(pres)
+        self.xmpp.roster.reset()
+        self.assertEqual(self.node.online(), set())
+
+
+suite = unittest.TestLoader().loadTestsFromTestCase(TestRosterIndex)
@@ -0,0 +1,68 @@
+import unittest
+from sleekxmpp import BaseXMPP, Presence
+
+
+class TestRosterPresence(unittest.TestCase):
+    """
+    Test tracking the best resource and aggregate presence of contacts.
+    """
+
+    def setUp(self):
+        self.xmpp = BaseXMPP(default_ns='jabber:client')
+        self.item = self.xmpp.roster['owner@example.com']['user@example.com']
+        self.events = []
+        self.xmpp.add_event_handler('changed_presence',
+                lambda pres: self.events.append(pres['from'].resource))
+        self.xmpp.event = self.direct_event(self.xmpp.event)
+
+    def direct_event(self, event):
+        def run(name, data={}, direct=False):
+            return event(name, data, direct=True)
+        return run
+
+    def presence(self, resource, ptype=None, show='', priority=0):
+        pres = Presence(self.xmpp)
+        pres['from'] = 'user@example.com/%s' % resource
+        if show:
+            pres['show'] = show
+        pres['priority'] = priority
+        if ptype == 'unavailable':
+            self.item.handle_unavailable(pres)
+        else:
+            self.item.handle_available(pres)
+
+    def testBestResource(self):
+        """Test choosing the resource with the highest priority."""
+        self.presence('phone', priority=1)
+        self.presence('desktop', priority=5)
+        self.presence('laptop', show='away', priority=5)
+        self.assertEqual(self.item.best_resource, 'desktop')
+
+        self.presence('desktop', show='dnd', priority=5)
+        self.assertEqual(self.item.best_resource, 'laptop')
+
+        self.presence('laptop', ptype='unavailable')
+        self.assertEqual(self.xmpp.roster['owner@example.com']
+                             .best_resource('user@example.com'), 'desktop')
+        self.assertEqual(self.item.presence(),
+                         {'online': 2, 'resource': 'desktop', 'show': 'dnd',
+                          'status': '', 'priority': 5})
+
+        self.presence('desktop', ptype='unavailable')
+        self.presence('phone', ptype='unavailable')
+        self.assertEqual(self.item.best_resource, None)
+        self.assertEqual(self.item.presence()['online'], 0)
+
+    def testChangedPresence(self):
+        """Test that only changes to the aggregate fire events."""
+        self.presence('desktop', priority=5)
+        self.presence('phone', priority=1)
+        self.presence('phone', show='away', priority=1)
+        self.presence('phone', ptype='unavailable')
+        self.presence('desktop', show='xa', priority=5)
+        self.presence('desktop', ptype='unavailable')
+
+        self.assertEqual(self.events, ['desktop', 'desktop', 'desktop'])
+
+
+suite = unittest.TestLoader().loadTestsFromTestCase(TestRosterPresence)
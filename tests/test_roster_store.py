@@ -0,0 +1,158 @@
+import threading
+import time
+
+import unittest
+from sleekxmpp import BaseXMPP
+from sleekxmpp.roster import SQLiteStore, WriteBehindStore
+
+
+class CountingStore(SQLiteStore):
+
+    """An in-memory SQLite store that records the calls made to it."""
+
+    def __init__(self):
+        SQLiteStore.__init__(self, ':memory:')
+        self.calls = []
+
+    def load(self, owner, jid, db_state):
+        self.calls.append('load')
+        return SQLiteStore.load(self, owner, jid, db_state)
+
+    def load_items(self, owner):
+        self.calls.append('load_items')
+        return SQLiteStore.load_items(self, owner)
+
+    def save_many(self, items):
+        self.calls.append(('save_many', len(items)))
+        SQLiteStore.save_many(self, items)
+
+
+class TestRosterStore(unittest.TestCase):
+    """
+    Test persisting roster items with the bundled datastores.
+    """
+
+    def setUp(self):
+        self.xmpp = BaseXMPP(default_ns='jabber:client')
+
+    def testSQLiteStore(self):
+        """Test storing, loading and removing roster items."""
+        store = SQLiteStore(':memory:')
+        roster = self.xmpp.roster
+        roster.set_backend(store)
+
+        roster['owner@example.com'].add('user@example.com',
+                                        name='User', groups=['Friends'],
+                                        afrom=True, save=True)
+        roster['owner@example.com'].version = 'v1'
+
+        state = store.load('owner@example.com', 'user@example.com', {})
+        self.assertEqual(state['name'], 'User')
+        self.assertEqual(state['groups'], ['Friends'])
+        self.assertEqual(state['subscription'], 'from')
+        self.assertEqual(store.entries(None), ['owner@example.com'])
+        self.assertEqual(store.version('owner@example.com'), 'v1')
+
+        roster['owner@example.com']['user@example.com'].save(remove=True)
+        self.assertEqual(store.entries('owner@example.com'), [])
+
+    def testLazyBulkLoad(self):
+        """Test reading a node's items with one call on first use."""
+        store = CountingStore()
+        store.save_many([('owner@example.com', 'user%s@example.com' % i,
+                          {'name': '', 'groups': [], 'from': True,
+                           'to': True, 'pending_in': False,
+                           'pending_out': False, 'whitelisted': False,
+                           'subscription': 'both'}, {})
+                         for i in range(10)])
+        del store.calls[:]
+
+        self.xmpp.roster.set_backend(store)
+        node = self.xmpp.roster['owner@example.com']
+        self.assertEqual(store.calls, [])
+
+        self.assertEqual(len(node), 10)
+        self.assertEqual(node['user3@example.com']['subscription'], 'both')
+        self.assertEqual(store.calls, ['load_items'])
+
+    def testWriteBehind(self):
+        """Test collecting saved items into batched writes."""
+        db = CountingStore()
+        store = WriteBehindStore(db, delay=60)
+        self.xmpp.roster.set_backend(store)
+        node = self.xmpp.roster['owner@example.com']
+
+        for i in range(20):
+            node['user%s@example.com' % i]['to'] = True
+            node['user%s@example.com' % i].save()
+        node['user0@example.com'].save(remove=True)
+
+        self.failIf([c for c in db.calls if isinstance(c, tuple)],
+                "Saved items were written before flushing.")
+        self.assertEqual(store.load('owner@example.com',
+                                    'user1@example.com', {})['to'], True)
+        self.assertEqual(len(store.entries('owner@example.com')), 19)
+
+        self.xmpp.roster.flush()
+        self.assertEqual(db.calls[-1], ('save_many', 20))
+        self.assertEqual(len(db.entries('owner@example.com')), 19)
+
+        stats = store.stats()
+        self.assertEqual(stats['pending'], 0)
+        self.assertEqual(stats['writes'], 20)
+        store.close()
+
+    def testWriteBehindThread(self):
+        """Test writing saved items from the background thread."""
+        db = CountingStore()
+        store = WriteBehindStore(db, delay=0.05)
+        store.save('owner@example.com', 'user@example.com',
+                   {'name': 'User', 'groups': []}, {})
+
+        time.sleep(0.3)
+        self.assertEqual(db.calls, [('save_many', 1)])
+        store.close()
+
+    def testReadWhileWriting(self):
+        """Test reading items while they are being written."""
+        db = CountingStore()
+        db.save('owner@example.com', 'user@example.com',
+                {'name': 'old', 'groups': []}, {})
+        writing = threading.Event()
+        finish = threading.Event()
+        save_many = db.save_many
+
+        def slow_save_many(items):
+            writing.set()
+            finish.wait(5)
+            save_many(items)
+        db.save_many = slow_save_many
+
+        store = WriteBehindStore(db, delay=60)
+        store.save('owner@example.com', 'user@example.com',
+                   {'name': 'new', 'groups': []}, {})
+        store.save('owner@example.com', 'other@example.com',
+                   {'name': 'other', 'groups': []}, {})
+        flush = threading.Thread(target=store.flush)
+        flush.start()
+        writing.wait(5)
+        try:
+            self.assertEqual(store.load('owner@example.com',
+                                        'user@example.com', {})['name'],
+                             'new')
+            self.assertEqual(store.load_items('owner@example.com')
+                                  ['user@example.com']['name'], 'new')
+            self.assertEqual(sorted(store.entries('owner@example.com')),
+                             ['other@example.com', 'user@example.com'])
+            self.assertEqual(store.stats()['pending'], 2)
+        finally:
+            finish.set()
+            flush.join(5)
+
+        self.assertEqual(db.load('owner@example.com',
+                                 'user@example.com', {})['name'], 'new')
+        self.assertEqual(store.stats()['pending'], 0)
+        store.close()
+
+
+suite = unittest.TestLoader().loadTestsFromTestCase(TestRosterStore)
@@ -0,0 +1,83 @@
+import unittest
+
+from sleekxmpp.util.sasl import mechanisms
+from sleekxmpp.util.sasl.mechanisms import SCRAM
+
+
+class TestSCRAM(unittest.TestCase):
+    """
+    Test the SCRAM mechanism against the example exchange
+    in RFC 5802.
+    """
+
+    def setUp(self):
+        mechanisms._scram_cache.clear()
+
+    def authenticate(self):
+        mech = SCRAM('SCRAM-SHA-1',
+                     {'username': b'user',
+                      'password': b'pencil',
+                      'authzid': b'',
+                      'channel_binding': b''},
+                     {'encrypted': True})
+        mech.process()
+        mech.cnonce = b'fyko+d2lbbFgONRv9qkxdawL'
+        mech.client_first_message_bare = b'n=user,r=' + mech.cnonce
+        final = mech.process(b'r=fyko+d2lbbFgONRv9qkxdawL3rfcNHYJY1ZVvWVs7j,'
+                             b's=QSXCR+Q6sek8bf92,i=4096')
+        mech.process(b'v=rmF9pqV8S7suAoZWja4dJRkFsKQ=')
+        return final
+
+    def testExchange(self):
+        """Test the client proof and verifying the server."""
+        self.assertEqual(self.authenticate(),
+                b'c=biws,r=fyko+d2lbbFgONRv9qkxdawL3rfcNHYJY1ZVvWVs7j,'
+                b'p=v0X8v3Bz2T0CJGbJQyF0X+HI4Ts=')
+
+    def testHi(self):
+        """Test that Hi matches with and without hashlib's PBKDF2."""
+        mech = SCRAM('SCRAM-SHA-1', {}, {'encrypted': True})
+        expected = mech.Hi(b'pencil', b'salt', 100)
+
+        pbkdf2_hmac = mechanisms.pbkdf2_hmac
+        mechanisms.pbkdf2_hmac = None
+        try:
+            self.assertEqual(mech.Hi(b'pencil', b'salt', 100), expected)
+        finally:
+            mechanisms.pbkdf2_hmac = pbkdf2_hmac
+
+    def testKeyCache(self):
+        """Test reusing derived keys when authenticating again."""
+        self.authenticate()
+        self.assertEqual(len(mechanisms._scram_cache), 1)
+        for key in mechanisms._scram_cache:
+            self.failIf(b'pencil' in key, "Password was used as a key.")
+
+        hi = SCRAM.Hi
+        SCRAM.Hi = None
+        try:
+            self.assertEqual(self.authenticate(),
+                    b'c=biws,r=fyko+d2lbbFgONRv9qkxdawL3rfcNHYJY1ZVvWVs7j,'
+                    b'p=v0X8v3Bz2T0CJGbJQyF0X+HI4Ts=')
+        finally:
+            SCRAM.Hi = hi
+
+    def testFailForgetsKeys(self):
+        """Test discarding cached keys when authentication fails."""
+        self.authenticate()
+        mech = SCRAM('SCRAM-SHA-1',
+                     {'username': b'user',
+                      'password': b'pencil',
+                      'authzid': b'',
+                      'channel_binding': b''},
+                     {'encrypted': True})
+        mech.process()
+        mech.cnonce = b'fyko+d2lbbFgONRv9qkxdawL'
+        mech.client_first_message_bare = b'n=user,r=' + mech.cnonce
+        mech.process(b'r=fyko+d2lbbFgONRv9qkxdawL3rfcNHYJY1ZVvWVs7j,'
+                     b's=QSXCR+Q6sek8bf92,i=4096')
+        mech.fail()
+        self.assertEqual(len(mechanisms._scram_cache), 0)
+
+
+suite = unittest.TestLoader().loadTestsFromTestCase(TestSCRAM)
@@ -0,0 +1,74 @@
+import time
+import threading
+
+import unittest
+from sleekxmpp.xmlstream import Scheduler
+
+
+class TestScheduler(unittest.TestCase):
+    """
+    Test the task scheduler.
+    """
+
+    def setUp(self):
+        self.stop = threading.Event()
+        self.scheduler = Scheduler(self.stop)
+        self.scheduler.process(threaded=True, daemon=True)
+
+    def tearDown(self):
+        self.stop.set()
+        self.scheduler.quit()
+
+    def testOrder(self):
+        """Test that tasks run in order of execution time."""
+        events = []
+        for name, seconds in (('c', 0.15), ('a', 0.05), ('b', 0.1)):
+            self.scheduler.add(name, seconds, events.append, args=(name,))
+        time.sleep(0.3)
+
+        self.assertEqual(events, ['a', 'b', 'c'])
+        self.assertEqual(len(self.scheduler), 0)
+
+    def testRemove(self):
+        """Test removing tasks before they run."""
+        events = []
+        for i in range(2000):
+            self.scheduler.add('Task %s' % i, 0.1, events.append, args=(i,))
+        for i in range(0, 2000, 2):
+            self.scheduler.remove('Task %s' % i)
+        self.scheduler.remove('Missing task')
+        time.sleep(0.3)
+
+        self.assertEqual(events, list(range(1, 2000, 2)))
+
+    def testDuplicateName(self):
+        """Test that task names must be unique."""
+        self.scheduler.add('Task', 10, lambda: None)
+        self.assertRaises(ValueError, self.scheduler.add,
+                          'Task', 10, lambda: None)
+
+    def testRepeat(self):
+        """Test repeating tasks and removing them."""
+        events = []
+        self.scheduler.add('Repeat', 0.05, events.append,
+                           args=('tick',), repeat=True)
+        time.sleep(0.28)
+        self.scheduler.remove('Repeat')
+        count = len(events)
+        time.sleep(0.15)
+
+        self.failUnless(count >= 3, "Task did not repeat: %s" % count)
+        self.assertEqual(len(events), count)
+
+    def testEarlierTask(self):
+        """Test that a new earlier task does not wait for a later one."""
+        events = []
+        self.scheduler.add('Late', 30, events.append, args=('late',))
+        time.sleep(0.05)
+        self.scheduler.add('Early', 0.05, events.append, args=('early',))
+        time.sleep(0.2)
+
+        self.assertEqual(events, ['early'])
+
+
+suite = unittest.TestLoader().loadTestsFromTestCase(TestScheduler)
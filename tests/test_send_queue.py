@@ -0,0 +1,105 @@
+import threading
+import time
+
+import unittest
+from sleekxmpp.util import QueueEmpty
+from sleekxmpp.xmlstream.sendqueue import SendQueue, PRIORITY_HIGH, \
+                                          PRIORITY_LOW
+
+
+class TestSendQueue(unittest.TestCase):
+    """
+    Test the bounded, prioritized send queue.
+    """
+
+    def testPriority(self):
+        """Test taking items from the highest priority lane first."""
+        queue = SendQueue()
+        queue.put('low', priority=PRIORITY_LOW)
+        queue.put('a')
+        queue.put('high', priority=PRIORITY_HIGH)
+        queue.put('b')
+
+        items = [queue.get(False) for i in range(4)]
+        self.assertEqual(items, ['high', 'a', 'b', 'low'])
+        self.assertRaises(QueueEmpty, queue.get, False)
+
+    def testDrop(self):
+        """Test dropping items when the queue is full."""
+        queue = SendQueue(max_size=2, policy='drop')
+        self.failUnless(queue.put('a'))
+        self.failUnless(queue.put('b'))
+        self.failIf(queue.put('c'))
+        self.failUnless(queue.put('ack', priority=PRIORITY_HIGH),
+                "High priority item was not accepted by a full queue.")
+
+        self.assertEqual(queue.dropped, 1)
+        self.assertEqual(queue.stats()['lanes'], [1, 2, 0])
+
+    def testBlock(self):
+        """Test waiting for room in a full queue."""
+        queue = SendQueue(max_size=1)
+        queue.put('a')
+        self.failIf(queue.put('b', timeout=0.05))
+
+        results = []
+        thread = threading.Thread(target=lambda: results.append(
+            queue.put('c')))
+        thread.start()
+        time.sleep(0.1)
+        self.failIf(results, "Put did not wait for room in the queue.")
+
+        self.assertEqual(queue.get(), 'a')
+        thread.join(5)
+        self.assertEqual(results, [True])
+        self.assertEqual(queue.get(), 'c')
+
+    def testRelease(self):
+        """Test discarding items waiting for room when released."""
+        queue = SendQueue(max_size=1)
+        queue.put('a')
+
+        results = []
+        thread = threading.Thread(target=lambda: results.append(
+            queue.put('b')))
+        thread.start()
+        time.sleep(0.1)
+        queue.release()
+        thread.join(5)
+        self.assertEqual(results, [False])
+
+    def testWatermark(self):
+        """Test signalling the high and low water marks."""
+        marks = []
+        queue = SendQueue(max_size=10, watermark=marks.append)
+        queue.high_water = 4
+
+        for i in range(5):
+            queue.put(i)
+        self.assertEqual(marks, [True])
+        self.failUnless(queue.is_high)
+
+        for i in range(3):
+            queue.get()
+        self.assertEqual(marks, [True, False])
+        self.failIf(queue.is_high)
+
+    def testJoin(self):
+        """Test waiting for queued items to be processed."""
+        queue = SendQueue()
+        queue.put('a')
+        queue.put(None)
+
+        def consume():
+            queue.get()
+            time.sleep(0.05)
+            queue.task_done()
+
+        thread = threading.Thread(target=consume)
+        thread.start()
+        queue.join()
+        thread.join(5)
+        self.assertEqual(queue.qsize(), 1)
+
+
+suite = unittest.TestLoader().loadTestsFromTestCase(TestSendQueue)
@@ -1,6 +1,8 @@
 import unittest
 from sleekxmpp.test import SleekTest
 from sleekxmpp.xmlstream.stanzabase import ElementBase, register_stanza_plugin, ET
+from sleekxmpp.xmlstream.stanzabase import compile_path
+from sleekxmpp.xmlstream.matcher import StanzaPath, MatchXPath
 from sleekxmpp.thirdparty import OrderedDict
 
 
@@ -522,6 +524,50 @@ class TestElementBase(SleekTest):
         self.failUnless(stanza.match("foo/{baz}sub"),
             "Stanza did not match with namespaced substanza.")
 
+    def testCompiledMatch(self):
+        """Test matching against precompiled paths and matchers."""
+
+        class TestSubStanza(ElementBase):
+            name = "sub"
+            namespace = "baz"
+            interfaces = set(('attrib',))
+
+        class TestStanza(ElementBase):
+            name = "foo"
+            namespace = "foo"
+            interfaces = set(('bar',))
+
+        register_stanza_plugin(TestStanza, TestSubStanza, iterable=True)
+
+        path = compile_path("{foo}foo@bar=a=b/sub@attrib=c")
+        self.assertEqual(path,
+            (("foo@bar=a=b", "foo", (("bar", "a=b"),), "foo"),
+             ("sub@attrib=c", "sub", (("attrib", "c"),), "sub")))
+        self.failUnless(compile_path("{foo}foo@bar=a=b/sub@attrib=c") is path,
+            "Compiled path was not cached.")
+
+        stanza = TestStanza()
+        stanza['bar'] = 'a=b'
+        self.failIf(stanza.match(path),
+            "Stanza matched missing substanza.")
+
+        substanza = TestSubStanza()
+        substanza['attrib'] = 'c'
+        stanza.append(substanza)
+        self.failUnless(stanza.match(path),
+            "Stanza did not match compiled path.")
+        self.failUnless(StanzaPath("foo@bar=a=b/sub").match(stanza),
+            "StanzaPath did not match stanza.")
+        self.failIf(StanzaPath("foo/sub@attrib=d").match(stanza),
+            "StanzaPath matched wrong attribute value.")
+
+        self.failUnless(MatchXPath("{foo}foo/{baz}sub").match(stanza),
+            "MatchXPath did not match child element.")
+        self.failIf(MatchXPath("{baz}sub").match(stanza),
+            "MatchXPath matched a child element as the root.")
+        self.failUnless(MatchXPath("*/{baz}sub").match(stanza),
+            "MatchXPath did not match with wildcard root.")
+
     def testComparisons(self):
         """Test comparing ElementBase objects."""
 
@@ -748,6 +794,101 @@ class TestElementBase(SleekTest):
           <foo xmlns="foo" bar="override-foo" />
         """)
 
+    def testAccessorTable(self):
+        """Test that resolved interface accessors follow plugin changes."""
+
+        class TestStanza(ElementBase):
+            name = "foo"
+            namespace = "foo"
+            interfaces = set(('bar', 'baz'))
+            sub_interfaces = set(('baz',))
+
+            def get_bar(self):
+                return 'bar-%s' % self._get_attr('bar')
+
+        class TestSubclass(TestStanza):
+            pass
+
+        class TestPlugin(ElementBase):
+            name = "plugin"
+            namespace = "foo"
+            plugin_attrib = "qux"
+            interfaces = set(('a',))
+
+        stanza = TestSubclass()
+        stanza['bar'] = 'x'
+        stanza['baz|en'] = 'y'
+        self.assertEqual(stanza['bar'], 'bar-x')
+        self.assertEqual(stanza['baz|en'], 'y')
+        self.assertEqual(stanza['qux'], '')
+
+        register_stanza_plugin(TestStanza, TestPlugin)
+
+        stanza['qux']['a'] = 'z'
+        del stanza['baz|en']
+        self.check(stanza, """
+          <foo xmlns="foo" bar="x">
+            <plugin a="z" />
+          </foo>
+        """, use_values=False)
+
+    def testLazyPlugins(self):
+        """Test creating plugins from parsed XML only when used."""
+
+        class TestSubStanza(ElementBase):
+            name = "sub"
+            namespace = "baz"
+            plugin_attrib = "sub"
+            interfaces = set(('attrib',))
+
+        class TestPlugin(ElementBase):
+            name = "plugin"
+            namespace = "foo"
+            plugin_attrib = "plugin"
+            interfaces = set(('a',))
+
+        class TestStanza(ElementBase):
+            name = "foo"
+            namespace = "foo"
+            interfaces = set(('bar',))
+
+        register_stanza_plugin(TestStanza, TestPlugin)
+        register_stanza_plugin(TestStanza, TestSubStanza, iterable=True)
+
+        xml = ET.fromstring('<foo xmlns="foo"><plugin a="1" />' + \
+                            '<sub xmlns="baz" attrib="2" /></foo>')
+        stanza = TestStanza(xml=xml)
+        self.assertEqual(stanza.loaded_plugins, set(('plugin', 'sub')))
+        self.assertEqual(len(stanza._plugins), 0)
+        self.failUnless(stanza.match('foo@bar=/plugin@a=1'),
+            "Stanza did not match a plugin that was not yet created.")
+
+        copy = stanza.share()
+        copy['plugin']['a'] = '3'
+        self.assertEqual(stanza['plugin']['a'], '1')
+        self.assertEqual(copy['plugin']['a'], '3')
+        self.assertEqual([sub['attrib'] for sub in stanza], ['2'])
+        self.assertEqual([sub['attrib'] for sub in copy], ['2'])
+
+    def testSlots(self):
+        """Test that stanzas without plugins share empty containers."""
+
+        class TestStanza(ElementBase):
+            name = "foo"
+            namespace = "foo"
+            interfaces = set(('bar',))
+
+        first = TestStanza()
+        second = TestStanza()
+        self.failUnless(first._plugins is second._plugins)
+        self.failUnless(first.loaded_plugins is second.loaded_plugins)
+
+        first.append(TestStanza())
+        first.note = 'Subclasses may still add attributes.'
+        self.assertEqual(len(first), 1)
+        self.assertEqual(len(second), 0)
+        self.failIf(hasattr(ElementBase(), '__dict__'))
+
     def testBoolInterfaces(self):
         """Test using boolean interfaces."""
 
@@ -1248,5 +1389,49 @@ class TestElementBase(SleekTest):
           <foo xmlns="test" />
         """)
 
+    def testShare(self):
+        """Test that shared stanzas copy their XML when modified."""
+
+        class TestSubStanza(ElementBase):
+            name = "sub"
+            namespace = "test"
+            plugin_attrib = "sub"
+            interfaces = set(('bar',))
+
+        class TestStanza(ElementBase):
+            name = "foo"
+            namespace = "test"
+            interfaces = set(('bar',))
+
+        register_stanza_plugin(TestStanza, TestSubStanza)
+
+        stanza = TestStanza()
+        stanza['bar'] = 'a'
+        stanza['sub']['bar'] = 'b'
+
+        first = stanza.share()
+        second = stanza.share()
+        self.failUnless(first.xml is stanza.xml,
+                "Shared stanza did not reuse the XML.")
+
+        first['sub']['bar'] = 'c'
+        self.failIf(first.xml is stanza.xml,
+                "Modified stanza still shares the XML.")
+        self.assertEqual(first['sub']['bar'], 'c')
+        self.assertEqual(stanza['sub']['bar'], 'b')
+
+        del second['bar']
+        self.assertEqual(second['bar'], '')
+        self.assertEqual(stanza['bar'], 'a')
+
+        stanza.clear()
+        self.check(first, """
+          <foo xmlns="test" bar="a"><sub bar="c" /></foo>
+        """)
+        self.check(second, """
+          <foo xmlns="test"><sub bar="b" /></foo>
+        """)
+
+
 
 suite = unittest.TestLoader().loadTestsFromTestCase(TestElementBase)
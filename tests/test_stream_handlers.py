@@ -5,6 +5,9 @@ import unittest
 from sleekxmpp.test import SleekTest
 from sleekxmpp.exceptions import IqTimeout
 from sleekxmpp import Callback, MatchXPath
+from sleekxmpp.xmlstream.matcher import StanzaPath, MatchXMLMask, MatcherId
+from sleekxmpp.xmlstream.dispatch import ShardedQueue
+from sleekxmpp.util import Queue
 
 
 class TestHandlers(SleekTest):
@@ -183,6 +186,77 @@ class TestHandlers(SleekTest):
         self.failUnless(events == ['timeout'],
                 "Iq timeout was not executed: %s" % events)
 
+    def testIqLateResponse(self):
+        """Test that a response arriving after a timeout is ignored."""
+        events = []
+
+        def handle_foo(iq):
+            events.append('foo')
+
+        def handle_timeout(iq):
+            events.append('timeout')
+
+        iq = self.Iq()
+        iq['type'] = 'get'
+        iq['id'] = 'test-late'
+        iq['to'] = 'user@localhost'
+        iq['query'] = 'foo'
+        name = iq.send(callback=handle_foo,
+                       timeout_callback=handle_timeout,
+                       timeout=0.05)
+
+        self.send("""
+          <iq type="get" id="test-late" to="user@localhost">
+            <query xmlns="foo" />
+          </iq>
+        """)
+
+        time.sleep(1)
+
+        self.failIf(self.xmpp.remove_handler(name),
+                "Expired response handler was not removed.")
+
+        self.recv("""
+          <iq type="result" id="test-late"
+              to="test@localhost"
+              from="user@localhost" />
+        """)
+
+        time.sleep(0.1)
+
+        self.assertEqual(events, ['timeout'],
+                "Late response was not ignored: %s" % events)
+
+    def testManyIqCallbacks(self):
+        """Test routing responses for many outstanding requests."""
+        events = []
+
+        def handle_result(iq):
+            events.append(iq['id'])
+
+        for i in range(100):
+            iq = self.Iq()
+            iq['type'] = 'get'
+            iq['id'] = 'many-%s' % i
+            iq['to'] = 'user@localhost'
+            iq.send(callback=handle_result, timeout_callback=handle_result)
+            self.send("""
+              <iq type="get" id="many-%s" to="user@localhost" />
+            """ % i)
+
+        for i in reversed(range(100)):
+            self.recv("""
+              <iq type="result" id="many-%s"
+                  to="test@localhost"
+                  from="user@localhost" />
+            """ % i)
+
+        time.sleep(0.2)
+
+        expected = ['many-%s' % i for i in reversed(range(100))]
+        self.assertEqual(events, expected,
+                "Responses were not routed: %s" % events)
+
     def testMultipleHandlersForStanza(self):
         """
         Test that multiple handlers for a single stanza work
@@ -277,6 +351,107 @@ class TestHandlers(SleekTest):
 
       self.assertEqual(events, ['tester@sleekxmpp.com/test'], "Did not timeout on bad sender")
 
+    def testIndexedHandlerOrder(self):
+        """
+        Test that indexed and unindexed handlers are matched in the
+        order they were registered.
+        """
+        events = []
+
+        class AnyMatcher(object):
+            def match(self, xml):
+                return True
+
+        def handler(name):
+            return lambda stanza: events.append(name)
+
+        self.xmpp.register_handler(Callback('Test XPath',
+            MatchXPath('{jabber:client}message/{jabber:client}body'),
+            handler('xpath')))
+        self.xmpp.register_handler(Callback('Test Any',
+            AnyMatcher(),
+            handler('any')))
+        self.xmpp.register_handler(Callback('Test Path',
+            StanzaPath('message@type=chat/body'),
+            handler('path')))
+        self.xmpp.register_handler(Callback('Test Mask',
+            MatchXMLMask('<message xmlns="jabber:client"><body /></message>'),
+            handler('mask')))
+        self.xmpp.register_handler(Callback('Test Id',
+            MatcherId('msg-1'),
+            handler('id')))
+        self.xmpp.register_handler(Callback('Test Other',
+            StanzaPath('iq/disco_info'),
+            handler('other')))
+
+        self.recv("""
+          <message type="chat" id="msg-1">
+            <body>Testing</body>
+          </message>
+        """)
+
+        time.sleep(0.1)
+
+        self.assertEqual(events, ['xpath', 'any', 'path', 'mask', 'id'],
+                "Handlers were not matched in order: %s" % events)
+
+    def testIndexedHandlerRemoval(self):
+        """Test that removed handlers are no longer matched."""
+        events = []
+
+        def handler(stanza):
+            events.append(stanza['body'])
+
+        xpath = MatchXPath('{jabber:client}message/{jabber:client}body')
+        self.xmpp.register_handler(Callback('Test Remove', xpath, handler))
+
+        self.recv("""<message><body>First</body></message>""")
+        time.sleep(0.1)
+
+        self.failUnless(self.xmpp.remove_handler('Test Remove'),
+                "Handler was not removed.")
+        self.failIf(self.xmpp.remove_handler('Test Remove'),
+                "Handler was removed twice.")
+
+        self.recv("""<message><body>Second</body></message>""")
+        time.sleep(0.1)
+
+        self.assertEqual(events, ['First'],
+                "Removed handler was still matched: %s" % events)
+
+    def testShardedEventQueue(self):
+        """Test that events from one sender share an event queue shard."""
+        queue = ShardedQueue(Queue(), 4)
+
+        senders = ['a@example.com/1', 'b@example.com/1', 'a@example.com/2',
+                   'room@muc.example.com/nick', 'room@muc.example.com/other']
+        for i, sender in enumerate(senders):
+            msg = self.Message()
+            msg['from'] = sender
+            msg['body'] = str(i)
+            queue.put(('event', None, msg))
+        queue.put(('schedule', None, (), {}, 'Task'))
+        queue.put(None)
+
+        self.assertEqual(queue.qsize(), 6 + len(queue))
+        self.failUnless(queue.shard(('schedule', None)) is queue.queues[0],
+                "Scheduled tasks were not assigned to the first shard.")
+
+        bodies = {}
+        for shard in queue.queues:
+            while not shard.empty():
+                item = shard.get()
+                if item is not None and item[0] == 'event':
+                    bodies.setdefault(item[2]['from'].bare, []).append(
+                            (item[2]['body'], shard))
+
+        for bare in ('a@example.com', 'room@muc.example.com'):
+            events = bodies[bare]
+            self.failUnless(events[0][1] is events[1][1],
+                    "Events for %s were not kept in one shard." % bare)
+            self.assertEqual([body for body, _ in events],
+                             sorted(body for body, _ in events))
+
 
 
 
@@ -0,0 +1,141 @@
+import socket
+import threading
+
+import unittest
+from sleekxmpp import BaseXMPP
+from sleekxmpp.exceptions import IqError
+from sleekxmpp.xmlstream.handler import Callback
+from sleekxmpp.xmlstream import SessionPool
+from sleekxmpp.xmlstream.matcher import MatchXPath
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+
+@unittest.skipIf(asyncio is None, 'asyncio is not available')
+class TestStreamLoop(unittest.TestCase):
+    """
+    Test processing a stream on an asyncio event loop.
+    """
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.client, self.server = socket.socketpair()
+        self.server.settimeout(5)
+        self.xmpp = BaseXMPP(default_ns='jabber:client')
+        self.xmpp.set_socket(self.client)
+        self.xmpp.session_bind_event.set()
+
+    def tearDown(self):
+        self.server.close()
+        self.loop.close()
+
+    def run_stream(self, seconds=0.3):
+        self.loop.call_later(seconds, self.xmpp.disconnect)
+        self.loop.run_until_complete(
+                asyncio.wait_for(self.xmpp.loop_stopped, 5))
+
+    def recv_all(self):
+        data = b''
+        while True:
+            chunk = self.server.recv(4096)
+            if not chunk:
+                return data.decode('utf-8')
+            data += chunk
+
+    def testHandlersOnLoop(self):
+        """Test that handlers and scheduled tasks run in the loop's thread."""
+        threads = []
+
+        def ping(stanza):
+            threads.append(threading.current_thread())
+            self.xmpp.send_raw('<pong />')
+
+        def tick():
+            threads.append(threading.current_thread())
+
+        self.xmpp.register_handler(Callback('Ping',
+                                            MatchXPath('{test}ping'),
+                                            ping))
+        self.xmpp.schedule('Tick', 0.05, tick)
+        self.xmpp.process(loop=self.loop, block=False)
+
+        self.server.sendall(b'<stream:stream xmlns="jabber:client" ' +
+                            b'xmlns:stream="http://etherx.jabber.org/' +
+                            b'streams"><ping xmlns="test" />')
+        self.loop.call_later(0.1, self.xmpp.session_started_event.set)
+        self.run_stream()
+
+        self.assertEqual(threads, [threading.current_thread()] * 2)
+        self.assertTrue('<pong />' in self.recv_all())
+
+    def testIqFuture(self):
+        """Test that a blocking Iq send on the loop returns a future."""
+        results = []
+
+        def query():
+            iq = self.xmpp.Iq()
+            iq['id'] = 'q1'
+            iq['type'] = 'get'
+            iq['to'] = 'tester@localhost'
+            future = iq.send()
+            future.add_done_callback(results.append)
+
+        self.xmpp.process(loop=self.loop, block=False)
+        self.xmpp.session_started_event.set()
+        self.loop.call_soon(query)
+        self.loop.call_later(0.1, self.server.sendall,
+                b'<stream:stream xmlns="jabber:client" ' +
+                b'xmlns:stream="http://etherx.jabber.org/streams">' +
+                b'<iq id="q1" type="error" from="tester@localhost">' +
+                b'<error type="cancel"><item-not-found ' +
+                b'xmlns="urn:ietf:params:xml:ns:xmpp-stanzas" />' +
+                b'</error></iq>')
+        self.run_stream()
+
+        self.assertEqual(len(results), 1)
+        self.assertTrue(isinstance(results[0].exception(), IqError))
+
+    def testSessionPool(self):
+        """Test running several streams from one session pool."""
+        pool = SessionPool(loop=self.loop, workers=2)
+        servers = [self.server]
+        streams = [self.xmpp]
+        for i in range(2):
+            client, server = socket.socketpair()
+            server.settimeout(5)
+            stream = BaseXMPP(default_ns='jabber:client')
+            stream.set_socket(client)
+            servers.append(server)
+            streams.append(stream)
+
+        threads = []
+
+        def ping(stanza):
+            threads.append(threading.current_thread())
+            stanza.stream.disconnect()
+
+        for stream, server in zip(streams, servers):
+            stream.register_handler(Callback('Ping',
+                                             MatchXPath('{test}ping'),
+                                             ping))
+            pool.add(stream, connect=False)
+            server.sendall(b'<stream:stream xmlns="jabber:client" ' +
+                           b'xmlns:stream="http://etherx.jabber.org/' +
+                           b'streams"><ping xmlns="test" />')
+
+        timer = threading.Timer(5, pool.stop)
+        timer.start()
+        pool.run()
+        timer.cancel()
+        pool.executor.shutdown()
+
+        self.assertEqual(len(pool), 0)
+        self.assertEqual(threads, [threading.current_thread()] * 3)
+        for server in servers[1:]:
+            server.close()
+
+
+suite = unittest.TestLoader().loadTestsFromTestCase(TestStreamLoop)
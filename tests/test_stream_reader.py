@@ -0,0 +1,97 @@
+import socket
+import threading
+
+import unittest
+from sleekxmpp import BaseXMPP
+from sleekxmpp.xmlstream import ET
+from sleekxmpp.xmlstream.reader import StreamReader, has_pull_parser
+
+
+class TestStreamReader(unittest.TestCase):
+    """
+    Test reading and parsing an XML stream from a socket.
+    """
+
+    def setUp(self):
+        self.client, self.server = socket.socketpair()
+
+    def tearDown(self):
+        self.client.close()
+        self.server.close()
+
+    def read_events(self, reader):
+        events = []
+        while True:
+            size = reader.recv()
+            if not size:
+                return events
+            for event, xml in reader.feed(size):
+                events.append((event, xml.tag))
+
+    @unittest.skipIf(not has_pull_parser(),
+                     'ET.XMLPullParser is not available')
+    def testSmallReads(self):
+        """Test parsing elements split across many reads."""
+        data = b'<stream xmlns="test"><a><b>text</b></a><c /></stream>'
+        self.server.sendall(data)
+        self.server.shutdown(socket.SHUT_WR)
+
+        reader = StreamReader(self.client, read_size=7)
+        events = self.read_events(reader)
+
+        self.assertEqual(events, [
+            (b'start', '{test}stream'),
+            (b'start', '{test}a'),
+            (b'start', '{test}b'),
+            (b'end', '{test}b'),
+            (b'end', '{test}a'),
+            (b'start', '{test}c'),
+            (b'end', '{test}c'),
+            (b'end', '{test}stream')])
+        self.assertEqual(reader.bytes_received, len(data))
+        self.assertEqual(reader.reads, (len(data) + 6) // 7)
+        self.assertEqual(reader.stats()['read_size'], 7)
+
+    @unittest.skipIf(not has_pull_parser(),
+                     'ET.XMLPullParser is not available')
+    def testReset(self):
+        """Test starting a new stream after a restart."""
+        reader = StreamReader(self.client)
+        self.server.sendall(b'<stream xmlns="test"><a>')
+        reader.feed(reader.recv())
+
+        reader.reset()
+        self.server.sendall(b'<stream xmlns="other"><b /></stream>')
+        self.server.shutdown(socket.SHUT_WR)
+        events = self.read_events(reader)
+
+        self.assertEqual(events[0], (b'start', '{other}stream'))
+        self.assertEqual(len(events), 4)
+
+    def testNoPullParser(self):
+        """Test reading the stream without ET.XMLPullParser."""
+        pull_parser = getattr(ET, 'XMLPullParser', None)
+        if pull_parser is not None:
+            del ET.XMLPullParser
+        try:
+            xmpp = BaseXMPP(default_ns='jabber:client')
+            xmpp.set_socket(self.client)
+        finally:
+            if pull_parser is not None:
+                ET.XMLPullParser = pull_parser
+        self.assertEqual(xmpp.reader, None)
+        self.failUnless(xmpp.filesocket is not None)
+
+        received = threading.Event()
+        xmpp.add_event_handler('message', lambda msg: received.set())
+        xmpp.process(block=False)
+        self.server.sendall(
+            b'<stream:stream xmlns="jabber:client" '
+            b'xmlns:stream="http://etherx.jabber.org/streams">'
+            b'<message from="user@example.com"><body>Hi</body></message>')
+        received.wait(5)
+        xmpp.abort()
+        self.failUnless(received.is_set(), "Stanza was not received.")
+
+
+suite = unittest.TestLoader().loadTestsFromTestCase(TestStreamReader)
@@ -0,0 +1,214 @@
+import socket
+import threading
+import time
+
+import unittest
+from sleekxmpp import BaseXMPP
+from sleekxmpp.xmlstream import ET
+from sleekxmpp.xmlstream.xmlstream import IOV_MAX
+
+
+class TestStreamSend(unittest.TestCase):
+    """
+    Test writing queued data to the stream from the send thread.
+    """
+
+    def setUp(self):
+        self.client, self.server = socket.socketpair()
+        self.server.settimeout(5)
+        self.xmpp = BaseXMPP(default_ns='jabber:client')
+        self.xmpp.set_socket(self.client)
+
+    def tearDown(self):
+        self.xmpp.abort()
+        self.server.close()
+
+    def recv_bytes(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self.server.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+        return data.decode('utf-8')
+
+    def testBatching(self):
+        """Test combining queued stanzas into fewer writes."""
+        self.xmpp.send_batching = True
+        self.xmpp.send_batch_size = 1000
+
+        stanzas = ['<message id="%s"><body>%s</body></message>' % (i, i)
+                   for i in range(100)]
+        for stanza in stanzas:
+            self.xmpp.send_raw(stanza)
+        self.xmpp.session_started_event.set()
+        self.xmpp.process(block=False)
+
+        expected = ''.join(stanzas)
+        self.assertEqual(self.recv_bytes(len(expected)), expected)
+        time.sleep(0.1)
+
+        stats = self.xmpp.send_stats()
+        self.assertEqual(stats['stanzas'], 100)
+        self.assertEqual(stats['bytes'], len(expected))
+        self.assertEqual(stats['queued'], 0)
+        self.failUnless(stats['batches'] < 20,
+                "Stanzas were not batched: %s" % stats)
+        self.failUnless(stats['max_batch'] > 1)
+
+    def testBatchingManyStanzas(self):
+        """Test batching more stanzas than one sendmsg call can take."""
+        self.xmpp.send_batching = True
+        self.xmpp.send_batch_size = 1000000
+
+        stanza = '<r xmlns="urn:xmpp:sm:3" />'
+        for i in range(IOV_MAX + 1000):
+            self.xmpp.send_raw(stanza)
+        errors = []
+        self.xmpp.add_event_handler('socket_error', errors.append)
+        self.xmpp.session_started_event.set()
+        self.xmpp.process(block=False)
+
+        expected = stanza * (IOV_MAX + 1000)
+        self.assertEqual(self.recv_bytes(len(expected)), expected)
+        time.sleep(0.1)
+
+        self.assertEqual(errors, [])
+        stats = self.xmpp.send_stats()
+        self.failUnless(stats['max_batch'] <= IOV_MAX,
+                "Batch was larger than IOV_MAX: %s" % stats)
+
+    def testNoBatching(self):
+        """Test that each stanza is written separately by default."""
+        for i in range(5):
+            self.xmpp.send_raw('<presence id="%s" />' % i)
+        self.xmpp.session_started_event.set()
+        self.xmpp.process(block=False)
+
+        expected = ''.join('<presence id="%s" />' % i for i in range(5))
+        self.assertEqual(self.recv_bytes(len(expected)), expected)
+        time.sleep(0.1)
+
+        stats = self.xmpp.send_stats()
+        self.assertEqual(stats['batches'], 5)
+        self.assertEqual(stats['max_batch'], 1)
+
+    def testPriority(self):
+        """Test sending IQ results ahead of queued messages."""
+        events = []
+        self.xmpp.add_event_handler('send_queue_high',
+                lambda stats: events.append(stats['queued']))
+        self.xmpp.send_queue.high_water = 3
+
+        for i in range(3):
+            msg = self.xmpp.Message()
+            msg['id'] = str(i)
+            msg.send()
+        iq = self.xmpp.Iq()
+        iq['id'] = 'r1'
+        iq['type'] = 'result'
+        iq.send()
+        self.xmpp.session_started_event.set()
+        self.xmpp.process(block=False)
+
+        data = self.recv_bytes(1)
+        self.failUnless(data.startswith('<iq'),
+                "IQ result was not sent first: %s" % data)
+        time.sleep(0.1)
+        self.assertEqual(events, [3])
+
+    def testFullQueue(self):
+        """Test that senders waiting for room don't hold back IQ results."""
+        self.xmpp.send_queue.max_size = 1
+        self.xmpp.Message().send()
+
+        blocked = threading.Thread(target=self.xmpp.Message().send)
+        blocked.daemon = True
+        blocked.start()
+        time.sleep(0.1)
+        self.failUnless(blocked.is_alive(),
+                "Message was queued in a full queue.")
+
+        sent = threading.Thread(target=self.xmpp.Iq(stype='result').send)
+        sent.daemon = True
+        sent.start()
+        sent.join(2)
+        self.failIf(sent.is_alive(), "IQ result waited for a full queue.")
+        self.assertEqual(self.xmpp.send_queue.stats()['lanes'], [1, 1, 0])
+
+        self.xmpp.send_queue.release()
+        blocked.join(5)
+
+    def testBroadcastFullQueue(self):
+        """Test broadcasting into a full queue."""
+        self.xmpp.send_queue.max_size = 1
+        self.xmpp.Message().send()
+        recipients = ['user%s@example.com' % i for i in range(3)]
+
+        results = []
+        blocked = threading.Thread(target=lambda: results.append(
+            self.xmpp.send_many(self.xmpp.Presence(), recipients)))
+        blocked.daemon = True
+        blocked.start()
+        time.sleep(0.1)
+        self.failUnless(blocked.is_alive(),
+                "Broadcast was queued in a full queue.")
+
+        sent = threading.Thread(target=self.xmpp.Iq(stype='result').send)
+        sent.daemon = True
+        sent.start()
+        sent.join(2)
+        self.failIf(sent.is_alive(), "IQ result waited for a broadcast.")
+
+        self.xmpp.send_queue.release()
+        blocked.join(5)
+        self.assertEqual(results, [0])
+
+        # Only the first of three single copy pieces fits.
+        self.xmpp.send_batch_size = 1
+        self.xmpp.send_queue.policy = 'drop'
+        self.xmpp.send_queue.max_size = 3
+        self.assertEqual(self.xmpp.send_many(self.xmpp.Presence(),
+                                             recipients), 1)
+
+    def testBroadcastPresence(self):
+        """Test sending one presence to every subscribed contact."""
+        self.xmpp.is_component = True
+        node = self.xmpp.roster['comp.example.com']
+        for i in range(3):
+            node.add('user%s@example.com' % i, afrom=True)
+        node.add('stranger@example.com')
+
+        self.xmpp.session_started_event.set()
+        self.xmpp.process(block=False)
+        sent = node.broadcast_presence(pshow='away', pstatus='<Lunch>')
+        self.assertEqual(sent, 3)
+
+        expected = ''.join(
+            '<presence from="comp.example.com" to="user%s@example.com">'
+            '<show>away</show><status>&lt;Lunch&gt;</status></presence>' % i
+            for i in range(3))
+        # Contacts are not broadcast to in any particular order.
+        root = ET.fromstring('<root>%s</root>' % self.recv_bytes(
+            len(expected)))
+        self.assertEqual(sorted((p.get('to'), p.get('from'),
+                                 p.findtext('show'), p.findtext('status'))
+                                for p in root),
+                         [('user%s@example.com' % i, 'comp.example.com',
+                           'away', '<Lunch>') for i in range(3)])
+        self.assertEqual(node.last_status['status'], '<Lunch>')
+        self.assertEqual(node.last_status['to'], '')
+
+    def testBroadcastKeepsTo(self):
+        """Test that broadcasting leaves the stanza's own JID alone."""
+        presence = self.xmpp.Presence(sto='user@example.com')
+        self.assertEqual(self.xmpp.send_many(presence,
+                                             ['other@example.com']), 1)
+        self.assertEqual(presence['to'], 'user@example.com')
+
+        presence = self.xmpp.Presence()
+        self.xmpp.send_many(presence, ['other@example.com'])
+        self.failIf('to' in presence.xml.attrib)
+
+
+suite = unittest.TestLoader().loadTestsFromTestCase(TestStreamSend)
@@ -0,0 +1,157 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+import unittest
+from sleekxmpp.test import SleekTest
+from sleekxmpp.plugins.xep_0115 import CapsStore
+
+
+NODE = 'http://code.google.com/p/exodus'
+VER = 'QgayPKawpkPSDYmwT/WM94uAlu0='
+
+INFO = """
+  <query xmlns="http://jabber.org/protocol/disco#info"
+         node="%s#%s">
+    <identity category="client" name="Exodus 0.9.1" type="pc" />
+    <feature var="http://jabber.org/protocol/caps" />
+    <feature var="http://jabber.org/protocol/disco#info" />
+    <feature var="http://jabber.org/protocol/disco#items" />
+    <feature var="http://jabber.org/protocol/muc" />
+  </query>
+""" % (NODE, VER)
+
+
+class TestStreamCaps(SleekTest):
+
+    """
+    Test verifying and caching entity capabilities with XEP-0115.
+    """
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.tempdir, 'caps.db')
+
+    def tearDown(self):
+        self.stream_close()
+        shutil.rmtree(self.tempdir)
+
+    def start(self):
+        self.stream_start(mode='client',
+                          plugins=['xep_0030', 'xep_0004',
+                                   'xep_0128', 'xep_0115'],
+                          plugin_config={'xep_0115': {
+                              'cache_file': self.cache_file}})
+
+    def recv_caps(self, jid):
+        self.recv("""
+          <presence from="%s">
+            <c xmlns="http://jabber.org/protocol/caps"
+               hash="sha-1" node="%s" ver="%s" />
+          </presence>
+        """ % (jid, NODE, VER))
+
+    def testCoalesce(self):
+        """Test querying a new verstring once for many entities."""
+        self.start()
+        for i in range(3):
+            self.recv_caps('user%s@localhost/pc' % i)
+
+        self.send("""
+          <iq type="get" to="user0@localhost/pc" id="1">
+            <query xmlns="http://jabber.org/protocol/disco#info"
+                   node="%s#%s" />
+          </iq>
+        """ % (NODE, VER))
+        self.send(None)
+
+        self.recv("""
+          <iq type="result" from="user0@localhost/pc" id="1">%s</iq>
+        """ % INFO)
+        time.sleep(0.2)
+
+        for i in range(3):
+            self.assertEqual(self.xmpp['xep_0115'].get_verstring(
+                'user%s@localhost/pc' % i), VER)
+
+        self.xmpp['xep_0115'].store.flush()
+        store = CapsStore(self.cache_file)
+        info = store.get(VER)
+        store.close()
+        self.failUnless(info is not None, "Caps were not stored.")
+        self.failUnless('http://jabber.org/protocol/muc' in info['features'])
+
+    def testRetry(self):
+        """Test querying the next entity when verification fails."""
+        self.start()
+        self.recv_caps('user0@localhost/pc')
+        self.recv_caps('user1@localhost/pc')
+
+        self.send("""
+          <iq type="get" to="user0@localhost/pc" id="1">
+            <query xmlns="http://jabber.org/protocol/disco#info"
+                   node="%s#%s" />
+          </iq>
+        """ % (NODE, VER))
+        self.recv("""
+          <iq type="result" from="user0@localhost/pc" id="1">
+            <query xmlns="http://jabber.org/protocol/disco#info" />
+          </iq>
+        """)
+        self.send("""
+          <iq type="get" to="user1@localhost/pc" id="2">
+            <query xmlns="http://jabber.org/protocol/disco#info"
+                   node="%s#%s" />
+          </iq>
+        """ % (NODE, VER))
+        self.recv("""
+          <iq type="result" from="user1@localhost/pc" id="2">%s</iq>
+        """ % INFO)
+        time.sleep(0.2)
+
+        caps = self.xmpp['xep_0115']
+        self.assertEqual(caps.get_verstring('user0@localhost/pc'), None)
+        self.assertEqual(caps.get_verstring('user1@localhost/pc'), VER)
+
+    def testPersistentCache(self):
+        """Test using caps stored by an earlier session."""
+        store = CapsStore(self.cache_file)
+        store.put(VER, self.Iq(xml=self.parse_xml(
+            '<iq>%s</iq>' % INFO))['disco_info'])
+        store.close()
+
+        self.start()
+        self.recv_caps('user@localhost/pc')
+        self.send(None)
+
+        caps = self.xmpp['xep_0115']
+        self.assertEqual(caps.get_verstring('user@localhost/pc'), VER)
+        self.failUnless(caps.get_caps('user@localhost/pc') is not None)
+
+    def testStoreWhileLocked(self):
+        """Test storing caps while another process writes to the file."""
+        store = CapsStore(self.cache_file, timeout=0.1)
+        other = sqlite3.connect(self.cache_file, isolation_level=None)
+        other.execute('BEGIN IMMEDIATE')
+        try:
+            started = time.time()
+            store.put(VER, self.Iq(xml=self.parse_xml(
+                '<iq>%s</iq>' % INFO))['disco_info'])
+            self.failUnless(time.time() - started < 0.1,
+                    "Storing caps waited for the file to be unlocked.")
+            self.failIf(store.get(VER) is None)
+            self.assertEqual(store.keys(), [VER])
+            self.failIf(store.flush())
+        finally:
+            other.execute('ROLLBACK')
+            other.close()
+        store.close()
+
+        store = CapsStore(self.cache_file)
+        self.failIf(store.get(VER) is None)
+        store.close()
+
+
+suite = unittest.TestLoader().loadTestsFromTestCase(TestStreamCaps)
@@ -0,0 +1,77 @@
+import threading
+import time
+
+import unittest
+from sleekxmpp.test import SleekTest
+
+
+class TestStreamManagement(SleekTest):
+
+    """
+    Test using the XEP-0198 plugin.
+    """
+
+    def tearDown(self):
+        self.stream_close()
+
+    def enable(self):
+        self.stream_start(mode='client', plugins=['xep_0198'])
+        self.xmpp.features.add('bind')
+        self.xmpp['xep_0198']._handle_sm_feature(None)
+        self.send("""
+          <enable xmlns="urn:xmpp:sm:3" resume="true" />
+        """)
+        self.recv("""
+          <enabled xmlns="urn:xmpp:sm:3" id="sm-1" resume="true" />
+        """)
+
+    def testAckAfterReordering(self):
+        """Test acking stanzas which were sent with different priorities."""
+        self.enable()
+        acked = []
+        self.xmpp.add_event_handler('stanza_acked',
+                lambda stanza: acked.append(stanza['id']))
+
+        # Hold the send thread after it takes the first stanza, so the
+        # IQ result is queued behind a waiting message.
+        with self.xmpp.send_lock:
+            self.xmpp.Message(sto='user@localhost', sid='m1').send()
+            time.sleep(0.1)
+            self.xmpp.Message(sto='user@localhost', sid='m2').send()
+            self.xmpp.Iq(sto='user@localhost', stype='result',
+                         sid='r1').send()
+
+        self.send("""
+          <message to="user@localhost" id="m1" />
+        """)
+        self.send("""
+          <message to="user@localhost" id="m2" />
+        """)
+        self.send("""
+          <iq to="user@localhost" type="result" id="r1" />
+        """)
+
+        self.recv("""
+          <a xmlns="urn:xmpp:sm:3" h="2" />
+        """)
+        time.sleep(0.2)
+        self.assertEqual(acked, ['m1', 'm2'])
+        self.assertEqual([stanza['id'] for seq, stanza in
+                          self.xmpp['xep_0198'].unacked_queue], ['r1'])
+
+    def testNeverDropped(self):
+        """Test queueing counted stanzas even when the queue is full."""
+        self.enable()
+        self.xmpp.send_queue.max_size = 1
+        self.xmpp.send_queue.policy = 'drop'
+
+        with self.xmpp.send_lock:
+            for i in range(3):
+                self.xmpp.Message(sto='user@localhost', sid=str(i)).send()
+            self.assertEqual(self.xmpp.send_queue.dropped, 0)
+
+        for i in range(3):
+            self.send('<message to="user@localhost" id="%s" />' % i)
+
+
+suite = unittest.TestLoader().loadTestsFromTestCase(TestStreamManagement)
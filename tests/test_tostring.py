@@ -1,7 +1,7 @@
 import unittest
 from sleekxmpp.test import SleekTest
 from sleekxmpp.xmlstream.stanzabase import ET
-from sleekxmpp.xmlstream.tostring import tostring, escape
+from sleekxmpp.xmlstream.tostring import tostring, escape, serialize
 
 
 class TestToString(SleekTest):
@@ -115,5 +115,27 @@ class TestToString(SleekTest):
         self.failUnless(expected == result,
             "Serialization with xml:lang failed: %s" % result)
 
+    def testSerializeWriter(self):
+        """Test serializing into a byte buffer through a writer."""
+        original = '<a xmlns="foo"><b>Hi &amp; bye</b><c xmlns="bar" /></a>'
+        xml = ET.fromstring(original)
+
+        buf = bytearray()
+        serialize(xml, lambda data: buf.extend(data.encode('utf-8')))
+
+        self.assertEqual(buf.decode('utf-8'), tostring(xml))
+        self.assertEqual(buf.decode('utf-8'), original)
+
+    def testDeepNesting(self):
+        """Test serializing elements nested deeper than the recursion limit."""
+        root = ET.Element('{foo}a')
+        elem = root
+        for i in range(5000):
+            elem = ET.SubElement(elem, '{foo}a')
+
+        result = tostring(root)
+        self.failUnless(result.startswith('<a xmlns="foo"><a><a>'),
+                "Nested serialization failed: %s" % result[:40])
+        self.assertEqual(result.count('<a'), 5001)
 
 suite = unittest.TestLoader().loadTestsFromTestCase(TestToString)
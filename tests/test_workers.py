@@ -0,0 +1,87 @@
+import time
+import threading
+
+import unittest
+from sleekxmpp.xmlstream.workers import WorkerPool
+
+
+class TestWorkerPool(unittest.TestCase):
+    """
+    Test the pool of threads used for threaded event handlers.
+    """
+
+    def testBoundedWorkers(self):
+        """Test that the number of worker threads is limited."""
+        pool = WorkerPool(max_workers=3)
+        lock = threading.Lock()
+        running = [0, 0]
+        done = threading.Event()
+
+        def work(i):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            if i == 19:
+                done.set()
+
+        for i in range(20):
+            pool.submit(work, (i,))
+        done.wait(5)
+
+        self.assertTrue(running[1] <= 3,
+                "Too many concurrent workers: %s" % running[1])
+        self.assertTrue(pool.workers <= 3)
+        self.assertEqual(pool.submitted, 20)
+
+    def testKeyLimit(self):
+        """Test limiting concurrent work with the same key."""
+        pool = WorkerPool(max_workers=4)
+        pool.set_limit('message', 1)
+        order = []
+        done = threading.Event()
+
+        def work(i):
+            order.append(i)
+            time.sleep(0.005)
+            if len(order) == 10:
+                done.set()
+
+        for i in range(10):
+            pool.submit(work, (i,), key='message')
+        done.wait(5)
+
+        self.assertEqual(order, list(range(10)))
+
+    def testDropPolicy(self):
+        """Test discarding work once the queue is full."""
+        pool = WorkerPool(max_workers=1, max_queue=2, policy='drop')
+        release = threading.Event()
+
+        pool.submit(release.wait, (5,))
+        time.sleep(0.1)
+        results = [pool.submit(lambda: None) for i in range(4)]
+        release.set()
+
+        self.assertEqual(results, [True, True, False, False])
+        self.assertEqual(pool.dropped, 2)
+        self.assertEqual(pool.stats()['peak_queue'], 2)
+
+    def testCallerRunsPolicy(self):
+        """Test executing work in the caller once the queue is full."""
+        pool = WorkerPool(max_workers=1, max_queue=1, policy='caller')
+        release = threading.Event()
+        threads = []
+
+        pool.submit(release.wait, (5,))
+        time.sleep(0.1)
+        pool.submit(lambda: None)
+        pool.submit(lambda: threads.append(threading.current_thread()))
+        release.set()
+
+        self.assertEqual(threads, [threading.current_thread()])
+
+
+suite = unittest.TestLoader().loadTestsFromTestCase(TestWorkerPool)